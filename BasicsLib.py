@@ -1,9 +1,29 @@
 # -*- coding: utf-8 -*-
+import os, sys
 import pya
 
+try:
+    import contact_array
+except ImportError:  # loaded as a macro: the sibling modules are next to this file
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import contact_array
+
+try:
+    from pcell_cache import cached_pcell
+except ImportError:  # cache module not on the macro path: produce every time
+    def cached_pcell(cls):
+        return cls
+
 # FEOL contact row (minimal PCell example)
 
+@cached_pcell
 class feol_contact(pya.PCellDeclarationHelper):
+    # Rule values (nm); pcell_drc.py checks the produced geometry against them
+    CONTACT_SIZE     = 160
+    CONTACT_DISTANCE = 180
+    METAL1_EXTENSION =   0   # metal 1 extension
+    METAL1_ENDCAP    =  50   # metal 1 end cap
+
     def __init__(self):
         super().__init__()
         # Parameters
@@ -16,6 +36,7 @@ class feol_contact(pya.PCellDeclarationHelper):
         self.param("ly_pimp",   self.TypeLayer, "P+ implant",              default=pya.LayerInfo(14, 0))
         self.param("ly_nwell",  self.TypeLayer, "N-Well",                  default=pya.LayerInfo(31, 0))
         self.param("ly_pr",     self.TypeLayer, "Placement boundary",      default=pya.LayerInfo(63, 0))
+        self.param("co_array",  self.TypeBoolean, "CO cuts as one cell array", default=False)
 
     def display_text_impl(self):
         return f"feol_contact_l{self.l}_h{self.h}"
@@ -35,31 +56,22 @@ class feol_contact(pya.PCellDeclarationHelper):
         ly_nwell  = self.layout.layer(self.ly_nwell)
         ly_pr     = self.layout.layer(self.ly_pr)
 
-        contact_size    = 160
-        contact_distance= 180
+        contact_size    = self.CONTACT_SIZE
+        contact_distance= self.CONTACT_DISTANCE
         contact_pitch   = contact_size + contact_distance
-        metal1extension =   0   # metal 1 extension
-        metal1endcap    =  50   # metal 1 end cap
+        metal1extension = self.METAL1_EXTENSION
+        metal1endcap    = self.METAL1_ENDCAP
         l = self.l
         h = self.h
         x0 = 0
         y0 = 0
-        n_cuts_x    = max(0, (l + contact_distance - 2 * metal1endcap) // contact_pitch)
-        n_cuts_y    = max(0, (h + contact_distance - 2 * metal1extension) // contact_pitch)
-        xext = n_cuts_x * contact_pitch - contact_distance
-        yext = n_cuts_y * contact_pitch - contact_distance
-        start_x = (l - xext) // 2
-        start_y = (h - yext) // 2
+        n_cuts_x, start_x = contact_array.fit_cuts(l, contact_size, contact_distance, margin=metal1endcap)
+        n_cuts_y, start_y = contact_array.fit_cuts(h, contact_size, contact_distance, margin=metal1extension)
 
         shapes = self.cell.shapes
-        # place CO cuts
-        for y in range(n_cuts_y):
-            for x in range(n_cuts_x):
-                xl = start_x + x * contact_pitch
-                xr = xl + contact_size
-                yb = start_y + y * contact_pitch
-                yt = yb + contact_size
-                shapes(ly_co).insert(pya.Box(xl, yb, xr, yt))
+        # place CO cuts: one CO cell + one array instance (or one bulk Region insert)
+        contact_array.place_contacts(self.cell, ly_co, x0 + start_x, y0 + start_y, n_cuts_x, n_cuts_y,
+                                     contact_size, contact_pitch, array=self.co_array)
         # M1 landing bar that covers the row of contacts
         shapes(ly_m1).insert(pya.Box(x0, y0, x0 + l, y0 + h))
 
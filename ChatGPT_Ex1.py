@@ -1,4 +1,5 @@
 import klayout.db as pya
+import geom_export
 
 # 1) Read the GDS
 layout = pya.Layout()
@@ -7,42 +8,27 @@ layout.read("pcsource.gds")
 # 2) Grab the top cell
 cell = layout.top_cell()
 
-# 3) Get layer handles and infos
-layer_idxs  = layout.layer_indexes()   # integer layer handles
-layer_infos = layout.layer_infos()     # corresponding pya.LayerInfo
-
-# 4) Iterate all shapes, handling boxes, polygons, paths, text, pins
-for idx, info in zip(layer_idxs, layer_infos):
-    layer_no, datatype = info.layer, info.datatype
-    shapes = cell.shapes(idx)
-    for i, shape in enumerate(shapes.each()):
-        if shape.is_box():
-            # axis-aligned rectangle
-            box = shape.box
-            x1, y1 = box.p1.x, box.p1.y
-            x2, y2 = box.p2.x, box.p2.y
-            pts = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
-            print(f"Layer {layer_no}, DType {datatype}, Box #{i}:")
-            print(f"  4 points → {pts}")
-        elif shape.is_polygon():
-            # arbitrary polygon
-            poly = shape.polygon
-            pts = [(pt.x, pt.y) for pt in poly.each_point()]
-            print(f"Layer {layer_no}, DType {datatype}, Polygon #{i}:")
-            print(f"  {len(pts)} points → {pts}")
-        elif shape.is_path():
-            # path
-            path = shape.path
-            pts = [(pt.x, pt.y) for pt in path.each_point()]
-            width = path.width
-            print(f"Layer {layer_no}, DType {datatype}, Path #{i}:")
-            print(f"  Width = {width}, Points → {pts}")
-        elif shape.is_text():
-            # text
-            text = shape.text
-            print(f"Layer {layer_no}, DType {datatype}, Text #{i}:")
-            print(f"  Text = '{text.string}', at ({text.trans.disp.x}, {text.trans.disp.y})")
-        else:
-            # other shapes (paths, texts…) if you care
-            print(f"Layer {layer_no}, DType {datatype}, Shape #{i}: Unhandled type {shape.shape_type}")
+# 3) Export all shapes as columnar arrays per (layer, datatype)
+geo = geom_export.export_cell(layout, cell)
 
+# 4) Print boxes, polygons, paths and texts from the arrays
+for (layer_no, datatype), g in geo.items():
+    for i, (x1, y1, x2, y2) in enumerate(g.boxes.tolist()):
+        # axis-aligned rectangle
+        pts = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+        print(f"Layer {layer_no}, DType {datatype}, Box #{i}:")
+        print(f"  4 points → {pts}")
+    for i, ring in enumerate(geom_export.rings(g.poly_xy, g.poly_offsets)):
+        # arbitrary polygon
+        pts = [tuple(p) for p in ring.tolist()]
+        print(f"Layer {layer_no}, DType {datatype}, Polygon #{i}:")
+        print(f"  {len(pts)} points → {pts}")
+    for i, spine in enumerate(geom_export.rings(g.path_xy, g.path_offsets)):
+        # path
+        pts = [tuple(p) for p in spine.tolist()]
+        print(f"Layer {layer_no}, DType {datatype}, Path #{i}:")
+        print(f"  Width = {g.path_width[i]}, Points → {pts}")
+    for i, ((x, y), s) in enumerate(zip(g.text_xy.tolist(), g.text_strings)):
+        # text
+        print(f"Layer {layer_no}, DType {datatype}, Text #{i}:")
+        print(f"  Text = '{s}', at ({x}, {y})")
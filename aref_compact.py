@@ -0,0 +1,150 @@
+# aref_compact.py
+# Array compaction (SREF runs -> AREF) and the matching explode path.
+#
+# explode_1d_arefs() used to be copied into promote_text_to_pin.py and
+# sanitize_import.py and only went one way.  This module has both
+# directions:
+#
+#   compact_arefs(cell)  single instances of the same cell with the same
+#                        rotation/mirror (and properties) that sit on a
+#                        regular 1-D or 2-D lattice are rebuilt as one
+#                        CellInstArray each.
+#   explode_arefs(cell)  regular arrays are expanded with the native
+#                        Instance.explode(), for tools that cannot take AREFs
+#                        (by default only 1-D ones, like the old helper).
+#
+# Usage:
+#   import aref_compact
+#   for c in ly.each_cell():
+#       aref_compact.compact_arefs(c)
+
+from collections import defaultdict
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+
+def explode_arefs(cell, only_1d=True):
+    """Expand regular arrays (rows=1 xor cols=1 if only_1d) into SREFs; returns count."""
+    todo = []
+    for inst in cell.each_inst():
+        if not inst.is_regular_array():
+            continue
+        cols, rows = inst.na, inst.nb
+        if only_1d and not ((cols == 1) ^ (rows == 1)):
+            continue
+        todo.append(inst)
+    for inst in todo:
+        inst.explode()
+    return len(todo)
+
+
+def _runs(values, min_count):
+    """
+    Split sorted distinct ints into maximal arithmetic runs.
+    Returns (runs, rest): runs as (start, step, count) with count >= min_count,
+    rest are the values not covered by any run.
+    """
+    runs, rest = [], []
+    i, n = 0, len(values)
+    while i < n:
+        j = i + 1
+        if j < n:
+            step = values[j] - values[i]
+            while j + 1 < n and values[j + 1] - values[j] == step:
+                j += 1
+        if j < n and j - i + 1 >= min_count:
+            runs.append((values[i], values[j] - values[j - 1], j - i + 1))
+            i = j + 1
+        else:
+            rest.append(values[i])
+            i += 1
+    return runs, rest
+
+
+def lattice_arrays(points, min_count=2):
+    """
+    Cover a set of (x, y) points with regular arrays.
+    Returns (arrays, singles): arrays as (x0, y0, a, b, na, nb) with a, b
+    as (dx, dy) tuples, singles as the points left over.
+    """
+    rows = defaultdict(list)
+    for x, y in points:
+        rows[y].append(x)
+
+    # 1) horizontal runs per row
+    row_runs = defaultdict(list)   # (x0, dx, n) -> [y, ...]
+    leftover = []
+    for y, xs in rows.items():
+        runs, rest = _runs(sorted(xs), min_count)
+        for x0, dx, n in runs:
+            row_runs[(x0, dx, n)].append(y)
+        leftover.extend((x, y) for x in rest)
+
+    # 2) stack identical row runs with a constant row pitch into 2-D arrays
+    arrays = []
+    for (x0, dx, n), ys in row_runs.items():
+        runs, rest = _runs(sorted(ys), 2)
+        for y0, dy, m in runs:
+            arrays.append((x0, y0, (dx, 0), (0, dy), n, m))
+        for y in rest:
+            arrays.append((x0, y, (dx, 0), (0, 0), n, 1))
+
+    # 3) vertical runs among what is left
+    cols = defaultdict(list)
+    for x, y in leftover:
+        cols[x].append(y)
+    singles = []
+    for x, ys in cols.items():
+        runs, rest = _runs(sorted(ys), min_count)
+        for y0, dy, m in runs:
+            arrays.append((x, y0, (0, dy), (0, 0), m, 1))
+        singles.extend((x, y) for y in rest)
+    return arrays, singles
+
+
+def compact_arefs(cell, min_count=3):
+    """
+    Replace lattice runs of single instances in cell by CellInstArrays.
+    Returns (instances removed, arrays created).
+    """
+    groups = defaultdict(dict)
+    for inst in cell.each_inst():
+        if inst.is_regular_array() or inst.is_complex():
+            continue
+        t = inst.trans
+        key = (inst.cell_index, t.angle, t.is_mirror(), inst.prop_id)
+        # keep the first of exact duplicates; the others stay untouched
+        groups[key].setdefault((t.disp.x, t.disp.y), inst)
+
+    removed = created = 0
+    for (ci, _, _, prop_id), by_pos in groups.items():
+        if len(by_pos) < min_count:
+            continue
+        arrays, _ = lattice_arrays(list(by_pos), min_count)
+        for x0, y0, a, b, na, nb in arrays:
+            first = by_pos[(x0, y0)]
+            t = pya.Trans(first.trans)
+            ca = pya.CellInstArray(ci, t, pya.Vector(*a), pya.Vector(*b), na, nb)
+            to_erase = [by_pos[(x0 + a[0] * i + b[0] * j, y0 + a[1] * i + b[1] * j)]
+                        for i in range(na) for j in range(nb)]
+            if prop_id:
+                cell.insert(ca, prop_id)
+            else:
+                cell.insert(ca)
+            for inst in to_erase:
+                cell.erase(inst)
+            removed += len(to_erase)
+            created += 1
+    return removed, created
+
+
+def compact_layout(layout, min_count=3):
+    """compact_arefs() over every cell; returns (instances removed, arrays created)."""
+    removed = created = 0
+    for c in layout.each_cell():
+        r, n = compact_arefs(c, min_count)
+        removed += r
+        created += n
+    return removed, created
@@ -0,0 +1,290 @@
+# batch_convert.py
+# Run one of the conversions (ld1_to_ld2, promote, sanitize) over a directory
+# or a manifest of GDS files on a process pool, using the klayout.db module.
+# Each worker imports klayout once and then handles many files, instead of one
+# `klayout -b -r` start-up per SRC/OUT pair.
+#
+# Usage examples:
+#   python batch_convert.py ld1_to_ld2 ip_blocks/ --out-dir out/ --workers 16
+#   python batch_convert.py promote ip_blocks/ --map "5/0:67/44,8/0:68/44" --summary run.json
+#   python batch_convert.py sanitize manifest.json --timeout 600 --retries 2
+#
+# A manifest is either a text file with one "SRC [OUT]" per line, or a JSON
+# list of {"src": ..., "out": ..., <job keyword options>} objects.
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import layer_remap
+import layout_jobs
+import text_pins
+import tiled_ops
+
+GDS_SUFFIXES = (".gds", ".gds.gz", ".gds2", ".oas")
+OUT_SUFFIX = {"ld1_to_ld2": "_ld2", "promote": "_pins", "sanitize": "_merged"}
+GRACE_S = 10.0   # parent-side slack over --timeout before a hung worker is killed
+
+
+class JobTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise JobTimeout("job exceeded its time limit")
+
+
+def call_with_timeout(fn, args, kwargs, timeout):
+    """Run fn(*args, **kwargs) in this (worker) process, timeout with SIGALRM."""
+    t0 = time.time()
+    if timeout:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result = fn(*args, **kwargs)
+        return {"status": "ok", "seconds": time.time() - t0, "result": result}
+    except Exception as e:
+        return {"status": "timeout" if isinstance(e, JobTimeout) else "error",
+                "seconds": time.time() - t0, "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc()}
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def run_job(job, src, out, options, timeout):
+    """Worker entry point: run one job, enforce timeout with SIGALRM."""
+    return call_with_timeout(layout_jobs.JOBS[job], (src, out), options, timeout)
+
+
+def _split_suffix(name):
+    for suf in GDS_SUFFIXES:
+        if name.lower().endswith(suf):
+            return name[:-len(suf)], suf
+    return os.path.splitext(name)
+
+
+def collect_inputs(path, job, out_dir):
+    """List of (src, out, per-job options) from a directory or a manifest."""
+    def default_out(src):
+        stem, suf = _split_suffix(os.path.basename(src))
+        return os.path.join(out_dir or os.path.dirname(src), stem + OUT_SUFFIX[job] + suf)
+
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(GDS_SUFFIXES))
+        return [(os.path.join(path, n), default_out(os.path.join(path, n)), {}) for n in names]
+
+    with open(path) as f:
+        text = f.read()
+    if path.lower().endswith(".json"):
+        items = []
+        for e in json.loads(text):
+            e = dict(e)
+            src = e.pop("src")
+            items.append((src, e.pop("out", None) or default_out(src), e))
+        return items
+    items = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        parts = line.split()
+        items.append((parts[0], parts[1] if len(parts) > 1 else default_out(parts[0]), {}))
+    return items
+
+
+def job_options(args):
+    """Keyword options shared by all jobs of this run."""
+    opts = {}
+    if args.topname:
+        opts["topname"] = args.topname
+    if args.job == "ld1_to_ld2" and args.map:
+        opts["mapping"] = layer_remap.parse_map(args.map)
+    if args.job == "promote":
+        if args.map:
+            opts["mapping"] = {s: d[-1] for s, d in layer_remap.parse_map(args.map).items()}
+        if args.all_to:
+            opts["all_to"] = layer_remap.parse_layer_pair(args.all_to)
+        if args.pin_map:
+            opts["pin_map"] = text_pins.parse_pin_map(args.pin_map)
+    if args.job == "sanitize" and args.tgt:
+        opts["tgt"] = args.tgt
+    if args.job == "sanitize" and args.compact:
+        opts["compact"] = True
+    if args.job == "sanitize" and args.dedup:
+        opts["dedup"] = True
+    if args.job in ("ld1_to_ld2", "promote") and args.selective:
+        opts["selective"] = True
+    if args.job == "ld1_to_ld2" and args.tile_um:
+        opts["tile_um"] = args.tile_um
+        opts["threads"] = args.threads or tiled_ops.threads_per_job(args.workers)
+    return opts
+
+
+class _Lane:
+    """A process pool that is replaced when it breaks; gen counts the pools."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.pool = None
+        self.gen = -1
+        self.renew()
+
+    def renew(self):
+        """A fresh pool in place of the current one (broken: a worker died)."""
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.gen += 1
+
+    def submit(self, *args):
+        try:
+            return self.pool.submit(*args)
+        except BrokenProcessPool:
+            self.renew()
+            return self.pool.submit(*args)
+
+    def kill(self):
+        """Kill the workers (a hung native call ignores SIGALRM); the pool breaks."""
+        for proc in list((getattr(self.pool, "_processes", None) or {}).values()):
+            proc.kill()
+
+
+def run_batch(job, items, workers=None, timeout=None, retries=0):
+    """
+    Run all items; returns the list of per-job summary records.
+
+    A worker that dies (killed, out of memory, a crash in klayout) breaks
+    the whole pool and fails every job in it.  Those jobs are not charged an
+    attempt: they run again one at a time on a single-worker pool, where a
+    crash can only be the job's own.  With timeout, a job still running
+    GRACE_S after its limit (SIGALRM cannot interrupt a native klayout call)
+    has its pool killed and is recorded as "timeout".
+    """
+    records = {}
+    attempts = dict.fromkeys(range(len(items)), 0)
+    todo = deque(range(len(items)))   # items for the main pool
+    suspects = deque()                # items of broken pools, to run alone
+    pending = {}                      # future -> (item, lane, lane generation)
+    started = {}                      # future -> time it was first seen running
+    overdue = set()                   # futures whose worker was killed at the deadline
+    main, solo = _Lane(workers), None
+    try:
+        while todo or suspects or pending:
+            while todo:
+                k = todo.popleft()
+                src, out, opts = items[k]
+                pending[main.submit(run_job, job, src, out, opts, timeout)] = (k, main, main.gen)
+                attempts[k] += 1
+            if suspects and not any(lane is solo for _, lane, _ in pending.values()):
+                solo = solo or _Lane(1)
+                k = suspects.popleft()
+                src, out, opts = items[k]
+                pending[solo.submit(run_job, job, src, out, opts, timeout)] = (k, solo, solo.gen)
+                attempts[k] += 1
+
+            wait_s = None
+            if timeout:
+                now = time.time()
+                for fut in pending:
+                    if fut not in started and fut.running():   # handed to a worker
+                        started[fut] = now
+                deadlines = [started[f] + timeout + GRACE_S for f in pending if f in started]
+                wait_s = max(0.0, min(deadlines + [now + 1.0]) - now)   # poll for newly started jobs
+            done, _ = wait(pending, timeout=wait_s, return_when=FIRST_COMPLETED)
+            if timeout:
+                now = time.time()
+                for fut, (k, lane, g) in pending.items():
+                    if (fut not in done and fut not in overdue and g == lane.gen
+                            and fut in started and now > started[fut] + timeout + GRACE_S):
+                        overdue.add(fut)
+                        lane.kill()
+
+            for fut in done:
+                k, lane, g = pending.pop(fut)
+                started.pop(fut, None)
+                try:
+                    rec = fut.result()
+                except Exception as e:  # worker died (e.g. killed, out of memory)
+                    broken = isinstance(e, BrokenProcessPool)
+                    if broken and g == lane.gen:
+                        lane.renew()   # every other job of that pool fails the same way
+                    if fut in overdue:
+                        overdue.discard(fut)
+                        rec = {"status": "timeout",
+                               "error": f"still running {timeout + GRACE_S:g} s after the start, worker killed"}
+                    elif broken and lane is main:
+                        attempts[k] -= 1   # maybe only a victim: not charged, run it alone
+                        suspects.append(k)
+                        continue
+                    else:
+                        rec = {"status": "crashed", "error": f"{type(e).__name__}: {e}"}
+                if rec["status"] != "ok" and attempts[k] <= retries:
+                    (suspects if rec["status"] == "crashed" else todo).append(k)
+                    continue
+                src, out, opts = items[k]
+                rec.update({"src": src, "out": out, "attempts": attempts[k]})
+                records[k] = rec
+                print(f"[{rec['status']}] {src} -> {out} ({rec.get('seconds', 0):.2f} s)")
+    finally:
+        for lane in (main, solo):
+            if lane is not None:
+                lane.pool.shutdown(wait=True)
+    return [records[k] for k in range(len(items))]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Batch GDS conversions on a process pool")
+    ap.add_argument("job", choices=sorted(layout_jobs.JOBS))
+    ap.add_argument("inputs", help="directory of GDS files or manifest (.txt/.json)")
+    ap.add_argument("--out-dir", default=None, help="output directory (default: next to SRC)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--timeout", type=float, default=None,
+                    help="per-job time limit in seconds (a hung worker is killed GRACE_S later)")
+    ap.add_argument("--retries", type=int, default=0, help="re-run failed jobs this many times")
+    ap.add_argument("--summary", default="batch_summary.json", help="JSON summary output")
+    ap.add_argument("--map", default="", help='layer map, e.g. "5/0:67/44,8/0:68/44"')
+    ap.add_argument("--all-to", default="", help="promote: send ALL TEXT to this L/D")
+    ap.add_argument("--pin-map", default="", help='promote: pin shapes, "LBL:METAL:PIN,..." (each L/D)')
+    ap.add_argument("--tgt", default="", help="sanitize: target GDS to merge into")
+    ap.add_argument("--topname", default="", help="top/root cell name")
+    ap.add_argument("--compact", action="store_true", help="sanitize: rebuild SREF runs as AREFs")
+    ap.add_argument("--dedup", action="store_true", help="sanitize: reuse identical target cells")
+    ap.add_argument("--selective", action="store_true",
+                    help="ld1_to_ld2/promote: record-level rewrite of GDS, untouched data passed through")
+    ap.add_argument("--tile-um", type=float, default=None,
+                    help="ld1_to_ld2: merge the top cell's own remapped shapes, tiled, with this tile size")
+    ap.add_argument("--threads", type=int, default=None, help="threads per job for --tile-um (default: cores / workers)")
+    args = ap.parse_args(argv)
+
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    common = job_options(args)
+    items = [(src, out, dict(common, **opts))
+             for src, out, opts in collect_inputs(args.inputs, args.job, args.out_dir)]
+
+    t0 = time.time()
+    records = run_batch(args.job, items, args.workers, args.timeout, args.retries)
+    summary = {
+        "job": args.job, "workers": args.workers, "timeout": args.timeout,
+        "retries": args.retries, "seconds": time.time() - t0,
+        "ok": sum(r["status"] == "ok" for r in records),
+        "failed": sum(r["status"] != "ok" for r in records),
+        "jobs": records,
+    }
+    with open(args.summary, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"{summary['ok']} ok, {summary['failed']} failed in {summary['seconds']:.1f} s; summary: {args.summary}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# benchmark.py
+# Benchmarks over a deterministic synthetic layout corpus.
+#
+# Corpora (each at several size points):
+#   switch_array  PMOSSwitchArray PCell with n devices        (1 .. 10k)
+#   pad_ring      DAC style pad rows with labels, n pads       (100 .. 100k)
+#   pcsource      pcsource66x2.gds nested depth times in 2x2 arrays
+#
+# Every corpus entry is written to a GDS file once, then each pipeline stage
+# is timed on it: read, copy_tree, remap, text promotion, sanitize, write,
+# plus the stream rewriter and the hierarchical dump.  Results go to a JSON
+# file; with --baseline the run is compared against an earlier result and
+# stages slower than the tolerance are reported (exit code 1).
+#
+# Usage:
+#   python benchmark.py                                  (quick sizes)
+#   python benchmark.py --full --out bench_2026-10.json
+#   python benchmark.py --baseline bench_2026-10.json --tolerance 0.25
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+os.environ.setdefault("PCELL_CACHE", "0")   # time produce_impl, not the cache
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+from klayout import db as pya
+import aref_compact
+import gds_stream
+import hier_dump
+import layer_remap
+import layout_jobs
+import pad_rows
+import text_pins
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+QUICK = {"switch_array": [1, 10, 100], "pad_ring": [100, 1000], "pcsource": [1, 2, 3]}
+FULL = {"switch_array": [1, 10, 100, 1000, 10000],
+        "pad_ring": [100, 1000, 10000, 100000],
+        "pcsource": [1, 2, 4, 6, 8]}
+
+
+# ---- synthetic corpus ----
+def gen_switch_array(n):
+    """PMOSSwitchArray with n devices, as a static (non-library) layout."""
+    import pcell_pmos_switch_array  # registers PMOSSwitchArrayLib
+    lib = pya.Layout()
+    lib.dbu = 0.001
+    top = lib.create_cell("TOP")
+    pc = lib.create_cell("PMOSSwitchArray", "PMOSSwitchArrayLib", {"n": n})
+    top.insert(pya.CellInstArray(pc.cell_index(), pya.Trans()))
+    ly, _ = layout_jobs.copy_to_new_layout(lib)
+    return ly
+
+
+def gen_pad_ring(n):
+    """n pads in two facing rows with labels, like make_dac_pads.py."""
+    ly = pya.Layout()
+    ly.dbu = 0.001
+    top = ly.create_cell("PAD_RING")
+    l_pin = ly.layer(10, 2)
+    l_txt = ly.layer(10, 25)
+    pad = pad_rows.pad_cell(ly, "PAD", l_pin, 290)
+    row = ly.create_cell("PAD_ROW")
+    per_row = max(1, n // 2)
+    pad_rows.place_row(row, pad, (0, 0), (2000, 0), per_row)
+    top.insert(pya.CellInstArray(row.cell_index(), pya.Trans()))
+    far = (2000 * (per_row - 1), 20000)
+    top.insert(pya.CellInstArray(row.cell_index(), pya.Trans(pya.Vector(*far)) * pya.Trans.R180))
+    pins = pad_rows.row_pins("P", (0, 0), (2000, 0), per_row)
+    pad_rows.insert_labels(top, l_txt, pins + pad_rows.mirrored_pins(pins, far, per_row))
+    return ly
+
+
+def gen_pcsource(depth):
+    """pcsource66x2.gds wrapped depth times into 2x2 arrays of the level below."""
+    ly = pya.Layout()
+    ly.read(os.path.join(HERE, "pcsource66x2.gds"))
+    cell = ly.top_cell()
+    bbox = cell.bbox()
+    for level in range(depth):
+        parent = ly.create_cell(f"PCSOURCE_L{level + 1}")
+        w, h = bbox.width() + 1000, bbox.height() + 1000
+        parent.insert(pya.CellInstArray(cell.cell_index(), pya.Trans(),
+                                        pya.Vector(w, 0), pya.Vector(0, h), 2, 2))
+        cell = parent
+        bbox = cell.bbox()
+    return ly
+
+
+CORPORA = {"switch_array": gen_switch_array, "pad_ring": gen_pad_ring, "pcsource": gen_pcsource}
+
+
+# ---- timing ----
+@contextmanager
+def timed(times, stage):
+    t0 = time.perf_counter()
+    yield
+    times.setdefault(stage, []).append(time.perf_counter() - t0)
+
+
+def run_pipeline(path, tmpdir, times):
+    """One pass of every stage on the GDS at path."""
+    with timed(times, "read"):
+        sly = pya.Layout()
+        sly.read(path)
+    with timed(times, "copy_tree"):
+        dly, _ = layout_jobs.copy_to_new_layout(sly)
+    with timed(times, "remap"):
+        layer_remap.remap_layers(dly, layer_remap.datatype_map(dly, 0, 1))
+    with timed(times, "text_promotion"):
+        text_pins.promote_texts(dly, all_to=(67, 44))
+    with timed(times, "sanitize"):
+        layout_jobs.rename_context_cells(dly)
+        for c in dly.each_cell():
+            aref_compact.explode_arefs(c)
+    with timed(times, "write"):
+        dly.write(os.path.join(tmpdir, "out.gds"))
+    with timed(times, "stream_remap"):
+        gds_stream.rewrite(path, os.path.join(tmpdir, "stream.gds"), [gds_stream.DatatypeMap({0: 1})])
+    with timed(times, "hier_dump"):
+        for rec in hier_dump.each_cell_record(sly):
+            pass
+
+
+def layout_stats(ly):
+    shapes = 0
+    for c in ly.each_cell():
+        for li in ly.layer_indexes():
+            shapes += c.shapes(li).size()
+    insts = sum(c.child_instances() for c in ly.each_cell())
+    return {"cells": ly.cells(), "instances": insts, "shapes": shapes}
+
+
+def run(sizes, repeat, tmpdir):
+    results = []
+    for corpus, points in sizes.items():
+        for size in points:
+            ly = CORPORA[corpus](size)
+            path = os.path.join(tmpdir, f"{corpus}_{size}.gds")
+            opt = pya.SaveLayoutOptions()
+            opt.write_context_info = False
+            ly.write(path, opt)
+            times = {}
+            for _ in range(repeat):
+                run_pipeline(path, tmpdir, times)
+            entry = {"corpus": corpus, "size": size, "bytes": os.path.getsize(path)}
+            entry.update(layout_stats(ly))
+            entry["stages"] = {s: {"min": min(v), "median": statistics.median(v)} for s, v in times.items()}
+            results.append(entry)
+            total = sum(v["min"] for v in entry["stages"].values())
+            print(f"{corpus:>13} {size:>7}: {entry['shapes']:>9} shapes, {total:8.3f} s total (min)")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """List of (corpus, size, stage, base, now) slower than base * (1 + tolerance)."""
+    base = {(e["corpus"], e["size"]): e for e in baseline["results"]}
+    slow = []
+    for e in results:
+        b = base.get((e["corpus"], e["size"]))
+        if not b:
+            continue
+        for stage, v in e["stages"].items():
+            bv = b["stages"].get(stage)
+            # ignore sub-millisecond stages, they are all noise
+            if bv and v["min"] > 1e-3 and v["min"] > bv["min"] * (1 + tolerance):
+                slow.append((e["corpus"], e["size"], stage, bv["min"], v["min"]))
+    return slow
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the layout scripts on a synthetic corpus")
+    ap.add_argument("--full", action="store_true", help="use the full size range (slow)")
+    ap.add_argument("--corpus", action="append", choices=sorted(CORPORA), help="restrict to this corpus")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per size point (min and median kept)")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", default=None, help="earlier result JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = 20%%)")
+    args = ap.parse_args(argv)
+
+    sizes = FULL if args.full else QUICK
+    if args.corpus:
+        sizes = {k: v for k, v in sizes.items() if k in args.corpus}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = run(sizes, args.repeat, tmpdir)
+
+    doc = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "klayout": getattr(sys.modules.get("klayout"), "__version__", None),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(doc, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slow = compare(results, json.load(f), args.tolerance)
+        for corpus, size, stage, b, now in slow:
+            print(f"REGRESSION {corpus} {size} {stage}: {b:.4f} s -> {now:.4f} s")
+        if slow:
+            return 1
+        print("No regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
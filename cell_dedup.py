@@ -0,0 +1,154 @@
+# cell_dedup.py
+# Merge a cell tree into a target layout, reusing identical target cells.
+#
+# Cell.copy_tree() copies every cell below the source top, so importing the
+# same (or an overlapping) source twice duplicates every shared subcell,
+# e.g. the PCSOURCE variants.  merge_tree() walks the source bottom-up and
+# maps each cell whose content fingerprint (gds_diff deep hash: shapes per
+# layer plus instances of children by fingerprint, properties included,
+# plus the dbu) already exists in the target onto that target cell; only
+# new cells are created.  Sources with another dbu than the target are
+# scaled on copy (shapes and instance placements alike).
+#
+# Cell names are ignored by default, so differently named cells with the
+# same content become one.  Two exceptions:
+#   * empty cells (no shapes, no instances: black boxes, placeholders) are
+#     never reused, and their name is part of their fingerprint, so parents
+#     placing different black boxes stay apart too;
+#   * an index made with names=True also puts every cell name into the
+#     fingerprints: only same-named identical cells are shared, cells meant
+#     to stay distinct (e.g. the variants of a PCell sweep) keep their names.
+#
+# The target's fingerprints are kept in a sidecar <file>.fpindex.json next
+# to the written GDS.  It is trusted as long as the GDS file size, mtime and
+# dbu still match, so repeated merges into the same target do not rehash it.
+#
+# Usage:
+#   import cell_dedup
+#   index = cell_dedup.FingerprintIndex.for_layout(tly, tgt_path)   (names=True: name-preserving)
+#   root, stats = cell_dedup.merge_tree(tly, sly.top_cell(), "MYBLOCK", index)
+#   tly.write(out); index.save(out)
+
+import json
+import os
+import sys
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import gds_diff
+
+SUFFIX = ".fpindex.json"
+
+
+def fingerprints(layout, names=False):
+    """
+    {cell index: fingerprint} for every cell of layout (deep hash and dbu;
+    cell names included with names=True, for empty cells always).
+    """
+    hashes = gds_diff.cell_hashes(layout, names=names, empty_names=True)
+    return {ci: f"{h.deep:016x}@{layout.dbu:g}" for ci, h in hashes.items()}
+
+
+class FingerprintIndex:
+    """
+    Fingerprint -> cell name of one target layout (empty cells left out),
+    with its sidecar file.  names=True: name-preserving fingerprints.
+    """
+
+    def __init__(self, dbu, cells=None, names=False):
+        self.dbu = dbu
+        self.cells = dict(cells or {})
+        self.names = names
+
+    @classmethod
+    def for_layout(cls, layout, path=None, names=False):
+        """The index of layout, from path's sidecar if still valid, else computed."""
+        if path:
+            idx = cls.load(path, layout.dbu, names)
+            if idx is not None and all(layout.cell(n) is not None for n in idx.cells.values()):
+                return idx
+        return cls(layout.dbu, {fp: layout.cell(ci).name for ci, fp in fingerprints(layout, names).items()
+                                if not layout.cell(ci).is_empty()}, names)
+
+    @classmethod
+    def load(cls, path, dbu, names=False):
+        """Index from path's sidecar, or None if missing or stale."""
+        try:
+            with open(path + SUFFIX) as f:
+                doc = json.load(f)
+            st = os.stat(path)
+        except (OSError, ValueError):
+            return None
+        if (doc.get("size") != st.st_size or doc.get("mtime_ns") != st.st_mtime_ns
+                or doc.get("dbu") != dbu or doc.get("names") != names):
+            return None
+        return cls(dbu, doc["cells"], names)
+
+    def save(self, path):
+        """Write the sidecar for the (just written) layout file at path."""
+        st = os.stat(path)
+        with open(path + SUFFIX, "w") as f:
+            json.dump({"size": st.st_size, "mtime_ns": st.st_mtime_ns, "dbu": self.dbu,
+                       "names": self.names, "cells": self.cells}, f)
+
+
+def _unique_name(layout, name):
+    if layout.cell(name) is None:
+        return name
+    k = 1
+    while layout.cell(f"{name}${k}") is not None:
+        k += 1
+    return f"{name}${k}"
+
+
+def merge_tree(tly, src_top, root_name=None, index=None, avoid=()):
+    """
+    Merge the tree below src_top into tly.  Cells with a fingerprint already
+    in index map onto the existing target cell; the others, and every empty
+    cell, are created (the source top as root_name).  Target cells in avoid (cell indexes, e.g. the
+    target top the result gets placed in) are never reused.  Returns (target
+    root cell, {"reused": n, "added": n}); index is updated with the new cells.
+    """
+    sly = src_top.layout()
+    index = index or FingerprintIndex.for_layout(tly)
+    src_fp = fingerprints(sly, index.names)
+    wanted = set(src_top.called_cells())
+    wanted.add(src_top.cell_index())
+    lmap = pya.LayerMapping()
+    lmap.create_full(tly, sly)   # same (L, D) -> same target layer, new ones created
+    same_dbu = abs(sly.dbu - tly.dbu) < 1e-12
+    props = {0: 0}   # source -> target properties id
+
+    cmap = {}
+    stats = {"reused": 0, "added": 0}
+    for ci in sly.each_cell_bottom_up():
+        if ci not in wanted:
+            continue
+        fp = src_fp[ci]
+        scell = sly.cell(ci)
+        empty = scell.is_empty()   # black box: never shared
+        existing = index.cells.get(fp) if not empty else None
+        existing = tly.cell(existing) if existing is not None else None
+        if existing is not None and existing.cell_index() not in avoid:
+            cmap[ci] = existing.cell_index()
+            stats["reused"] += 1
+            continue
+        name = root_name if (ci == src_top.cell_index() and root_name) else scell.name
+        dcell = tly.create_cell(_unique_name(tly, name))
+        dcell.copy_shapes(scell, lmap)
+        for inst in scell.each_inst():
+            # in micrometers if the dbu differs: insert() converts to the target's
+            ca = inst.cell_inst.dup() if same_dbu else inst.dcell_inst.dup()
+            ca.cell_index = cmap[inst.cell_index]
+            pid = inst.prop_id
+            if pid not in props:
+                props[pid] = tly.properties_id(sly.properties(pid))
+            dcell.insert(ca, props[pid])
+        cmap[ci] = dcell.cell_index()
+        if not empty:
+            index.cells[fp] = dcell.name
+        stats["added"] += 1
+    return tly.cell(cmap[src_top.cell_index()]), stats
@@ -0,0 +1,72 @@
+# contact_array.py
+# Shared contact-cut fitting and placement.
+#
+# feol_contact (BasicsLib.py), the drain contacts of PMOSSwitchArray and
+# contact_cutout_snippet.py all computed the cut count and centring the
+# same way and then inserted one Box per cut in nested loops.  fit_cuts()
+# is that math, once; place_contacts() puts the cuts down either as a
+# single CO cell placed with one CellInstArray (default) or, for flat
+# consumers, as one bulk Region insert.
+#
+# Usage:
+#   import contact_array
+#   nx, x0 = contact_array.fit_cuts(l, 160, 180, margin=50)
+#   ny, y0 = contact_array.fit_cuts(h, 160, 180)
+#   contact_array.place_contacts(cell, ly_co, x0, y0, nx, ny, 160, 340)
+
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+
+def fit_cuts(extent, size, space, margin=0, min_cuts=0):
+    """
+    Fit cuts of the given size and spacing into extent, keeping margin on
+    both ends, and centre them.  Returns (number of cuts, offset of the
+    first cut's lower edge from the start of extent).
+    """
+    pitch = size + space
+    usable = extent - 2 * margin
+    n = max(min_cuts, (usable + space) // pitch)
+    total = n * pitch - space
+    return n, margin + (usable - total) // 2
+
+
+def co_cell(layout, layer, size_x, size_y=None):
+    """The (shared) cell holding one size_x x size_y cut with its lower left at 0,0."""
+    size_y = size_x if size_y is None else size_y
+    info = layout.get_info(layer)
+    name = f"CO_{size_x}x{size_y}_{info.layer}_{info.datatype}"
+    cell = layout.cell(name)
+    if cell is None:
+        cell = layout.create_cell(name)
+        cell.shapes(layer).insert(pya.Box(0, 0, size_x, size_y))
+    return cell
+
+
+def place_contacts(cell, layer, x0, y0, nx, ny, size, pitch_x, pitch_y=None,
+                   size_y=None, array=True):
+    """
+    Place nx x ny cuts with the lower left of the first cut at (x0, y0)
+    (database units).  array=True: one CO cell + one CellInstArray;
+    array=False: all cut boxes in one Region, inserted in bulk.
+    Returns the number of cuts.
+    """
+    pitch_y = pitch_x if pitch_y is None else pitch_y
+    size_y = size if size_y is None else size_y
+    if nx <= 0 or ny <= 0:
+        return 0
+    if array:
+        co = co_cell(cell.layout(), layer, size, size_y)
+        cell.insert(pya.CellInstArray(co.cell_index(), pya.Trans(pya.Vector(x0, y0)),
+                                      pya.Vector(pitch_x, 0), pya.Vector(0, pitch_y), nx, ny))
+    else:
+        reg = pya.Region()
+        for y in range(ny):
+            yb = y0 + y * pitch_y
+            for x in range(nx):
+                xl = x0 + x * pitch_x
+                reg.insert(pya.Box(xl, yb, xl + size, yb + size_y))
+        cell.shapes(layer).insert(reg)
+    return nx * ny
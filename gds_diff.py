@@ -0,0 +1,254 @@
+# gds_diff.py
+# Structural diff of two layouts using per-cell geometry hashes.
+#
+# The *.contents text dumps are compared line by line, which depends on the
+# shape iteration order and grows with the design.  Here every unique cell
+# gets order-independent content hashes:
+#   * one per layer: sum (mod 2**64) of a stable hash of each shape,
+#   * one over its instances, keyed by the child's deep hash,
+#   * a deep hash combining the two, i.e. of the whole tree below the cell.
+# The diff starts at the top cells and only descends into same-named
+# children whose deep hashes differ; for layers whose hashes differ the
+# exact shapes present on one side only are listed.
+#
+# A box and a polygon with the same outline hash alike.  Shape and instance
+# properties are part of the hashes.  An AREF and the equivalent SREFs do
+# NOT compare equal: this is a structural diff, not an XOR.
+#
+# Usage:
+#   python gds_diff.py a.gds b.gds
+#   python gds_diff.py in.gds in_ld2.gds --ignore 5/1,5/2,8/1,8/2   (changes only expected there)
+#   python gds_diff.py a.gds b.gds --json diff.json --max-shapes 100
+#   python gds_diff.py a.gds b.gds --layers 8/0,8/2 --no-texts   (read only these layers, no TEXT)
+# Exit code 0 if the layouts are equal (outside ignored layers), 1 otherwise.
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import Counter, namedtuple
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import layer_remap
+import layout_io
+
+MASK = (1 << 64) - 1
+
+# own: {(L, D): (hash, shape count)}; insts: multiset hash of the instances;
+# deep: hash of own + insts, equal iff the whole trees are equal.
+CellHash = namedtuple("CellHash", "own insts deep")
+
+# kind: "shapes", "instances", "missing_cell" or "top"; layer is (L, D) for
+# "shapes" and None otherwise; only_a / only_b are lists of strings.
+Difference = namedtuple("Difference", "cell kind layer only_a only_b")
+
+
+def digest(s):
+    """Stable 64-bit hash of a string (the same in every run and process)."""
+    return int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little")
+
+
+def props_key(layout, prop_id):
+    """Canonical text of a properties set ('' for none)."""
+    if not prop_id:
+        return ""
+    return " {" + ", ".join(sorted(f"{k!r}: {v!r}" for k, v in layout.properties(prop_id))) + "}"
+
+
+def shape_key(shape, layout=None):
+    """Canonical text of one shape (with its properties if layout is given); boxes are written as polygons."""
+    props = props_key(layout, shape.prop_id) if layout is not None else ""
+    if shape.is_box():
+        return "P" + pya.Polygon(shape.box).to_s() + props
+    if shape.is_polygon():
+        return "P" + shape.polygon.to_s() + props
+    if shape.is_path():
+        return "W" + shape.path.to_s() + props
+    if shape.is_text():
+        return "T" + shape.text.to_s() + props
+    return "O" + shape.to_s() + props
+
+
+def layer_list(layout, ignore=()):
+    """[(layer index, (L, D))] of the layout, without the ignored (L, D)."""
+    return [(li, (info.layer, info.datatype))
+            for li, info in zip(layout.layer_indexes(), layout.layer_infos())
+            if (info.layer, info.datatype) not in ignore]
+
+
+def own_hashes(cell, layers):
+    """{(L, D): (hash, count)} of the shapes of one cell (non-empty layers only)."""
+    layout = cell.layout()
+    out = {}
+    for li, ld in layers:
+        shapes = cell.shapes(li)
+        if shapes.is_empty():
+            continue
+        h = 0
+        for s in shapes.each():
+            h += digest(shape_key(s, layout))
+        out[ld] = (h & MASK, shapes.size())
+    return out
+
+
+def inst_key(inst, child, layout=None):
+    """
+    Canonical text of one instance (array) (with its properties if layout is
+    given); child is the child's name or deep hash.
+    """
+    ca = inst.cell_inst
+    t = ca.cplx_trans.to_s() if ca.is_complex() else ca.trans.to_s()
+    props = props_key(layout, inst.prop_id) if layout is not None else ""
+    if ca.is_regular_array():
+        return f"{child} {t} [{ca.a} x{ca.na}, {ca.b} x{ca.nb}]{props}"
+    return f"{child} {t}{props}"
+
+
+def cell_hashes(layout, ignore=(), names=False, empty_names=False):
+    """
+    {cell index: CellHash} for every cell of the layout, computed bottom-up.
+    Cell names only enter the deep hashes with names=True (every cell) or
+    empty_names=True (cells without shapes and instances, e.g. black boxes,
+    which would otherwise all hash alike).
+    """
+    layers = layer_list(layout, ignore)
+    out = {}
+    for ci in layout.each_cell_bottom_up():
+        cell = layout.cell(ci)
+        own = own_hashes(cell, layers)
+        insts = 0
+        for inst in cell.each_inst():
+            insts += digest(inst_key(inst, f"{out[inst.cell_index].deep:016x}", layout))
+        insts &= MASK
+        if names or (empty_names and cell.is_empty()):
+            deep = digest(repr((cell.name, sorted(own.items()), insts)))
+        else:
+            deep = digest(repr((sorted(own.items()), insts)))
+        out[ci] = CellHash(own, insts, deep)
+    return out
+
+
+def _shape_counter(layout, cell, ld):
+    li = layout.find_layer(*ld)
+    if li is None:
+        return Counter()
+    return Counter(shape_key(s, layout) for s in cell.shapes(li).each())
+
+
+def _inst_counter(cell):
+    layout = cell.layout()
+    return Counter(inst_key(inst, layout.cell(inst.cell_index).name, layout) for inst in cell.each_inst())
+
+
+def _only(a, b, limit):
+    """Elements of multiset a not in b (with multiplicity), at most limit of them."""
+    return sorted((a - b).elements())[:limit]
+
+
+def diff_cells(la, ca, lb, cb, ha, hb, max_shapes):
+    """Differences between two cells themselves (not their children)."""
+    out = []
+    ea, eb = ha[ca.cell_index()], hb[cb.cell_index()]
+    for ld in sorted(set(ea.own) | set(eb.own)):
+        if ea.own.get(ld) != eb.own.get(ld):
+            sa, sb = _shape_counter(la, ca, ld), _shape_counter(lb, cb, ld)
+            out.append(Difference(ca.name, "shapes", ld,
+                                  _only(sa, sb, max_shapes), _only(sb, sa, max_shapes)))
+    if ea.insts != eb.insts:
+        ia, ib = _inst_counter(ca), _inst_counter(cb)
+        if ia != ib:   # else: same placements, the children differ
+            out.append(Difference(ca.name, "instances", None,
+                                  _only(ia, ib, max_shapes), _only(ib, ia, max_shapes)))
+    return out
+
+
+def diff_layouts(la, lb, top_a=None, top_b=None, ignore=(), max_shapes=50):
+    """
+    List of Differences between the trees below top_a and top_b (default:
+    the top cells).  Cells are paired by name; a pair is only examined if
+    its deep hashes differ.
+    """
+    ignore = set(ignore)
+    ha, hb = cell_hashes(la, ignore), cell_hashes(lb, ignore)
+    top_a = top_a or la.top_cell()
+    top_b = top_b or lb.top_cell()
+    out = []
+    if top_a.name != top_b.name:
+        out.append(Difference(top_a.name, "top", None, [top_a.name], [top_b.name]))
+    todo = [(top_a, top_b)]
+    seen = set()
+    while todo:
+        ca, cb = todo.pop()
+        if (ca.cell_index(), cb.cell_index()) in seen:
+            continue
+        seen.add((ca.cell_index(), cb.cell_index()))
+        if ha[ca.cell_index()].deep == hb[cb.cell_index()].deep:
+            continue
+        out.extend(diff_cells(la, ca, lb, cb, ha, hb, max_shapes))
+        kids_a = {la.cell(ci).name: ci for ci in ca.each_child_cell()}
+        kids_b = {lb.cell(ci).name: ci for ci in cb.each_child_cell()}
+        for name in sorted(set(kids_a) | set(kids_b)):
+            if name in kids_a and name in kids_b:
+                todo.append((la.cell(kids_a[name]), lb.cell(kids_b[name])))
+            elif name not in kids_b:
+                out.append(Difference(name, "missing_cell", None, [name], []))
+            else:
+                out.append(Difference(name, "missing_cell", None, [], [name]))
+    return out
+
+
+def format_differences(diffs):
+    """Yield the report line by line."""
+    for d in diffs:
+        if d.kind == "shapes":
+            yield (f">> Cell {d.cell}, Layer {d.layer[0]}, DType {d.layer[1]}: "
+                   f"{len(d.only_a)} shape(s) only in A, {len(d.only_b)} only in B")
+        elif d.kind == "instances":
+            yield f">> Cell {d.cell}: instances differ"
+        elif d.kind == "missing_cell":
+            yield f">> Cell {d.cell}: only in {'A' if d.only_a else 'B'}"
+            continue
+        else:
+            yield f">> Top cell: {d.only_a[0]} (A) vs {d.only_b[0]} (B)"
+            continue
+        for s in d.only_a:
+            yield f"  - {s}"
+        for s in d.only_b:
+            yield f"  + {s}"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Hierarchical hash-based diff of two layouts")
+    ap.add_argument("a")
+    ap.add_argument("b")
+    ap.add_argument("--ignore", default="", help='layers to leave out, e.g. "5/1,5/2"')
+    ap.add_argument("--layers", default="", help='compare (and read) only these layers, e.g. "8/0,8/2"')
+    ap.add_argument("--no-texts", action="store_true", help="do not read TEXT shapes")
+    ap.add_argument("--max-shapes", type=int, default=20, help="shapes listed per differing cell/layer")
+    ap.add_argument("--json", default=None, help="also write the differences as JSON")
+    args = ap.parse_args(argv)
+
+    ignore = {layer_remap.parse_layer_pair(t.strip()) for t in args.ignore.split(",") if t.strip()}
+
+    layers = [layer_remap.parse_layer_pair(t.strip()) for t in args.layers.split(",") if t.strip()]
+    opt = layout_io.load_options(layers or None, texts=not args.no_texts)
+    la, lb = pya.Layout(), pya.Layout()
+    la.read(args.a, opt)
+    lb.read(args.b, opt)
+    diffs = diff_layouts(la, lb, ignore=ignore, max_shapes=args.max_shapes)
+    for line in format_differences(diffs):
+        print(line)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([d._asdict() for d in diffs], f, indent=2)
+    print(f"{len(diffs)} difference(s)" if diffs else "Layouts are equal")
+    return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
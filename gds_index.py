@@ -0,0 +1,232 @@
+# gds_index.py
+# Structure offset index of a GDSII file, for random access to single cells.
+#
+# Looking at one cell of a big stream (PCSOURCE2 in pcsource66x2.gds, one
+# block of a multi-GB chip) meant reading the whole file into a Layout.
+# Here the stream is scanned once, record by record over an mmap
+# (gds_stream), and for every structure its byte offset and length, the
+# names it references (SREF/AREF) and the bounding box of its own elements
+# are kept in a sidecar <file>.gdsindex.json.  The sidecar is trusted as
+# long as the file size and mtime still match it.
+#
+# extract() then writes a small, valid GDS holding just one cell and its
+# dependency closure: the library header, the structures' byte spans
+# (copied from the mmap in file order) and ENDLIB -- no parsing at all.
+# read_cell() does that into a temporary file and reads it as a Layout.
+#
+# The bbox is the XY extent of the structure's own BOUNDARY / PATH / BOX
+# elements in database units (path widths and children not included);
+# None for structures without such elements.  Plain (uncompressed) GDSII
+# only.
+#
+# Usage:
+#   python gds_index.py index big.gds
+#   python gds_index.py list big.gds                   (name, size, children, bbox)
+#   python gds_index.py extract big.gds PCSOURCE2 pcsource2.gds
+#
+#   import gds_index
+#   ly = gds_index.read_cell("pcsource66x2.gds", "PCSOURCE2")
+
+import argparse
+import json
+import os
+import struct
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import gds_stream
+from gds_stream import (AREF, BGNSTR, BOUNDARY, BOX, ENDLIB, ENDSTR, HEADER, PATH, SNAME,
+                        SREF, STRNAME, XY)
+
+SUFFIX = ".gdsindex.json"
+_EXTENT = (BOUNDARY, PATH, BOX)
+
+
+def _xy_extent(buf, pos, length):
+    n = (length - 4) // 4
+    v = struct.unpack_from(f">{n}i", buf, pos + 4)
+    xs, ys = v[0::2], v[1::2]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _union(a, b):
+    if a is None:
+        return b
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+class CellIndex:
+    """Byte spans, references and own bboxes of the structures of one GDS file."""
+
+    def __init__(self, header, endlib, cells):
+        self.header = header   # [offset, length] of the records before the first BGNSTR
+        self.endlib = endlib   # offset of the ENDLIB record
+        self.cells = cells     # name -> {"offset", "length", "children", "bbox"}
+
+    @classmethod
+    def build(cls, path, bboxes=True):
+        """Scan path once and index its structures."""
+        buf = gds_stream.open_mmap(path)
+        try:
+            cells = {}
+            header_end = endlib = None
+            cur = kind = None
+            first = True
+            for pos, length, rtype in gds_stream.iter_records(buf):
+                if first:
+                    if rtype != HEADER:
+                        raise gds_stream.GDSFormatError(f"{path}: not a GDSII stream")
+                    first = False
+                if rtype == BGNSTR:
+                    if header_end is None:
+                        header_end = pos
+                    cur = {"offset": pos, "length": 0, "children": [], "bbox": None}
+                elif cur is None:
+                    if rtype == ENDLIB:
+                        endlib = pos
+                elif rtype == STRNAME:
+                    cells[gds_stream.read_name(buf, pos, length)] = cur
+                elif rtype in (SREF, AREF, BOUNDARY, PATH, BOX):
+                    kind = rtype
+                elif rtype == SNAME:
+                    name = gds_stream.read_name(buf, pos, length)
+                    if name not in cur["children"]:
+                        cur["children"].append(name)
+                elif rtype == XY and bboxes and kind in _EXTENT:
+                    cur["bbox"] = _union(cur["bbox"], _xy_extent(buf, pos, length))
+                elif rtype == ENDSTR:
+                    cur["length"] = pos + length - cur["offset"]
+                    cur = kind = None
+                elif rtype == gds_stream.ENDEL:
+                    kind = None
+        finally:
+            buf.close()
+        if endlib is None:
+            raise gds_stream.GDSFormatError(f"{path}: no ENDLIB record")
+        header_end = endlib if header_end is None else header_end
+        return cls([0, header_end], endlib, cells)
+
+    @classmethod
+    def load(cls, path):
+        """Index from path's sidecar, or None if missing or stale."""
+        try:
+            with open(path + SUFFIX) as f:
+                doc = json.load(f)
+            st = os.stat(path)
+        except (OSError, ValueError):
+            return None
+        if doc.get("size") != st.st_size or doc.get("mtime_ns") != st.st_mtime_ns:
+            return None
+        return cls(doc["header"], doc["endlib"], doc["cells"])
+
+    @classmethod
+    def for_file(cls, path, save=True):
+        """The index of path, from its sidecar if still valid, else built (and saved)."""
+        idx = cls.load(path)
+        if idx is None:
+            idx = cls.build(path)
+            if save:
+                try:
+                    idx.save(path)
+                except OSError:
+                    pass   # read-only location: use the index without a sidecar
+        return idx
+
+    def save(self, path):
+        """Write the sidecar for the GDS file at path."""
+        st = os.stat(path)
+        with open(path + SUFFIX, "w") as f:
+            json.dump({"size": st.st_size, "mtime_ns": st.st_mtime_ns, "header": self.header,
+                       "endlib": self.endlib, "cells": self.cells}, f)
+
+    def top_cells(self):
+        """Names of the structures not referenced by any other structure."""
+        used = {c for e in self.cells.values() for c in e["children"]}
+        return [n for n in self.cells if n not in used]
+
+    def closure(self, name):
+        """name and every structure below it, in file order."""
+        if name not in self.cells:
+            raise KeyError(f"no structure {name!r}")
+        seen, todo = set(), [name]
+        while todo:
+            n = todo.pop()
+            if n in seen or n not in self.cells:   # references to undefined cells are kept as they are
+                continue
+            seen.add(n)
+            todo.extend(self.cells[n]["children"])
+        return sorted(seen, key=lambda n: self.cells[n]["offset"])
+
+
+def extract(path, name, out, index=None):
+    """
+    Write cell name of the GDS file path with its dependency closure to out
+    (a GDS file with the same library header and units).  Returns
+    {"cells": n, "bytes": n}.
+    """
+    index = index or CellIndex.for_file(path)
+    names = index.closure(name)
+    buf = gds_stream.open_mmap(path)
+    view = memoryview(buf)   # slices of the view are not copied
+    try:
+        with open(out, "wb") as f:
+            f.write(view[index.header[0]:index.header[0] + index.header[1]])
+            for n in names:
+                e = index.cells[n]
+                f.write(view[e["offset"]:e["offset"] + e["length"]])
+            f.write(view[index.endlib:index.endlib + 4])
+            written = f.tell()
+    finally:
+        view.release()
+        buf.close()
+    return {"cells": len(names), "bytes": written}
+
+
+def read_cell(path, name, index=None):
+    """A pya.Layout holding only cell name of path and the cells below it."""
+    try:
+        from klayout import db as pya
+    except Exception:
+        import pya  # if running inside KLayout's Python
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = os.path.join(tmpdir, "cell.gds")
+        extract(path, name, tmp, index)
+        ly = pya.Layout()
+        ly.read(tmp)
+    return ly
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Structure offset index and single-cell extraction for GDSII")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("index", help="(re)build the sidecar index")
+    sp.add_argument("src")
+    sp.add_argument("--no-bbox", action="store_true", help="skip the XY extents (faster)")
+    sp = sub.add_parser("list", help="list the structures")
+    sp.add_argument("src")
+    sp = sub.add_parser("extract", help="write one cell and everything below it")
+    sp.add_argument("src")
+    sp.add_argument("cell")
+    sp.add_argument("out")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "index":
+        idx = CellIndex.build(args.src, bboxes=not args.no_bbox)
+        idx.save(args.src)
+        print(f"Indexed {len(idx.cells)} structure(s) of {args.src} -> {args.src + SUFFIX}")
+    elif args.cmd == "list":
+        idx = CellIndex.for_file(args.src)
+        tops = set(idx.top_cells())
+        for name, e in sorted(idx.cells.items(), key=lambda kv: kv[1]["offset"]):
+            mark = " (top)" if name in tops else ""
+            print(f"{name}{mark}: {e['length']} bytes at {e['offset']}, "
+                  f"children {', '.join(e['children']) or '-'}, bbox {e['bbox']}")
+    else:
+        res = extract(args.src, args.cell, args.out)
+        print(f"Wrote {args.out}: {res['cells']} cell(s), {res['bytes']} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
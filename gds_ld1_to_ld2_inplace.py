@@ -1,35 +1,45 @@
 # gds_ld1_to_ld2_inplace.py
 # Run: klayout -b -r gds_ld1_to_ld2_inplace.py -rd SRC=in.gds -rd OUT=out.gds
+#      klayout -b -r gds_ld1_to_ld2_inplace.py -rd SRC=in.gds -rd OUT=out.gds -rd STREAM=1
+#      (STREAM=1 rewrites the GDS records directly, without loading a Layout;
+#       the context info cell, if any, is passed through unchanged)
+#      add -rd REPORT=run.json for a JSON phase report, -rd PROFILE=1 for cProfile output
 import sys, os
 try:
     from klayout import db as pya
 except:
     import pya
 
-def rd(k, d=None):
-    a=sys.argv
-    return next((a[i+1].split("=",1)[1] for i,x in enumerate(a) if x=="-rd" and a[i+1].startswith(k+"=")), os.environ.get(k,d))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import gds_stream, layer_remap, layout_io
+from run_report import RunReport, flag, rd
 
 SRC = rd("SRC","swcascsrc_playground.gds")
 OUT = rd("OUT","swcasc.gds")
+STREAM = flag("STREAM")
+report = RunReport("gds_ld1_to_ld2_inplace")
 
-ly = pya.Layout(); ly.read(SRC)
+if STREAM:
+    # record-level (L,1) -> (L,2) for ALL elements, constant memory
+    with report.phase("stream_rewrite", hot=True):
+        res = gds_stream.rewrite(SRC, OUT, [gds_stream.DatatypeMap({1: 2}, texts=True)])
+    report.info.update(res)
+    print("Wrote", OUT, "changed", res["changed"], "of", res["records"], "records")
+else:
+    with report.phase("read"):
+        ly = pya.Layout(); ly.read(SRC)
 
-# move ALL shapes on (L,1) -> (L,2); keep arrays; no new cells
-layers = {ly.get_info(li).layer for li in ly.layer_indexes() if ly.get_info(li).datatype == 1}
-for L in layers:
-    s_li = ly.find_layer(pya.LayerInfo(L,1))
-    if s_li < 0: continue
-    d_li = ly.layer(pya.LayerInfo(L,2))
-    for c in ly.each_cell():
-        shs = c.shapes(s_li)
-        if shs.is_empty(): continue
-        tmp = [s for s in shs.each()]
-        for s in tmp: c.shapes(d_li).insert(s)
-        shs.clear()
-
-# write plain GDS (no PCell/library context) — exports directly, not embedded
-opt = pya.SaveLayoutOptions(); opt.write_context_info = False
-ly.write(OUT, opt)
-print("Wrote", OUT)
+    # move ALL shapes on (L,1) -> (L,2); keep arrays; no new cells
+    with report.phase("remap", hot=True):
+        moved = layer_remap.remap_layers(ly, layer_remap.datatype_map(ly, 1, 2))
 
+    # write plain GDS (no PCell/library context) — exports directly, not embedded
+    # (OUT=*.oas / *.gds.gz pick OASIS / gzip, see layout_io.py)
+    with report.phase("write"):
+        written = layout_io.write_layout(ly, OUT, context_info=False)
+    report.layout("out", ly)
+    report.info["moved"] = layer_remap.format_counts(moved)
+    print("Wrote", layout_io.format_info(written), "moved", layer_remap.format_counts(moved) or "nothing")
+print("Phases:", report.summary())
+if report.write():
+    print("Report:", report.path)
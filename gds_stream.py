@@ -0,0 +1,411 @@
+# gds_stream.py
+# Record-level streaming GDSII reader/writer -- never builds a pya.Layout.
+#
+# Datatype remaps (gds_ld1_to_ld2_inplace.py) and the $$$CONTEXT_INFO$$$
+# rename (sanitize_import.py) only touch LAYER/DATATYPE/TEXTTYPE/BOXTYPE and
+# STRNAME/SNAME records.  This module walks the stream record by record over
+# an mmap, passes untouched byte spans through in bulk, and lets pluggable
+# transforms rewrite just those records.  Memory stays constant regardless
+# of the file size.
+#
+# Transforms can also drop elements (keep()) or whole structures
+# (keep_structure()); untouched data is still copied through as raw bytes.
+# TextsOnly keeps the hierarchy plus TEXT elements, e.g. as a small input for
+# text-only tools.
+#
+# Usage:
+#   python gds_stream.py in.gds out.gds --datatype 1:2
+#   python gds_stream.py in.gds out.gds --layer 5/0:67/44 --text 8/25:8/2
+#   python gds_stream.py in.gds out.gds --rename '$$$CONTEXT_INFO$$$=__CONTEXT_INFO__'
+#   python gds_stream.py in.gds texts.gds --texts-only --drop-cell '$$$CONTEXT_INFO$$$'
+#
+#   import gds_stream
+#   gds_stream.rewrite("in.gds", "out.gds", [gds_stream.DatatypeMap({1: 2})])
+
+import argparse
+import mmap
+import struct
+import sys
+
+# ---- record types (GDSII stream format) ----
+HEADER, BGNLIB, LIBNAME, UNITS, ENDLIB = 0x00, 0x01, 0x02, 0x03, 0x04
+BGNSTR, STRNAME, ENDSTR = 0x05, 0x06, 0x07
+BOUNDARY, PATH, SREF, AREF, TEXT = 0x08, 0x09, 0x0A, 0x0B, 0x0C
+LAYER, DATATYPE, WIDTH, XY, ENDEL, SNAME, COLROW = 0x0D, 0x0E, 0x0F, 0x10, 0x11, 0x12, 0x13
+NODE, TEXTTYPE, STRING, STRANS, MAG, ANGLE = 0x15, 0x16, 0x19, 0x1A, 0x1B, 0x1C
+NODETYPE, BOX, BOXTYPE = 0x2A, 0x2D, 0x2E
+
+ELEMENTS = {BOUNDARY: "boundary", PATH: "path", SREF: "sref", AREF: "aref",
+            TEXT: "text", NODE: "node", BOX: "box"}
+TYPE_RECORDS = (DATATYPE, TEXTTYPE, BOXTYPE, NODETYPE)
+
+_HDR = struct.Struct(">HBB")
+_I2 = struct.Struct(">H")  # LAYER/DATATYPE values are used unsigned
+
+
+class GDSFormatError(Exception):
+    pass
+
+
+# ---- reading ----
+def iter_records(buf, pos=0, end=None):
+    """
+    Yield (offset, length, record_type) for every record from pos up to and
+    including ENDLIB.  The payload is buf[offset + 4:offset + length].
+    """
+    end = len(buf) if end is None else end
+    unpack = _HDR.unpack_from
+    while pos + 4 <= end:
+        length, rtype, _ = unpack(buf, pos)
+        if length < 4:
+            if length == 0 and rtype == 0:
+                return  # zero padding after the last record
+            raise GDSFormatError(f"bad record length {length} at offset {pos}")
+        yield pos, length, rtype
+        if rtype == ENDLIB:
+            return
+        pos += length
+
+
+def read_name(buf, pos, length):
+    """Decode an ASCII string record payload (STRNAME, SNAME, STRING, ...)."""
+    return bytes(buf[pos + 4:pos + length]).rstrip(b"\0").decode("ascii", "replace")
+
+
+def read_i2(buf, pos):
+    """Decode the single 2-byte integer payload of LAYER/DATATYPE/... records."""
+    return _I2.unpack_from(buf, pos + 4)[0]
+
+
+def open_mmap(path):
+    """Read-only mmap of a file (the caller closes it)."""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# ---- writing ----
+def string_record(rtype, text):
+    data = text.encode("ascii")
+    if len(data) % 2:
+        data += b"\0"
+    return _HDR.pack(len(data) + 4, rtype, 0x06) + data
+
+
+def i2_record(rtype, value):
+    return _HDR.pack(6, rtype, 0x02) + _I2.pack(value)
+
+
+# ---- pluggable transforms ----
+class Transform:
+    """
+    Base class: identity.  layer() sees element kind ("boundary", "path",
+    "text", "box", "node") and the (layer, type) pair and returns the new
+    pair; name() sees a structure name (STRNAME and SNAME) and returns the
+    new name.  keep() decides per element (before layer()), with pair None
+    for SREF/AREF; keep_structure() per structure name (before name()).
+    """
+    def layer(self, kind, pair):
+        return pair
+
+    def name(self, name):
+        return name
+
+    def keep(self, kind, pair):
+        return True
+
+    def keep_structure(self, name):
+        return True
+
+
+def _count(moved, pair):
+    moved[pair] = moved.get(pair, 0) + 1
+
+
+class LayerMap(Transform):
+    """
+    (L, D) -> (L, D) for geometry elements (and TEXT with texts=True).
+    self.moved counts the elements moved off each source (L, D).
+    """
+    def __init__(self, mapping, texts=False):
+        self.mapping = dict(mapping)
+        self.texts = texts
+        self.moved = {}
+
+    def layer(self, kind, pair):
+        if (kind == "text" and not self.texts) or pair not in self.mapping:
+            return pair
+        _count(self.moved, pair)
+        return self.mapping[pair]
+
+
+class DatatypeMap(Transform):
+    """
+    D -> D on every layer for geometry elements (and TEXT with texts=True).
+    self.moved counts the elements moved off each source (L, D).
+    """
+    def __init__(self, mapping, texts=False):
+        self.mapping = dict(mapping)
+        self.texts = texts
+        self.moved = {}
+
+    def layer(self, kind, pair):
+        if (kind == "text" and not self.texts) or pair[1] not in self.mapping:
+            return pair
+        _count(self.moved, pair)
+        return pair[0], self.mapping[pair[1]]
+
+
+class TextLayerMap(Transform):
+    """
+    (L, T) -> (L, T) for TEXT elements only (label -> pin layer moves), or
+    every TEXT to all_to.  The (L, T) pairs seen on TEXT are collected in
+    self.seen, the TEXTs moved off each pair are counted in self.moved.
+    """
+    def __init__(self, mapping=None, all_to=None):
+        self.mapping = dict(mapping or {})
+        self.all_to = tuple(all_to) if all_to else None
+        self.seen = set()
+        self.moved = {}
+
+    def layer(self, kind, pair):
+        if kind != "text":
+            return pair
+        self.seen.add(pair)
+        new = self.all_to or self.mapping.get(pair, pair)
+        if new != pair:
+            _count(self.moved, pair)
+        return new
+
+
+class ElementFilter(Transform):
+    """
+    Keep only elements of the given kinds and/or on the given (L, D) pairs.
+    SREF/AREF are always kept, so the hierarchy stays intact.
+    """
+    def __init__(self, kinds=None, layers=None):
+        self.kinds = set(kinds) if kinds is not None else None
+        self.layers = set(layers) if layers is not None else None
+
+    def keep(self, kind, pair):
+        if pair is None:
+            return True
+        return ((self.kinds is None or kind in self.kinds)
+                and (self.layers is None or pair in self.layers))
+
+
+class TextsOnly(ElementFilter):
+    """Hierarchy plus TEXT elements; polygons, paths and boxes are dropped."""
+    def __init__(self):
+        super().__init__(kinds={"text"})
+
+
+class DropStructures(Transform):
+    """Leave out the named structures (their references are not touched)."""
+    def __init__(self, names):
+        self.names = set(names)
+
+    def keep_structure(self, name):
+        return name not in self.names
+
+
+class StructureNames(Transform):
+    """
+    Changes nothing; collects the names of the structures written (defined,
+    in file order) and the names referenced, for top cells without a second
+    pass.  Put it last, so structures dropped by the other transforms are
+    not counted.
+    """
+    def __init__(self):
+        self.defined = []
+        self.referenced = set()
+        self._strname = False
+
+    def keep_structure(self, name):
+        self._strname = True   # the next name() call is this STRNAME (as renamed)
+        return True
+
+    def name(self, name):
+        if self._strname:
+            self.defined.append(name)
+            self._strname = False
+        else:
+            self.referenced.add(name)
+        return name
+
+    def tops(self):
+        """Names of the structures not referenced anywhere."""
+        return [n for n in self.defined if n not in self.referenced]
+
+    @classmethod
+    def scan(cls, path):
+        """The names of path, from a read-only walk over its STRNAME/SNAME records."""
+        names = cls()
+        buf = open_mmap(path)
+        try:
+            for pos, length, rtype in iter_records(buf):
+                if rtype == STRNAME:
+                    names.keep_structure(read_name(buf, pos, length))
+                if rtype in (STRNAME, SNAME):
+                    names.name(read_name(buf, pos, length))
+        finally:
+            buf.close()
+        return names
+
+
+class CellRename(Transform):
+    """Rename structures, in their definition and in every reference."""
+    def __init__(self, mapping):
+        self.mapping = dict(mapping)
+
+    def name(self, name):
+        return self.mapping.get(name, name)
+
+
+def rewrite(src, out, transforms, chunk=1 << 20):
+    """
+    Stream src to out applying transforms.  Unchanged byte spans are copied
+    straight from the mmap.  Returns {"records": n, "changed": n,
+    "dropped": n (elements and structures left out), "bytes": n}.
+    """
+    transforms = list(transforms)
+    renames = any(type(t).name is not Transform.name for t in transforms)
+    relayers = any(type(t).layer is not Transform.layer for t in transforms)
+    filters = any(type(t).keep is not Transform.keep for t in transforms)
+    sfilters = any(type(t).keep_structure is not Transform.keep_structure for t in transforms)
+
+    buf = open_mmap(src)
+    view = memoryview(buf)   # slices of the view are not copied
+    records = changed = dropped = 0
+    try:
+        with open(out, "wb", buffering=chunk) as f:
+            span = 0          # start of the pending unchanged span
+            kind = None       # current element kind
+            layer_pos = None  # pending LAYER record offset
+            elem_pos = None   # start of the current element
+            str_pos = None    # start of the current structure (BGNSTR)
+            skip = None       # record type ending the part being dropped
+            last = 0
+            for pos, length, rtype in iter_records(buf):
+                records += 1
+                last = pos + length
+                if skip is not None:
+                    if rtype == skip:
+                        span = pos + length
+                        skip = None
+                        kind = layer_pos = None
+                    continue
+                new = None
+                if rtype == BGNSTR:
+                    str_pos = pos
+                elif rtype in ELEMENTS:
+                    kind = ELEMENTS[rtype]
+                    elem_pos = pos
+                    if filters and rtype in (SREF, AREF) and not all(t.keep(kind, None) for t in transforms):
+                        f.write(view[span:pos])
+                        skip = ENDEL
+                        dropped += 1
+                        continue
+                elif rtype == ENDEL:
+                    kind = None
+                elif (relayers or filters) and rtype == LAYER and kind is not None:
+                    layer_pos = pos
+                elif (relayers or filters) and rtype in TYPE_RECORDS and layer_pos is not None:
+                    pair = old = (read_i2(buf, layer_pos), read_i2(buf, pos))
+                    if filters and not all(t.keep(kind, pair) for t in transforms):
+                        f.write(view[span:elem_pos])
+                        skip = ENDEL
+                        dropped += 1
+                        continue
+                    for t in transforms:
+                        pair = t.layer(kind, pair)
+                    if pair != old:
+                        # LAYER and the type record are both 6 bytes; the
+                        # records in between (if any) are copied unchanged.
+                        f.write(view[span:layer_pos])
+                        f.write(i2_record(LAYER, pair[0]))
+                        f.write(view[layer_pos + 6:pos])
+                        f.write(i2_record(rtype, pair[1]))
+                        span = pos + length
+                        changed += 1
+                    layer_pos = None
+                elif (renames or sfilters) and rtype in (STRNAME, SNAME):
+                    name = old = read_name(buf, pos, length)
+                    if sfilters and rtype == STRNAME and not all(t.keep_structure(name) for t in transforms):
+                        f.write(view[span:str_pos])
+                        skip = ENDSTR
+                        dropped += 1
+                        continue
+                    for t in transforms:
+                        name = t.name(name)
+                    if name != old:
+                        new = string_record(rtype, name)
+                if new is not None:
+                    f.write(view[span:pos])
+                    f.write(new)
+                    span = pos + length
+                    changed += 1
+            f.write(view[span:last])
+            written = f.tell()
+    finally:
+        view.release()
+        buf.close()
+    return {"records": records, "changed": changed, "dropped": dropped, "bytes": written}
+
+
+# ---- command line ----
+def _pair(s):
+    l, d = s.split("/")
+    return int(l), int(d)
+
+
+def _pairs(items):
+    m = {}
+    for item in items:
+        for kv in item.split(","):
+            if kv.strip():
+                src, dst = kv.split(":")
+                m[_pair(src)] = _pair(dst)
+    return m
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Streaming GDSII record rewriter")
+    ap.add_argument("src")
+    ap.add_argument("out")
+    ap.add_argument("--layer", action="append", default=[], help="L/D:L/D[,...] geometry layer map")
+    ap.add_argument("--datatype", action="append", default=[], help="D:D[,...] datatype map on all layers")
+    ap.add_argument("--text", action="append", default=[], help="L/T:L/T[,...] text layer move")
+    ap.add_argument("--rename", action="append", default=[], help="OLD=NEW cell rename")
+    ap.add_argument("--with-texts", action="store_true", help="--layer/--datatype also apply to TEXT")
+    ap.add_argument("--texts-only", action="store_true", help="keep only the hierarchy and TEXT elements")
+    ap.add_argument("--keep-layer", action="append", default=[], help="L/D[,...] keep only these layers")
+    ap.add_argument("--drop-cell", action="append", default=[], help="leave out this structure")
+    args = ap.parse_args(argv)
+
+    transforms = []
+    if args.layer:
+        transforms.append(LayerMap(_pairs(args.layer), texts=args.with_texts))
+    if args.datatype:
+        transforms.append(DatatypeMap({int(a): int(b) for item in args.datatype
+                                       for a, b in (kv.split(":") for kv in item.split(",") if kv.strip())},
+                                      texts=args.with_texts))
+    if args.text:
+        transforms.append(TextLayerMap(_pairs(args.text)))
+    if args.rename:
+        transforms.append(CellRename(kv.split("=", 1) for kv in args.rename))
+    if args.texts_only:
+        transforms.append(TextsOnly())
+    if args.keep_layer:
+        transforms.append(ElementFilter(layers=[_pair(p) for item in args.keep_layer
+                                                for p in item.split(",") if p.strip()]))
+    if args.drop_cell:
+        transforms.append(DropStructures(args.drop_cell))
+
+    res = rewrite(args.src, args.out, transforms)
+    print(f"Wrote {args.out}: {res['records']} records, {res['changed']} changed, "
+          f"{res['dropped']} dropped, {res['bytes']} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
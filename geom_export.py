@@ -0,0 +1,104 @@
+# geom_export.py
+# Columnar NumPy export of cell geometry.
+#
+# ChatGPT_Ex1.py turned every box, polygon vertex and path point into Python
+# tuples and formatted them as text.  export_cell() returns, per
+# (layer, datatype), contiguous int64 arrays instead:
+#
+#   boxes         (N, 4)  left, bottom, right, top
+#   poly_xy       (V, 2)  all polygon hull vertices, polygon after polygon
+#   poly_offsets  (P+1,)  CSR offsets: polygon k is poly_xy[o[k]:o[k+1]]
+#   path_xy       (V, 2)  all path spine points
+#   path_offsets  (Q+1,)  CSR offsets into path_xy
+#   path_width    (Q,)
+#   text_xy       (T, 2)  text anchor positions
+#   text_strings  (T,)    text strings (object array)
+#
+# Coordinates are in database units.  Polygons with holes are exported with
+# their holes resolved into the hull (Polygon.resolved_holes), so every
+# polygon is one CSR ring.  Values are gathered into array.array buffers and
+# wrapped with numpy.frombuffer, so no per-shape Python lists or tuples are
+# built besides the pya objects the shape iterator hands out.
+#
+# Usage:
+#   import geom_export
+#   geo = geom_export.export_cell(layout, layout.top_cell())
+#   b = geo[(8, 0)].boxes
+#   area = ((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])).sum()
+
+from array import array
+from collections import namedtuple
+import numpy as np
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+LayerGeometry = namedtuple(
+    "LayerGeometry",
+    "boxes poly_xy poly_offsets path_xy path_offsets path_width text_xy text_strings")
+
+
+def _i64(buf, cols=None):
+    a = np.frombuffer(buf, dtype=np.int64) if len(buf) else np.zeros(0, dtype=np.int64)
+    return a.reshape(-1, cols) if cols else a
+
+
+def export_shapes(shapes):
+    """Export one pya.Shapes container as a LayerGeometry."""
+    boxes = array("q")
+    for sh in shapes.each(pya.Shapes.SBoxes):
+        b = sh.box
+        boxes.extend((b.left, b.bottom, b.right, b.top))
+
+    poly_xy, poly_off = array("q"), array("q", (0,))
+    for sh in shapes.each(pya.Shapes.SPolygons):
+        poly = sh.polygon
+        if poly.holes():
+            poly = poly.resolved_holes()
+        for pt in poly.each_point_hull():
+            poly_xy.extend((pt.x, pt.y))
+        poly_off.append(len(poly_xy) // 2)
+
+    path_xy, path_off, path_w = array("q"), array("q", (0,)), array("q")
+    for sh in shapes.each(pya.Shapes.SPaths):
+        path = sh.path
+        for pt in path.each_point():
+            path_xy.extend((pt.x, pt.y))
+        path_off.append(len(path_xy) // 2)
+        path_w.append(path.width)
+
+    text_xy, strings = array("q"), []
+    for sh in shapes.each(pya.Shapes.STexts):
+        t = sh.text
+        d = t.trans.disp
+        text_xy.extend((d.x, d.y))
+        strings.append(t.string)
+
+    return LayerGeometry(
+        _i64(boxes, 4), _i64(poly_xy, 2), _i64(poly_off),
+        _i64(path_xy, 2), _i64(path_off), _i64(path_w),
+        _i64(text_xy, 2), np.array(strings, dtype=object))
+
+
+def export_cell(layout, cell):
+    """Map (layer, datatype) -> LayerGeometry for the shapes of one cell."""
+    out = {}
+    for li, info in zip(layout.layer_indexes(), layout.layer_infos()):
+        shapes = cell.shapes(li)
+        if shapes.is_empty():
+            continue
+        out[(info.layer, info.datatype)] = export_shapes(shapes)
+    return out
+
+
+def export_layout(layout, cells=None):
+    """Map cell name -> export_cell() result, for all cells or the given ones."""
+    cells = cells if cells is not None else layout.each_cell()
+    return {c.name: export_cell(layout, c) for c in cells}
+
+
+def rings(xy, offsets):
+    """Iterate the CSR rings as (V, 2) array views."""
+    for k in range(len(offsets) - 1):
+        yield xy[offsets[k]:offsets[k + 1]]
@@ -0,0 +1,144 @@
+# hier_dump.py
+# Visit-once hierarchical dumper.
+#
+# ChatGPT_Ex2.process_cell() recursed through cell.each_child_cell() without
+# a memo, so a subcell used from N parents was walked N times.  Here every
+# unique cell below the top cell is visited exactly once, bottom-up, and its
+# shapes are emitted as one CellRecord through a generator.
+#
+# Flat mode reuses those per-cell records: the accumulated instance
+# transformations are computed top-down once, and each placement yields a
+# CellRecord whose shapes are transformed lazily, only when consumed.
+#
+# Usage:
+#   import hier_dump
+#   for rec in hier_dump.each_cell_record(layout, top):
+#       print(rec.name, len(rec.shapes))
+#   for line in hier_dump.dump_lines(layout, top, flat=True):
+#       print(line)
+
+from collections import namedtuple
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+# kind is one of "box", "polygon", "path", "text" or "other"; obj is the
+# pya.Box/Polygon/Path/Text (or the shape type number for "other").
+ShapeRecord = namedtuple("ShapeRecord", "layer datatype kind index obj")
+
+# trans is None for hierarchical records (local coordinates) and the
+# accumulated pya.ICplxTrans from the top cell in flat mode.
+CellRecord = namedtuple("CellRecord", "cell_index name trans shapes")
+
+
+def cells_bottom_up(layout, top):
+    """Cell indexes of top and everything it calls, children before parents."""
+    wanted = set(top.called_cells())
+    wanted.add(top.cell_index())
+    return [ci for ci in layout.each_cell_bottom_up() if ci in wanted]
+
+
+def cell_shapes(layout, cell):
+    """All shapes of one cell as ShapeRecords, in layer order."""
+    out = []
+    for idx, info in zip(layout.layer_indexes(), layout.layer_infos()):
+        shapes = cell.shapes(idx)
+        if shapes.is_empty():
+            continue
+        layer_no, datatype = info.layer, info.datatype
+        for i, shape in enumerate(shapes.each()):
+            if shape.is_box():
+                out.append(ShapeRecord(layer_no, datatype, "box", i, shape.box))
+            elif shape.is_polygon():
+                out.append(ShapeRecord(layer_no, datatype, "polygon", i, shape.polygon))
+            elif shape.is_path():
+                out.append(ShapeRecord(layer_no, datatype, "path", i, shape.path))
+            elif shape.is_text():
+                out.append(ShapeRecord(layer_no, datatype, "text", i, shape.text))
+            else:
+                out.append(ShapeRecord(layer_no, datatype, "other", i, shape.shape_type))
+    return out
+
+
+def placements(layout, top):
+    """
+    Map cell index -> list of pya.ICplxTrans placing that cell in top.
+    Computed top-down in one pass, so each instance array is expanded once
+    per placement of its parent rather than per recursion path.
+    """
+    wanted = set(top.called_cells())
+    wanted.add(top.cell_index())
+    place = {top.cell_index(): [pya.ICplxTrans()]}
+    for ci in layout.each_cell_top_down():
+        if ci not in wanted or ci not in place:
+            continue
+        parents = place[ci]
+        for inst in layout.cell(ci).each_inst():
+            child = place.setdefault(inst.cell_index, [])
+            for t in inst.cell_inst.each_cplx_trans():
+                child.extend(p * t for p in parents)
+    return place
+
+
+def _transformed(shapes, trans):
+    for s in shapes:
+        if s.kind == "other":
+            yield s
+        else:
+            yield s._replace(obj=s.obj.transformed(trans))
+
+
+def each_cell_record(layout, top=None, flat=False):
+    """
+    Yield one CellRecord per unique cell below top (bottom-up).
+
+    With flat=True, yield one CellRecord per placement instead; its shapes
+    are a generator that applies the placement transform on the fly.
+    """
+    top = top or layout.top_cell()
+    order = cells_bottom_up(layout, top)
+    if not flat:
+        for ci in order:
+            cell = layout.cell(ci)
+            yield CellRecord(ci, cell.name, None, cell_shapes(layout, cell))
+        return
+
+    place = placements(layout, top)
+    for ci in order:
+        cell = layout.cell(ci)
+        local = cell_shapes(layout, cell)
+        if not local:
+            continue
+        for t in place.get(ci, ()):
+            yield CellRecord(ci, cell.name, t, _transformed(local, t))
+
+
+def format_shape(s):
+    """One text line per shape, in the format of the *.contents dumps."""
+    head = f"Layer {s.layer}, DType {s.datatype}"
+    if s.kind == "box":
+        b = s.obj
+        pts = [(b.p1.x, b.p1.y), (b.p2.x, b.p1.y), (b.p2.x, b.p2.y), (b.p1.x, b.p2.y)]
+        return f"{head}, Box #{s.index}: 4 points → {pts}"
+    if s.kind == "polygon":
+        pts = [(pt.x, pt.y) for pt in s.obj.each_point_hull()]
+        return f"{head}, Polygon #{s.index}: {len(pts)} points → {pts}"
+    if s.kind == "path":
+        pts = [(pt.x, pt.y) for pt in s.obj.each_point()]
+        return f"{head}, Path #{s.index}: Width = {s.obj.width}, Points → {pts}"
+    if s.kind == "text":
+        t = s.obj
+        return f"{head}, Text #{s.index}: Text = '{t.string}', at ({t.trans.disp.x}, {t.trans.disp.y})"
+    return f"{head}, Shape #{s.index}: Unhandled type {s.obj}"
+
+
+def dump_lines(layout, top=None, flat=False):
+    """Yield the text dump line by line (one header line per record)."""
+    for rec in each_cell_record(layout, top, flat=flat):
+        if rec.trans is None:
+            yield f"\n>> Cell: {rec.name}"
+        else:
+            yield f"\n>> Cell: {rec.name} @ {rec.trans}"
+        for s in rec.shapes:
+            yield format_shape(s)
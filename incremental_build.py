@@ -0,0 +1,187 @@
+# incremental_build.py
+# Incremental builds for the generator scripts (make_gds.py,
+# make_dac_pads.py, klayoutEx1.py).
+#
+# Every run of a generator rebuilt the whole layout and rewrote its output,
+# so a make-driven flow re-ran everything downstream of it even when nothing
+# changed.  Here each output cell is built through Build.cell() with a key:
+# a hash of the cell name, its parameters, the keys of the cells it places,
+# the script source (plus any sibling modules it depends on), the database
+# unit and the KLayout version.  The keys are recorded in <out>.build.json
+# next to the output.  On the next run:
+#   * a cell whose key is unchanged is copied from the previous output
+#     instead of being produced again,
+#   * if no cell was produced and the cell set is the same, write() leaves
+#     the output file alone (same bytes, same mtime: make sees no change).
+# The copy is deferred: an unchanged cell is first an empty stand-in, and
+# the previous output is only read (and the stand-ins filled) once some
+# cell has to be produced or the output has to be written.  A rebuild with
+# nothing changed reads nothing and copies nothing.  Cells returned by
+# cell() can therefore be empty until write(); call fill() before looking
+# into them.
+# The record is trusted as long as the output file's size and mtime still
+# match it and it was written with the same writer settings (layout_io).
+#
+# Usage:
+#   build = incremental_build.Build("out.gds", __file__, deps=[pad_rows.__file__])
+#   pad = build.cell(ly, "PAD", {"size": 290}, lambda: pad_rows.pad_cell(ly, "PAD", l_pin, 290))
+#   top = build.cell(ly, "TOP", {"n": 64}, make_top, children=[pad])
+#   info = build.write(ly)     # None if the output was up to date
+# -rd FORCE=1 (or force=True) produces and writes everything.
+
+import hashlib
+import json
+import os
+import sys
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import layout_io
+from run_report import flag
+
+SUFFIX = ".build.json"
+
+
+def klayout_version():
+    """Version string of the KLayout in use ('unknown' if it cannot be told)."""
+    try:
+        import klayout
+        return klayout.__version__
+    except Exception:
+        pass
+    try:
+        return pya.Application.instance().version()
+    except Exception:
+        return "unknown"
+
+
+def file_digest(path):
+    """sha256 of a file's bytes (hex)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Build:
+    """Per-cell input keys of one output file, with its sidecar record."""
+
+    def __init__(self, out, script, deps=(), force=None):
+        self.out = out
+        self.force = flag("FORCE") if force is None else force
+        sources = [script] + list(deps)
+        self.base = {"klayout": klayout_version(),
+                     "sources": {os.path.basename(p): file_digest(p) for p in sources}}
+        self.keys = {}          # cell name -> key of this run
+        self.produced = []      # cell names produced (not reused) in this run
+        self.record = {} if self.force else self._load()
+        self._old = None        # previous output, read on the first reuse
+        self.pending = {}       # cell name -> (empty stand-in, produce) awaiting the copy
+
+    def _load(self):
+        try:
+            with open(self.out + SUFFIX) as f:
+                rec = json.load(f)
+            st = os.stat(self.out)
+        except (OSError, ValueError):
+            return {}
+        if (rec.get("size") != st.st_size or rec.get("mtime_ns") != st.st_mtime_ns
+                or rec.get("writer") != layout_io.defaults()):
+            return {}
+        return rec.get("cells", {})
+
+    def key(self, layout, name, params, children=()):
+        """Input key of cell name: parameters, children's keys, sources, dbu, version."""
+        doc = {"name": name, "params": params, "dbu": layout.dbu, "base": self.base,
+               "children": {c.name: self.keys.get(c.name) for c in children}}
+        return hashlib.sha256(json.dumps(doc, sort_keys=True, default=repr).encode()).hexdigest()
+
+    def _reuse(self, layout, name, cell=None):
+        """
+        Copy cell name from the previous output into layout (into cell if
+        given, else a new cell); None if not possible.
+        """
+        if self._old is None:
+            self._old = pya.Layout()
+            self._old.read(self.out)
+        old = self._old.cell(name)
+        if old is None:
+            return None
+        children = {}
+        for inst in old.each_inst():
+            child = self._old.cell(inst.cell_index).name
+            if layout.cell(child) is None:   # child not built in this run
+                return None
+            children[inst.cell_index] = layout.cell(child).cell_index()
+        if cell is None:
+            cell = layout.create_cell(name)
+        lmap = pya.LayerMapping()
+        lmap.create_full(layout, self._old)
+        cell.copy_shapes(old, lmap)
+        for inst in old.each_inst():
+            ca = inst.cell_inst.dup()
+            ca.cell_index = children[inst.cell_index]
+            cell.insert(ca)
+        return cell
+
+    def cell(self, layout, name, params, produce, children=()):
+        """
+        Cell name of layout: copied from the previous output if its key is
+        unchanged, else produce() (which creates and returns the cell).
+        children are the cells it places; build them (through cell()) first.
+        """
+        key = self.keys[name] = self.key(layout, name, params, children)
+        if self.record.get(name) == key:
+            if not self.produced:   # so far nothing changed: copy later, if at all
+                cell = layout.create_cell(name)
+                self.pending[name] = (cell, produce)
+                return cell
+            cell = self._reuse(layout, name)
+            if cell is not None:
+                return cell
+        self.fill(layout)   # produce() may look into the cells built so far
+        self.produced.append(name)
+        return produce()
+
+    def fill(self, layout):
+        """Copy the content of the stand-ins of unchanged cells from the previous output."""
+        pending, self.pending = self.pending, {}
+        for name, (cell, produce) in pending.items():   # children come first
+            if self._reuse(layout, name, cell) is not None:
+                continue
+            new = produce()   # not in the previous output after all
+            cell.copy_shapes(new)
+            cell.move_instances(new)
+            layout.delete_cell(new.cell_index())
+            self.produced.append(name)
+
+    def up_to_date(self, layout):
+        """True if nothing was produced and layout has the recorded cells exactly."""
+        names = {c.name for c in layout.each_cell()}
+        return not self.produced and names == set(self.record) == set(self.keys)
+
+    def write(self, layout, **kw):
+        """
+        Write layout to the output (layout_io.write_layout(**kw)) and the
+        record, unless the output is up to date.  Returns the write info or
+        None if nothing was written.
+        """
+        if not self.force and self.up_to_date(layout):
+            return None
+        self.fill(layout)
+        info = layout_io.write_layout(layout, self.out, **kw)
+        st = os.stat(self.out)
+        with open(self.out + SUFFIX, "w") as f:
+            json.dump({"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                       "writer": layout_io.defaults(), "klayout": self.base["klayout"],
+                       "cells": self.keys}, f, indent=1)
+        return info
+
+    def summary(self):
+        """'3 cell(s): 1 produced, 2 reused'."""
+        n = len(self.keys)
+        return f"{n} cell(s): {len(self.produced)} produced, {n - len(self.produced)} reused"
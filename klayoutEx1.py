@@ -1,13 +1,18 @@
+import os
+import sys
 import klayout.db as db
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import incremental_build
+
+# rebuilds basic.gds only when the pattern or this script changed
+build = incremental_build.Build("basic.gds", __file__)
+
 ly = db.Layout()
 
 # sets the database unit to 1 nm
 ly.dbu = 0.001
 
-# adds a single top cell
-top_cell = ly.create_cell("SAMPLE")
-
 # creates a new layer (layer number 1, datatype 0)
 layer1 = ly.layer(1, 0)
 
@@ -21,28 +26,35 @@ pattern = """
 .#...#.#####.#...#...#. ..###...###....#..
 """
 
-# produces pixels from the bitmap as 0.5x0.5 µm
-# boxes on a 1x1 µm grid:
-y = 8.0
-for line in pattern.split("\n"):
+def make_sample():
+
+  # adds a single top cell
+  top_cell = ly.create_cell("SAMPLE")
+
+  # produces pixels from the bitmap as 0.5x0.5 µm
+  # boxes on a 1x1 µm grid:
+  y = 8.0
+  for line in pattern.split("\n"):
+
+    x = 0.0
+    for bit in line:
 
-  x = 0.0
-  for bit in line:
+      if bit == "#":
+        # creates a rectangle for the "on" pixel
+        rect = db.DBox(0, 0, 0.5, 0.5).moved(x, y)
+        top_cell.shapes(layer1).insert(rect)
 
-    if bit == "#":
-      # creates a rectangle for the "on" pixel
-      rect = db.DBox(0, 0, 0.5, 0.5).moved(x, y)
-      top_cell.shapes(layer1).insert(rect)
+      x += 1.0
 
-    x += 1.0
+    y -= 1.0
 
-  y -= 1.0
+  # adds an envelope box on layer 2/0
+  layer2 = ly.layer(2, 0)
+  envelope = top_cell.dbbox().enlarged(1.0, 1.0)
+  top_cell.shapes(layer2).insert(envelope)
+  return top_cell
 
-# adds an envelope box on layer 2/0
-layer2 = ly.layer(2, 0)
-envelope = top_cell.dbbox().enlarged(1.0, 1.0)
-top_cell.shapes(layer2).insert(envelope)
-  
-# writes the layout to GDS
-ly.write("basic.gds")
+top_cell = build.cell(ly, "SAMPLE", {"pattern": pattern}, make_sample)
 
+# writes the layout to GDS (left untouched if up to date)
+build.write(ly)
@@ -0,0 +1,120 @@
+# layer_remap.py
+# Bulk (L/D) -> (L/D) layer remap engine shared by ld1_to_ld2.py,
+# fix_ld1_to_ld2.py and gds_ld1_to_ld2_inplace.py.
+#
+#   * The map is many-to-many: one source may go to several targets, and
+#     several sources may land on the same target.  Chains and swaps
+#     (5/1 -> 5/2 together with 5/2 -> 5/3) are staged through scratch
+#     layers so no shape is moved twice.
+#   * Layers are moved and copied as a whole with Layout.move_layer() /
+#     copy_layer() -- no Python loop over cells or shapes for the move.
+#   * The moved counts come from one pass over the cells (Shapes.size() of
+#     the source layers); count=False skips it.
+#
+# Usage:
+#   import layer_remap
+#   moved = layer_remap.remap_layers(ly, {(5, 1): (5, 2), (8, 1): [(8, 2), (8, 3)]})
+#   moved = layer_remap.remap_layers(ly, layer_remap.datatype_map(ly, 1, 2))
+
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+
+def parse_layer_pair(s):
+    """Parse 'L/D' -> (L, D) as ints."""
+    l, d = s.split("/")
+    return int(l), int(d)
+
+
+def parse_map(map_str):
+    """
+    Parse mapping string like:
+      "5/1:5/2,8/1:8/2,8/1:8/3"
+    into { (5,1): [(5,2)], (8,1): [(8,2), (8,3)] }
+    """
+    m = {}
+    if not map_str:
+        return m
+    for item in map_str.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        src, dst = item.split(":")
+        m.setdefault(parse_layer_pair(src), []).append(parse_layer_pair(dst))
+    return m
+
+
+def datatype_map(layout, src_dtype, dst_dtype):
+    """Map every (L, src_dtype) present in layout to (L, dst_dtype)."""
+    return {(info.layer, src_dtype): [(info.layer, dst_dtype)]
+            for info in layout.layer_infos() if info.datatype == src_dtype}
+
+
+def shape_counts(layout, layer_indexes):
+    """{layer index: number of shapes in all cells}, in one pass over the cells."""
+    counts = dict.fromkeys(layer_indexes, 0)
+    for c in layout.each_cell():
+        for li in layer_indexes:
+            counts[li] += c.shapes(li).size()
+    return counts
+
+
+def remap_layers(layout, mapping, count=True):
+    """
+    Move shapes according to mapping {(L,D): (L,D) or [(L,D), ...]}.
+    Returns {(L,D): number of shapes moved off that source layer} (None
+    with count=False).
+    """
+    plan = {}
+    for src, dsts in mapping.items():
+        if isinstance(dsts, tuple):
+            dsts = [dsts]
+        s_li = layout.find_layer(pya.LayerInfo(*src))
+        if s_li is None or s_li < 0:
+            continue
+        d_lis = []
+        for dst in dsts:
+            d_li = layout.layer(pya.LayerInfo(*dst))
+            if d_li not in d_lis:
+                d_lis.append(d_li)
+        plan[s_li] = (src, d_lis)
+
+    if not plan:
+        return {}
+    counts = shape_counts(layout, list(plan)) if count else {}
+    moved = {src: counts.get(s_li) for s_li, (src, _) in plan.items()}
+
+    # A source that is also a target must be emptied before anything lands
+    # on it, otherwise shapes would be moved twice.
+    targets = {d for _, d_lis in plan.values() for d in d_lis}
+    scratch = []
+    if targets & set(plan):
+        staged = {}
+        for s_li, entry in plan.items():
+            tmp = layout.insert_layer(pya.LayerInfo())
+            layout.move_layer(s_li, tmp)
+            staged[tmp] = entry
+            scratch.append(tmp)
+        plan = staged
+
+    for s_li, (src, d_lis) in plan.items():
+        others = [d for d in d_lis if d != s_li]
+        if not others:
+            continue
+        for d_li in others[:-1]:
+            layout.copy_layer(s_li, d_li)
+        if s_li in d_lis:
+            layout.copy_layer(s_li, others[-1])   # the source keeps its shapes too
+        else:
+            layout.move_layer(s_li, others[-1])   # appends to the target, empties the source
+
+    for tmp in scratch:
+        layout.delete_layer(tmp)
+    return moved
+
+
+def format_counts(moved):
+    """'5/1:12, 8/1:3' style summary of remap_layers() counts ('5/1' if not counted)."""
+    return ", ".join(f"{l}/{d}" if n is None else f"{l}/{d}:{n}" for (l, d), n in sorted(moved.items()))
@@ -0,0 +1,312 @@
+# layout_daemon.py
+# Long-running local worker for the layout jobs, serving JSON requests over
+# a Unix domain socket.
+#
+# Every `klayout -b -r` call pays for Python start-up, the registration of
+# BasicsLib / PMOSSourcesLib / PMOSSwitchArrayLib and the read of its source
+# GDS before doing a few milliseconds of work.  The daemon does all of that
+# once: its pool workers import the PCell libraries at start-up and keep a
+# cache of loaded layouts (layout_jobs.LayoutCache), so a flow script firing
+# thousands of small jobs only pays for the jobs themselves.
+#
+# Protocol: one JSON object per line in each direction.  Requests on one
+# connection run concurrently; responses come back in completion order and
+# carry the request "id".
+#   {"id": 1, "job": "generate", "lib": "PMOSSwitchArrayLib", "pcell": "PMOSSwitchArray",
+#    "params": {"n": 16}, "out": "sw16.gds"}
+#   {"id": 2, "job": "remap", "src": "a.gds", "out": "a_ld2.gds", "map": "5/1:5/2"}
+#   {"id": 3, "job": "promote", "src": "a.gds", "out": "a_pins.gds", "all_to": "67/44",
+#    "pin_map": "10/25:10/0:10/2"}
+#   {"id": 4, "job": "sanitize", "src": "a.gds", "out": "m.gds", "tgt": "t.gds", "topname": "A"}
+#   {"job": "ping"} | {"job": "stats"} | {"job": "shutdown"}
+# Response: {"id": ..., "status": "ok"|"error"|"timeout"|"crashed", "seconds": ...,
+#            "result": {...} | "error": "...", "worker": pid, "cache": {"hits": .., "misses": ..}}
+#
+# Usage:
+#   python layout_daemon.py serve --workers 8 --cache 32 &
+#   python layout_daemon.py submit jobs.jsonl        (requests, one per line; "-" = stdin)
+#   python layout_daemon.py stats
+#   python layout_daemon.py stop
+# The socket defaults to $KLAYOUT_JOBS_SOCKET or /tmp/klayout_jobs-<uid>.sock.
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import batch_convert
+import layer_remap
+import layout_jobs
+import pcell_libraries
+import text_pins
+import tiled_ops
+
+DEFAULT_SOCKET = os.environ.get("KLAYOUT_JOBS_SOCKET",
+                                f"/tmp/klayout_jobs-{os.getuid()}.sock")
+# request keys passed through to the remap/promote/sanitize jobs as they are
+JOB_OPTIONS = ("topname", "tgt", "compact", "dedup", "selective", "tile_um", "threads")
+
+JOBS = {
+    "generate": layout_jobs.generate_pcell,
+    "remap": layout_jobs.ld1_to_ld2,
+    "promote": layout_jobs.promote_text_to_pin,
+    "sanitize": layout_jobs.sanitize_import,
+}
+
+
+# ---- worker side ----
+_cache = None   # this worker's layout_jobs.LayoutCache
+
+
+def init_worker(cache_entries):
+    """Pool initializer: register the PCell libraries, install the layout cache."""
+    global _cache
+    pcell_libraries.load_libraries()
+    if cache_entries:
+        _cache = layout_jobs.LayoutCache(cache_entries)
+        layout_jobs.use_layout_cache(_cache)
+
+
+def job_kwargs(req):
+    """Keyword arguments of the job function from a request object."""
+    job = req["job"]
+    if job == "generate":
+        kw = {k: req[k] for k in ("lib", "pcell", "out", "params", "topname") if k in req}
+        return (), kw
+    kw = {k: req[k] for k in JOB_OPTIONS if k in req}
+    if req.get("map"):
+        m = layer_remap.parse_map(req["map"])
+        kw["mapping"] = m if job == "remap" else {s: d[-1] for s, d in m.items()}
+    if req.get("all_to"):
+        kw["all_to"] = layer_remap.parse_layer_pair(req["all_to"])
+    if req.get("pin_map"):
+        kw["pin_map"] = text_pins.parse_pin_map(req["pin_map"])
+    return (req["src"], req["out"]), kw
+
+
+def run_request(req, timeout):
+    """Worker entry point: run one request, return its response record."""
+    try:
+        args, kw = job_kwargs(req)
+    except (KeyError, ValueError) as e:
+        return {"status": "error", "seconds": 0.0, "error": f"bad request: {type(e).__name__}: {e}"}
+    rec = batch_convert.call_with_timeout(JOBS[req["job"]], args, kw, timeout)
+    rec["worker"] = os.getpid()
+    if _cache is not None:
+        rec["cache"] = dict(_cache.stats)
+    return rec
+
+
+# ---- server side ----
+class JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        responses = queue.Queue()
+        writer = threading.Thread(target=self._write_loop, args=(responses,), daemon=True)
+        writer.start()
+        n = 0
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            n += 1
+            try:
+                req = json.loads(line)
+                if not isinstance(req, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                responses.put({"status": "error", "error": f"bad request: {e}"})
+                continue
+            self.server.dispatch(req, responses)
+        responses.put(n)   # end of requests: the writer stops after n responses
+        writer.join()
+
+    def _write_loop(self, responses):
+        written, total = 0, None
+        while total is None or written < total:
+            item = responses.get()
+            if isinstance(item, int):
+                total = item
+                continue
+            written += 1
+            try:
+                self.wfile.write((json.dumps(item, default=str) + "\n").encode())
+                self.wfile.flush()
+            except OSError:
+                pass   # client went away: keep draining so the handler can finish
+
+
+class JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, workers=None, cache_entries=16, timeout=None):
+        if os.path.exists(path):
+            if socket_alive(path):
+                raise OSError(f"a daemon is already serving on {path}")
+            os.unlink(path)   # stale socket from an earlier run
+        super().__init__(path, JobHandler)
+        self.workers = workers
+        self.cache_entries = cache_entries
+        self.pool_lock = threading.Lock()
+        self.pool = self._new_pool()
+        self.restarts = 0
+        self.timeout_s = timeout
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.counts = {}   # job -> {"ok": n, "failed": n, "seconds": s}
+
+    def dispatch(self, req, responses):
+        rid, job = req.get("id"), req.get("job")
+        if job == "ping":
+            responses.put({"id": rid, "status": "ok", "result": "pong"})
+        elif job == "stats":
+            responses.put({"id": rid, "status": "ok", "result": self.stats()})
+        elif job == "shutdown":
+            responses.put({"id": rid, "status": "ok", "result": "shutting down"})
+            threading.Thread(target=self.shutdown).start()
+        elif job not in JOBS:
+            responses.put({"id": rid, "status": "error", "error": f"unknown job {job!r}"})
+        else:
+            if req.get("tile_um") and not req.get("threads"):   # share the cores between the workers
+                req = dict(req, threads=tiled_ops.threads_per_job(self.workers or os.cpu_count()))
+            self._submit(rid, job, req, responses)
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                   initargs=(self.cache_entries,))
+
+    def _renew_pool(self, broken):
+        """Replace the pool broken (a worker died) unless that was done already."""
+        with self.pool_lock:
+            if self.pool is broken:
+                broken.shutdown(wait=False)
+                self.pool = self._new_pool()
+                self.restarts += 1
+            return self.pool
+
+    def _submit(self, rid, job, req, responses):
+        pool = self.pool
+        for _ in range(2):
+            try:
+                fut = pool.submit(run_request, req, req.get("timeout", self.timeout_s))
+                break
+            except BrokenProcessPool:
+                pool = self._renew_pool(pool)
+            except Exception as e:   # e.g. shutting down
+                responses.put({"id": rid, "status": "error", "error": f"{type(e).__name__}: {e}"})
+                return
+        else:
+            responses.put({"id": rid, "status": "error", "error": "worker pool unavailable"})
+            return
+        fut.add_done_callback(lambda f: responses.put(self._finish(rid, job, f, pool)))
+
+    def _finish(self, rid, job, fut, pool):
+        try:
+            rec = fut.result()
+        except Exception as e:   # worker died (killed, out of memory)
+            rec = {"status": "crashed", "error": f"{type(e).__name__}: {e}"}
+            if isinstance(e, BrokenProcessPool):
+                self._renew_pool(pool)   # later requests go to a fresh pool
+        rec["id"] = rid
+        with self.lock:
+            c = self.counts.setdefault(job, {"ok": 0, "failed": 0, "seconds": 0.0})
+            c["ok" if rec["status"] == "ok" else "failed"] += 1
+            c["seconds"] += rec.get("seconds", 0.0)
+        return rec
+
+    def stats(self):
+        with self.lock:
+            return {"pid": os.getpid(), "uptime_s": time.time() - self.started,
+                    "workers": self.workers, "pool_restarts": self.restarts,
+                    "jobs": dict(self.counts)}
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+# ---- client side ----
+def socket_alive(path):
+    """True if a server accepts connections on the Unix socket path."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(1.0)
+        try:
+            s.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def submit(requests, path=DEFAULT_SOCKET):
+    """Send request dicts to the daemon and yield the responses as they arrive."""
+    requests = list(requests)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path)
+        s.sendall(b"".join((json.dumps(r) + "\n").encode() for r in requests))
+        s.shutdown(socket.SHUT_WR)
+        with s.makefile("rb") as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Resident layout job worker on a Unix socket")
+    ap.add_argument("--socket", default=DEFAULT_SOCKET)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("serve", help="run the daemon in the foreground")
+    sp.add_argument("--workers", type=int, default=os.cpu_count())
+    sp.add_argument("--cache", type=int, default=16, help="loaded layouts kept per worker (0: off)")
+    sp.add_argument("--timeout", type=float, default=None, help="default per-job time limit in seconds")
+    sp = sub.add_parser("submit", help="send JSON-lines requests, print the responses")
+    sp.add_argument("requests", help='file with one JSON request per line ("-" = stdin)')
+    sub.add_parser("stats", help="print the daemon's job counters")
+    sub.add_parser("stop", help="shut the daemon down")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "serve":
+        try:
+            server = JobServer(args.socket, args.workers, args.cache, args.timeout)
+        except OSError as e:
+            print(f"cannot serve on {args.socket}: {e}", file=sys.stderr)
+            return 2
+        print(f"Serving on {args.socket} ({args.workers} workers, pid {os.getpid()})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+
+    if args.cmd == "submit":
+        f = sys.stdin if args.requests == "-" else open(args.requests)
+        with f:
+            reqs = [json.loads(l) for l in f if l.strip()]
+        for i, r in enumerate(reqs):
+            r.setdefault("id", i)
+    else:
+        reqs = [{"id": 0, "job": "stats" if args.cmd == "stats" else "shutdown"}]
+    failed = 0
+    try:
+        for rec in submit(reqs, args.socket):
+            failed += rec["status"] != "ok"
+            print(json.dumps(rec, default=str))
+    except OSError as e:
+        print(f"cannot reach daemon at {args.socket}: {e}", file=sys.stderr)
+        return 2
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
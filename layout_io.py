@@ -0,0 +1,190 @@
+# layout_io.py
+# Shared output stage: GDS, GDS.gz or OASIS chosen from the file name (or
+# explicitly), with the OASIS compaction / CBLOCK and gzip level settings
+# exposed, and the bytes written and time spent reported.  load_options()
+# is the matching input side: LoadLayoutOptions that read only the layers,
+# texts and properties a tool needs.
+#
+# Defaults come from -rd / environment, so every script and job using
+# write_layout() picks them up without its own options:
+#   OUT_FORMAT=GDS2|OASIS    override the format implied by the extension
+#   GZIP_LEVEL=1..9          gzip level for *.gz output (default: KLayout's)
+#   OASIS_COMPRESSION=0..10  OASIS shape compaction level (KLayout default 2)
+#   OASIS_CBLOCKS=0|1        OASIS CBLOCK (deflate) compression of cells
+#
+# Usage:
+#   import layout_io
+#   info = layout_io.write_layout(ly, "out.oas", context_info=False)
+#   print(layout_io.format_info(info))   # "out.oas: OASIS, 1.2 MB in 0.31 s"
+#
+#   python layout_io.py compare in.gds      (size/time table over formats and levels)
+
+import argparse
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+from run_report import rd
+
+EXTENSIONS = {".gds": "GDS2", ".gds2": "GDS2", ".gdsii": "GDS2", ".oas": "OASIS", ".oasis": "OASIS"}
+
+
+def _int_or_none(v):
+    return None if v in (None, "") else int(v)
+
+
+def defaults():
+    """Writer settings from -rd / environment."""
+    return {"fmt": rd("OUT_FORMAT") or None,
+            "gzip_level": _int_or_none(rd("GZIP_LEVEL")),
+            "oasis_compression": _int_or_none(rd("OASIS_COMPRESSION")),
+            "cblocks": None if rd("OASIS_CBLOCKS") in (None, "") else rd("OASIS_CBLOCKS") != "0"}
+
+
+def output_format(path, fmt=None):
+    """(format, gzipped) for path: fmt if given, else from the extension."""
+    name = path.lower()
+    gz = name.endswith(".gz")
+    if gz:
+        name = name[:-3]
+    if fmt:
+        return fmt.upper(), gz
+    return EXTENSIONS.get(os.path.splitext(name)[1], "GDS2"), gz
+
+
+def save_options(fmt="GDS2", oasis_compression=None, cblocks=None, context_info=None):
+    """SaveLayoutOptions for fmt; None leaves KLayout's default in place."""
+    opt = pya.SaveLayoutOptions()
+    opt.format = fmt
+    if context_info is not None:
+        opt.write_context_info = context_info
+    if fmt == "OASIS":
+        if oasis_compression is not None:
+            opt.oasis_compression_level = oasis_compression
+        if cblocks is not None:
+            opt.oasis_write_cblocks = cblocks
+    return opt
+
+
+def load_options(layers=None, texts=True, properties=True):
+    """
+    LoadLayoutOptions reading only layers [(L, D), ...] (all if None), and
+    skipping TEXT and/or shape properties if texts / properties are False.
+    """
+    opt = pya.LoadLayoutOptions()
+    if layers is not None:
+        lm = pya.LayerMap()
+        for i, (l, d) in enumerate(sorted(set(layers))):
+            lm.map(pya.LayerInfo(l, d), i)
+        opt.layer_map = lm
+        opt.create_other_layers = False
+    opt.text_enabled = texts
+    opt.properties_enabled = properties
+    return opt
+
+
+def write_layout(layout, path, fmt=None, gzip_level=None, oasis_compression=None, cblocks=None,
+                 context_info=None):
+    """
+    Write layout to path.  Format from fmt or the extension; *.gz output is
+    gzip compressed (at gzip_level if given).  Unset settings fall back to
+    defaults() and then to KLayout's own defaults.
+    Returns {"path", "format", "gzip", "bytes", "seconds"}.
+    """
+    d = defaults()
+    fmt, gz = output_format(path, fmt or d["fmt"])
+    gzip_level = d["gzip_level"] if gzip_level is None else gzip_level
+    opt = save_options(fmt,
+                       d["oasis_compression"] if oasis_compression is None else oasis_compression,
+                       d["cblocks"] if cblocks is None else cblocks,
+                       context_info)
+    t0 = time.perf_counter()
+    if gz and gzip_level is not None:
+        # KLayout gzips *.gz itself but has no level setting: write plain, compress here
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as tmpdir:
+            plain = os.path.join(tmpdir, "plain")
+            layout.write(plain, opt)
+            with open(plain, "rb") as src, gzip.open(path, "wb", compresslevel=gzip_level) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+    else:
+        layout.write(path, opt)
+    return {"path": path, "format": fmt, "gzip": gz, "bytes": os.path.getsize(path),
+            "seconds": time.perf_counter() - t0}
+
+
+def format_info(info):
+    """One line: path, format, size and time of a write_layout() result."""
+    kind = info["format"] + (".gz" if info["gzip"] else "")
+    return f"{info['path']}: {kind}, {info['bytes'] / 1e6:.2f} MB in {info['seconds']:.2f} s"
+
+
+# ---- comparison ----
+VARIANTS = [
+    ("gds", {}),
+    ("gds.gz", {"gzip_level": 1}),
+    ("gds.gz", {"gzip_level": 6}),
+    ("gds.gz", {"gzip_level": 9}),
+    ("oas", {"oasis_compression": 0, "cblocks": False}),
+    ("oas", {"oasis_compression": 2, "cblocks": False}),
+    ("oas", {"oasis_compression": 2, "cblocks": True}),
+    ("oas", {"oasis_compression": 10, "cblocks": True}),
+]
+
+
+def compare(layout, tmpdir, variants=VARIANTS):
+    """Write layout in every variant; list of result dicts incl. read-back time."""
+    rows = []
+    for i, (ext, kw) in enumerate(variants):
+        path = os.path.join(tmpdir, f"v{i}.{ext}")
+        info = write_layout(layout, path, context_info=False, **kw)
+        t0 = time.perf_counter()
+        pya.Layout().read(path)
+        info["read_seconds"] = time.perf_counter() - t0
+        info["settings"] = kw
+        rows.append(info)
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Layout output formats: write or compare")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("compare", help="size/time of SRC in GDS, GDS.gz and OASIS variants")
+    sp.add_argument("src")
+    sp = sub.add_parser("convert", help="write SRC to OUT (format from OUT's extension)")
+    sp.add_argument("src")
+    sp.add_argument("out")
+    sp.add_argument("--format", default=None, choices=["GDS2", "OASIS"])
+    sp.add_argument("--gzip-level", type=int, default=None)
+    sp.add_argument("--oasis-compression", type=int, default=None)
+    sp.add_argument("--cblocks", type=int, choices=[0, 1], default=None)
+    args = ap.parse_args(argv)
+
+    ly = pya.Layout()
+    ly.read(args.src)
+    if args.cmd == "convert":
+        info = write_layout(ly, args.out, args.format, args.gzip_level, args.oasis_compression,
+                            None if args.cblocks is None else bool(args.cblocks))
+        print(format_info(info))
+        return 0
+
+    base = os.path.getsize(args.src)
+    print(f"{'variant':<34} {'bytes':>12} {'ratio':>7} {'write s':>8} {'read s':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for r in compare(ly, tmpdir):
+            label = r["format"] + (".gz" if r["gzip"] else "") + " " + \
+                ",".join(f"{k}={v}" for k, v in r["settings"].items())
+            print(f"{label:<34} {r['bytes']:>12} {r['bytes'] / base:>7.3f} "
+                  f"{r['seconds']:>8.3f} {r['read_seconds']:>8.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,446 @@
+# layout_jobs.py
+# The conversions behind ld1_to_ld2.py, promote_text_to_pin.py and
+# sanitize_import.py as plain functions, so they can be driven by the -rd
+# scripts as well as imported by batch_convert.py (klayout.db module, one
+# process per worker instead of one klayout start-up per file).
+#
+# Every job takes an input path and an output path plus keyword options
+# and returns a small JSON-serialisable summary dict.  Each job times its
+# phases (read, copy_tree, the shape loops, write) in a run_report.RunReport;
+# pass one in to collect them, the phase records are also returned under
+# "phases".
+#
+# Input files are read through read_layout(); a long-running process (see
+# layout_daemon.py) can install a LayoutCache so repeated jobs on the same
+# unchanged file skip the read.
+
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+import aref_compact
+import cell_dedup
+import gds_stream
+import layer_remap
+import layout_io
+import run_report
+import text_pins
+import tiled_ops
+
+CONTEXT_CELL = "$$$CONTEXT_INFO$$$"
+
+
+# ---- reading ----
+def _load_key(layers, texts):
+    return (tuple(sorted(set(layers))) if layers is not None else None, texts)
+
+
+def _read(path, layers=None, texts=True):
+    ly = pya.Layout()
+    if layers is None and texts:
+        ly.read(path)
+    else:
+        ly.read(path, layout_io.load_options(layers, texts))
+    return ly
+
+
+class LayoutCache:
+    """
+    Loaded layouts keyed by (path, mtime, size, read filter), least
+    recently used dropped beyond max_entries.  get() hands out a copy,
+    since the jobs modify their source layout.
+    """
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.entries = {}   # insertion order = use order
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, path, layers=None, texts=True):
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, _load_key(layers, texts))
+        ly = self.entries.pop(key, None)
+        if ly is None:
+            self.stats["misses"] += 1
+            ly = _read(path, layers, texts)
+            while len(self.entries) >= self.max_entries > 0:
+                self.entries.pop(next(iter(self.entries)))
+        else:
+            self.stats["hits"] += 1
+        if self.max_entries > 0:
+            self.entries[key] = ly
+        return ly.dup()
+
+
+_cache = None
+
+
+def use_layout_cache(cache):
+    """Serve read_layout() from cache (a LayoutCache, or None to disable)."""
+    global _cache
+    _cache = cache
+
+
+def read_layout(path, layers=None, texts=True):
+    """
+    A new Layout with the contents of path (from the layout cache if one is
+    installed), restricted to layers [(L, D), ...] and without TEXT if
+    texts is False (see layout_io.load_options).
+    """
+    if _cache is not None:
+        return _cache.get(path, layers, texts)
+    return _read(path, layers, texts)
+
+
+def is_plain_gds(path, fmt=None):
+    """True for uncompressed GDSII files, which gds_stream can pass through."""
+    return layout_io.output_format(path, fmt) == ("GDS2", False)
+
+
+def _streamable(src, out):
+    """src can be rewritten record by record into out (both plain GDS)."""
+    return is_plain_gds(src) and is_plain_gds(out, layout_io.defaults()["fmt"])
+
+
+# ---- sanitize helpers ----
+def rename_context_cells(layout):
+    """Rename the reserved $$$CONTEXT_INFO$$$ cell; returns the number renamed."""
+    n = 0
+    for c in layout.each_cell():
+        if c.name == CONTEXT_CELL:
+            c.name = "__CONTEXT_INFO__"
+            n += 1
+    return n
+
+
+def copy_to_new_layout(sly, topname=None):
+    """Copy the top cell hierarchy of sly into a NEW layout (no library/proxy)."""
+    src_top = sly.top_cell()
+    dly = pya.Layout()
+    dly.dbu = sly.dbu
+    dst_top = dly.create_cell(topname or src_top.name)
+    dst_top.copy_tree(src_top)   # Cell.copy_tree works across layouts
+    return dly, dst_top
+
+
+# ---- jobs ----
+def _single_targets(mapping):
+    """{(L,D): (L,D)} if every source of mapping has exactly one target, else None."""
+    flat = {}
+    for src, dsts in mapping.items():
+        dsts = [dsts] if isinstance(dsts, tuple) else list(dsts)
+        if len(dsts) != 1:
+            return None
+        flat[src] = tuple(dsts[0])
+    return flat
+
+
+def _job_report(name, out):
+    """
+    RunReport of a job run without one.  The ambient REPORT is not used
+    (parallel jobs would all write it); PROFILE=1 dumps go next to out, as
+    <out stem>.<name>.<phase>.prof.
+    """
+    return run_report.RunReport(name, path="", prof_base=f"{os.path.splitext(out)[0]}.{name}")
+
+
+def _stream_job(src, out, transforms, topname, report):
+    """
+    Record-level pass-through rewrite of src (no Layout is built): the
+    context cell is left out and the top cell renamed to topname if given
+    (src must then have a single top cell).  The top cell is found in the
+    rewrite pass itself; only a rename needs it before, from a scan of the
+    names.  Returns (top cell name, write info).
+    """
+    transforms = list(transforms) + [gds_stream.DropStructures([CONTEXT_CELL])]
+    names = gds_stream.StructureNames()
+    if topname:
+        tops = [n for n in gds_stream.StructureNames.scan(src).tops() if n != CONTEXT_CELL]
+        if len(tops) != 1:
+            raise ValueError(f"{src}: cannot rename the top cell to {topname!r}, "
+                             f"{len(tops)} top cells ({', '.join(tops[:5])})")
+        transforms.append(gds_stream.CellRename({tops[0]: topname}))
+    transforms.append(names)   # last: sees the structures as written
+    with report.phase("stream_rewrite", hot=True):
+        res = gds_stream.rewrite(src, out, transforms)
+    report.info.update(res)
+    tops = names.tops()   # after the rename: the name actually written
+    top = tops[0] if len(tops) == 1 else None
+    return top, {"path": out, "format": "GDS2", "gzip": False, "bytes": res["bytes"],
+                 "seconds": report.phases[-1]["wall_s"]}
+
+
+def ld1_to_ld2(src, out, topname=None, mapping=None, selective=False, tile_um=None, threads=None,
+               report=None):
+    """
+    Stand-alone copy of src with (L,1) -> (L,2), or with mapping if given.
+    With selective=True and plain GDS in and out, only the LAYER/DATATYPE
+    records of the elements are decoded and everything else is copied
+    through as raw bytes (gds_stream); this needs one target per source
+    layer and keeps all top cells, not only the first.
+    With tile_um, the top cell's own shapes on the target layers are then
+    merged by the multi-threaded tiling processor (tiled_ops), for
+    flat-heavy inputs; the remap itself and the cells below are unchanged.
+    """
+    report = report or _job_report("ld1_to_ld2", out)
+    flat = _single_targets(mapping) if mapping else {}
+    if selective and flat is not None and _streamable(src, out):
+        remap = (gds_stream.LayerMap(flat, texts=True) if mapping
+                 else gds_stream.DatatypeMap({1: 2}, texts=True))
+        top, written = _stream_job(src, out, [remap], topname, report)
+        return {"src": src, "out": out, "top": top, "written": written,
+                "moved": {f"{l}/{d}": n for (l, d), n in sorted(remap.moved.items())},
+                "selective": True, "phases": report.phases}
+
+    with report.phase("read"):
+        sly = read_layout(src)
+    with report.phase("copy_tree"):
+        dly, dst_top = copy_to_new_layout(sly, topname)
+    with report.phase("remap", hot=True):
+        mapping = mapping or layer_remap.datatype_map(dly, 1, 2)
+        if tile_um:
+            moved = tiled_ops.tiled_remap(dly, dst_top, mapping, True, tile_um, threads)
+        else:
+            moved = layer_remap.remap_layers(dly, mapping)
+    report.layout("out", dly)
+    with report.phase("write"):
+        written = layout_io.write_layout(dly, out)
+    return {
+        "src": src, "out": out, "top": dst_top.name, "written": written,
+        "moved": {f"{l}/{d}": n for (l, d), n in sorted(moved.items())},
+        "selective": False,
+        "phases": report.phases,
+    }
+
+
+def promote_text_to_pin(src, out, mapping=None, all_to=None, topname=None, selective=False,
+                        pin_map=None, report=None):
+    """
+    Move TEXT shapes from label layers to pin layers.
+      * If all_to (L, D) is given: every TEXT goes to that single target layer.
+      * Else if mapping has an entry for the TEXT's (L, D), move it there.
+      * Else leave it where it is (no guesswork).
+    With pin_map {label (L,D): (metal (L,D), pin (L,D))}, the metal shape
+    under each label is also copied to the pin layer (text_pins.emit_pins).
+    With selective=True and plain GDS in and out (and no pin_map), only the
+    layer records of TEXT elements are decoded; polygons and everything
+    else are copied through as raw bytes (gds_stream).  1-D AREFs are not
+    exploded then.
+    """
+    mapping = mapping or {}
+    report = report or _job_report("promote_text_to_pin", out)
+    if selective and not pin_map and _streamable(src, out):
+        texts = gds_stream.TextLayerMap(mapping, all_to)
+        top, written = _stream_job(src, out, [texts], topname, report)
+        return {
+            "src": src, "out": out, "dbu": None, "top": top, "written": written,
+            "text_layers": [f"{l}/{d}" for l, d in sorted(texts.seen)],
+            "moved": sum(texts.moved.values()), "selective": True,
+            "pins": 0, "unresolved_labels": [],
+            "phases": report.phases,
+        }
+
+    with report.phase("read"):
+        sly = read_layout(src)
+
+    # sanitize: rename reserved cell; explode 1-D arrays
+    with report.phase("sanitize", hot=True):
+        rename_context_cells(sly)
+        for c in sly.each_cell():
+            aref_compact.explode_arefs(c)
+
+    with report.phase("copy_tree"):
+        dly, dst_top = copy_to_new_layout(sly, topname)
+
+    # pin shapes from the metal under each label (before the labels move)
+    pins = {"pins": 0, "labels": 0, "unresolved": []}
+    if pin_map:
+        with report.phase("pins", hot=True):
+            pins = text_pins.emit_pins(dly, pin_map)
+
+    # one text-only pass: collect TEXT layers present and move in bulk
+    with report.phase("promote", hot=True):
+        moved, text_layers_present = text_pins.promote_texts(dly, mapping, all_to)
+
+    report.layout("out", dly)
+    with report.phase("write"):
+        written = layout_io.write_layout(dly, out)
+    return {
+        "src": src, "out": out, "dbu": dly.dbu, "top": dst_top.name, "written": written,
+        "text_layers": [f"{l}/{d}" for l, d in sorted(text_layers_present)],
+        "moved": moved, "selective": False,
+        "pins": pins["pins"], "unresolved_labels": pins["unresolved"],
+        "phases": report.phases,
+    }
+
+
+def _merge_source(tly, ttop, sly, topname=None, index=None):
+    """
+    Put the tree of sly's top cell under a root cell topname in tly and
+    place it at the origin of ttop.  With a cell_dedup index, identical
+    cells are mapped onto existing ones.  Returns (root, merge counts).
+    """
+    src_top = sly.top_cell()
+    if index is not None:
+        dst_root, merged = cell_dedup.merge_tree(tly, src_top, topname or src_top.name, index,
+                                                 avoid=(ttop.cell_index(),))
+    else:
+        dst_root = tly.create_cell(topname or src_top.name)
+        dst_root.copy_tree(src_top)
+        merged = {"reused": 0, "added": 0}
+
+    # place one instance at origin (a block merged before is already placed)
+    placed = any(i.cell_index == dst_root.cell_index() and i.cell_inst.trans == pya.Trans()
+                 and not i.is_regular_array() for i in ttop.each_inst())
+    if not placed:
+        ttop.insert(pya.CellInstArray(dst_root.cell_index(), pya.Trans()))
+    return dst_root, merged
+
+
+def _read_target(tgt, dbu):
+    """(target layout, its top cell, whether tgt existed)."""
+    have_tgt = bool(tgt) and os.path.exists(tgt)
+    if have_tgt:
+        tly = read_layout(tgt)
+    else:
+        tly = pya.Layout()
+        tly.dbu = dbu
+    return tly, tly.top_cell() or tly.create_cell("TOP"), have_tgt
+
+
+def sanitize_import(src, out, tgt=None, topname=None, compact=False, dedup=False, report=None):
+    """
+    Copy the hierarchy of src under a new cell topname in tgt (created if it
+    does not exist), place one instance of it in the target top, write out.
+    With compact=True, regular SREF runs in src are rebuilt as AREFs first.
+    With dedup=True, source cells identical to a target cell are mapped onto
+    it instead of copied (cell_dedup), and out gets a fingerprint sidecar.
+    """
+    report = report or _job_report("sanitize_import", out)
+    with report.phase("read"):
+        sly = read_layout(src)
+        tly, ttop, have_tgt = _read_target(tgt, sly.dbu)
+
+    # fix reserved context cell name if present
+    with report.phase("sanitize", hot=True):
+        renamed = rename_context_cells(sly)
+        compacted = aref_compact.compact_layout(sly) if compact else (0, 0)
+
+    # copy the full tree under a destination cell, or map identical cells
+    # onto the target's and copy only new ones
+    with report.phase("merge" if dedup else "copy_tree", hot=dedup):
+        index = cell_dedup.FingerprintIndex.for_layout(tly, tgt if have_tgt else None) if dedup else None
+        dst_root, merged = _merge_source(tly, ttop, sly, topname, index)
+
+    report.layout("out", tly)
+    with report.phase("write"):
+        written = layout_io.write_layout(tly, out)
+    if dedup:
+        index.save(out)
+    return {"src": src, "tgt": tgt, "out": out, "root": dst_root.name, "written": written,
+            "context_cells_renamed": renamed,
+            "srefs_compacted": compacted[0], "arefs_created": compacted[1],
+            "cells_reused": merged["reused"], "cells_added": merged["added"],
+            "phases": report.phases}
+
+
+def prepare_source(src, tmp, compact=False):
+    """
+    Worker half of sanitize_import_many: read src, rename the context cell,
+    optionally compact SREF runs, write the result to tmp (OASIS).
+    """
+    sly = read_layout(src)
+    renamed = rename_context_cells(sly)
+    compacted = aref_compact.compact_layout(sly) if compact else (0, 0)
+    layout_io.write_layout(sly, tmp, "OASIS", context_info=False)
+    return {"src": src, "top": sly.top_cell().name, "dbu": sly.dbu,
+            "context_cells_renamed": renamed,
+            "srefs_compacted": compacted[0], "arefs_created": compacted[1]}
+
+
+def sanitize_import_many(srcs, out, tgt=None, topnames=None, compact=False, dedup=False,
+                         workers=None, report=None):
+    """
+    sanitize_import for many sources: each src is read and sanitized in its
+    own worker process (written to a temporary OASIS file), then all of them
+    are merged into tgt in this process, each under its own root cell
+    (topnames[i], default the source's top cell name), and out is written once.
+
+    Reading the temporary files back is serial and is part of the merge phase;
+    sources[i]["readback_s"] has its time.  The workers' OASIS (no context
+    info) reads back in about half the time of the original GDS: 4 sources of
+    400k boxes took 0.31 s to read as GDS, 0.15 s to read back and 0.18 s to
+    copy.  So the serial part is roughly read-back plus copy, and parallel
+    workers pay off when the per-source work (large GDS, compact=True)
+    dominates it.  The copy has to run in one process as it fills one layout.
+    """
+    topnames = list(topnames or [None] * len(srcs))
+    report = report or _job_report("sanitize_import_many", out)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmps = [os.path.join(tmpdir, f"src{i}.oas") for i in range(len(srcs))]
+        with report.phase("prepare"):
+            args = (srcs, tmps, [compact] * len(srcs))
+            if workers == 1:   # in-process, e.g. inside klayout -b -r
+                prepared = list(map(prepare_source, *args))
+            else:
+                # platform default start method: prepare_source needs nothing
+                # inherited from this process (drivers must guard __main__)
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    prepared = list(pool.map(prepare_source, *args))
+
+        with report.phase("read"):
+            tly, ttop, have_tgt = _read_target(tgt, prepared[0]["dbu"] if prepared else 0.001)
+
+        with report.phase("merge" if dedup else "copy_tree", hot=True):
+            index = cell_dedup.FingerprintIndex.for_layout(tly, tgt if have_tgt else None) if dedup else None
+            roots = []
+            for tmp, name, prep in zip(tmps, topnames, prepared):
+                t0 = time.perf_counter()
+                sly = pya.Layout()
+                sly.read(tmp)
+                prep["readback_s"] = time.perf_counter() - t0
+                root, merged = _merge_source(tly, ttop, sly, name or prep["top"], index)
+                prep.update(root=root.name, cells_reused=merged["reused"], cells_added=merged["added"])
+                roots.append(root.name)
+
+    report.layout("out", tly)
+    with report.phase("write"):
+        written = layout_io.write_layout(tly, out)
+    if dedup:
+        index.save(out)
+    return {"srcs": list(srcs), "tgt": tgt, "out": out, "roots": roots, "written": written,
+            "sources": prepared, "phases": report.phases}
+
+
+def generate_pcell(lib, pcell, out, params=None, topname=None, report=None):
+    """
+    Instantiate PCell pcell of the (already registered) library lib with
+    params and write it as a stand-alone layout (no library proxies).
+    """
+    report = report or _job_report("generate", out)
+    with report.phase("produce", hot=True):
+        ly = pya.Layout()
+        ly.dbu = 0.001
+        pc = ly.create_cell(pcell, lib, params or {})
+        if pc is None:
+            raise ValueError(f"no PCell {pcell!r} in library {lib!r}")
+        top = ly.create_cell(topname or pcell)
+        top.insert(pya.CellInstArray(pc.cell_index(), pya.Trans()))
+    with report.phase("copy_tree"):
+        dly, dst_top = copy_to_new_layout(ly, topname or pcell)
+    report.layout("out", dly)
+    with report.phase("write"):
+        written = layout_io.write_layout(dly, out, context_info=False)
+    return {"lib": lib, "pcell": pcell, "out": out, "top": dst_top.name, "written": written,
+            "params": params or {}, "phases": report.phases}
+
+
+JOBS = {
+    "ld1_to_ld2": ld1_to_ld2,
+    "promote": promote_text_to_pin,
+    "sanitize": sanitize_import,
+}
@@ -1,13 +1,37 @@
 # make_dac_pads.py
+# Pads are built hierarchically: one DAC_PAD cell, each pad group of the
+# bottom row as a CellInstArray in DAC_PAD_ROW, and the upside down top row
+# as a second, 180-degree instance of the same row cell.  Labels go into
+# the top cell in bulk, from the parameters below or from a pin list CSV.
+#
+# Usage:
+#   klayout -b -r make_dac_pads.py
+#   klayout -b -r make_dac_pads.py -rd PINS=dac_pins.csv   (name,x,y per line)
+#   klayout -b -r make_dac_pads.py -rd FLAT=1              (flat output as before)
+#   klayout -b -r make_dac_pads.py -rd FORCE=1             (rebuild everything)
+# Builds are incremental (incremental_build): cells whose parameters did not
+# change are taken over from the previous output, and an up-to-date output
+# is not rewritten.  FLAT output is always built in full.
+import os, sys
 try:
     from klayout import db as pya
 except:
     import pya
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import incremental_build, layout_io, pad_rows
+from run_report import flag, rd
+
+PINS = rd("PINS", None)
+FLAT = flag("FLAT")
+OUT  = rd("OUT", "dac_pads.gds")
+
+build = incremental_build.Build(OUT, __file__, deps=[pad_rows.__file__],
+                                force=FLAT or flag("FORCE"))
+
 # Create layout
 layout = pya.Layout()
 layout.dbu = 0.001  # 1 nm units
-top = layout.create_cell("DAC_PADS")
 
 # Parameters
 coordinates = ((-275,-4765),(275,-4765))
@@ -17,41 +41,50 @@ columns = (64,2)
 origins = ((2000, 0),(0, 0))
 offsets = ((2000, 0),(65*2000,0))
 labels = ("ON","EN")
+toprow=(130000, 16370)   # the top row is the bottom row turned by 180° around toprow/2
 
 # Layers
 l_m2pin = layout.layer(pya.LayerInfo(10, 2))
 l_m2text= layout.layer(pya.LayerInfo(10,25))
 
-# Draw shapes
-half = size // 2
+# Pad groups of the bottom row, and the pins of both rows
+groups = []
+pins = []
 for n, origin, offset, label in zip(columns, origins, offsets, labels):
-    for source in range(n):
-        for coordinate, suffix in zip(coordinates, suffixes):
-            # element-wise addition: coordinate + source*offset
-            x, y = (c + source * m + o for c, m, o in zip(coordinate, offset, origin))
-            top.shapes(l_m2pin).insert(pya.Box(x - half, y - half, x + half, y + half))
-
-            text = pya.Text(label + suffix + f"[{source}]", x, y)
-            text.halign = pya.Text.HAlignCenter
-            text.valign = pya.Text.VAlignCenter
-            top.shapes(l_m2text).insert(text)
-
-# Draw shapes of upside down row
-toprow=(130000, 16370)
-for n, origin, offset, label, in zip(columns, origins, offsets, labels):
-    for source in range(n):
-        for coordinate, suffix in zip(coordinates, suffixes):
-            # element-wise addition: coordinate + source*offset
-            x, y = (t - (c + source * m + o) for t, c, m, o in zip(toprow, coordinate, offset, origin))
-            top.shapes(l_m2pin).insert(pya.Box(x - half, y - half, x + half, y + half))
-
-            index= source + n
-            text = pya.Text(label + suffix + f"[{index}]", x, y)
-            text.halign = pya.Text.HAlignCenter
-            text.valign = pya.Text.VAlignCenter
-            top.shapes(l_m2text).insert(text)
-
-# Save GDS
-layout.write("dac_pads.gds")
-print("Wrote dac_pads.gds")
+    for coordinate, suffix in zip(coordinates, suffixes):
+        start = (coordinate[0] + origin[0], coordinate[1] + origin[1])
+        groups.append((start, offset, n))
+        bottom = pad_rows.row_pins(label + suffix, start, offset, n)
+        pins += bottom
+        pins += pad_rows.mirrored_pins(bottom, toprow, index_shift=n)
+if PINS:
+    pins = pad_rows.read_pins_csv(PINS)
+
+# One pad, one row of pad arrays, two instances of the row
+def make_row():
+    row = layout.create_cell("DAC_PAD_ROW")
+    for start, offset, n in groups:
+        pad_rows.place_row(row, pad, start, offset, n)
+    return row
+
+def make_top():
+    top = layout.create_cell("DAC_PADS")
+    top.insert(pya.CellInstArray(row.cell_index(), pya.Trans()))
+    top.insert(pya.CellInstArray(row.cell_index(), pya.Trans(pya.Vector(*toprow)) * pya.Trans.R180))
+    pad_rows.insert_labels(top, l_m2text, pins)   # labels, in bulk
+    return top
+
+pad = build.cell(layout, "DAC_PAD", {"size": size},
+                 lambda: pad_rows.pad_cell(layout, "DAC_PAD", l_m2pin, size))
+row = build.cell(layout, "DAC_PAD_ROW", {"groups": groups}, make_row, children=[pad])
+top = build.cell(layout, "DAC_PADS", {"toprow": toprow, "pins": pins, "flat": FLAT}, make_top, children=[row])
+
+if FLAT:
+    top.flatten(True)
 
+# Save GDS (or OASIS / GDS.gz, from the OUT extension), unless up to date
+written = build.write(layout)
+if written is None:
+    print(f"{OUT} is up to date ({build.summary()})")
+else:
+    print(f"Wrote {layout_io.format_info(written)} ({len(pins)} labels; {build.summary()})")
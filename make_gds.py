@@ -1,10 +1,18 @@
 # make_gds.py
+# Incremental: the cell is only rebuilt, and the GDS only rewritten, when the
+# parameters or this script changed (incremental_build; -rd FORCE=1 rebuilds).
+import os, sys
 import pya
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import incremental_build
+
+OUT = "switched_pmos_cascode.gds"
+build = incremental_build.Build(OUT, __file__)
+
 # Create layout
 layout = pya.Layout()
 layout.dbu = 0.001  # 1 nm units
-top = layout.create_cell("SWITCHED_PMOS_CASCODE")
 
 # Parameters
 l = 300
@@ -21,17 +29,23 @@ l_label  = layout.layer(pya.LayerInfo(63, 0))
 
 
 # Draw shapes
-top.shapes(l_active).insert(pya.Box(290, -(l/2+230), 290+w, (l/2+340)))
-top.shapes(l_po).insert(    pya.Box(-150, -l/2, 470+w, l/2))
-top.shapes(l_co).insert(    pya.Box(-80,  -80,   80,  80))
-top.shapes(l_co).insert(    pya.Box(w/2+210,  l/2+110, w/2+370, l/2+270))
-top.shapes(l_m1).insert(    pya.Box(-80, -130,   80, 130))
-top.shapes(l_m1).insert(    pya.Box(w/2+160, l/2+110, w/2+420, l/2+270))
-top.shapes(l_pimp).insert(  pya.Box(-10, -(l/2+410),  590+w, (l/2+520)))
-top.shapes(l_nwell).insert( pya.Box(-30, -(l/2+640),  610+w, (l/2+650)))
-top.shapes(l_label).insert( pya.Box(-190, -(l/2+640),  610+w, (l/2+650)))
-
-# Save GDS
-layout.write("switched_pmos_cascode.gds")
-print("Wrote switched_pmos_cascode.gds")
+def make_top():
+    top = layout.create_cell("SWITCHED_PMOS_CASCODE")
+    top.shapes(l_active).insert(pya.Box(290, -(l/2+230), 290+w, (l/2+340)))
+    top.shapes(l_po).insert(    pya.Box(-150, -l/2, 470+w, l/2))
+    top.shapes(l_co).insert(    pya.Box(-80,  -80,   80,  80))
+    top.shapes(l_co).insert(    pya.Box(w/2+210,  l/2+110, w/2+370, l/2+270))
+    top.shapes(l_m1).insert(    pya.Box(-80, -130,   80, 130))
+    top.shapes(l_m1).insert(    pya.Box(w/2+160, l/2+110, w/2+420, l/2+270))
+    top.shapes(l_pimp).insert(  pya.Box(-10, -(l/2+410),  590+w, (l/2+520)))
+    top.shapes(l_nwell).insert( pya.Box(-30, -(l/2+640),  610+w, (l/2+650)))
+    top.shapes(l_label).insert( pya.Box(-190, -(l/2+640),  610+w, (l/2+650)))
+    return top
+
+top = build.cell(layout, "SWITCHED_PMOS_CASCODE", {"l": l, "w": w}, make_top)
 
+# Save GDS (unless it is up to date)
+if build.write(layout) is None:
+    print(f"{OUT} is up to date")
+else:
+    print(f"Wrote {OUT}")
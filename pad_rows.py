@@ -0,0 +1,81 @@
+# pad_rows.py
+# Hierarchical, array-based pad rows.
+#
+# make_dac_pads.py used to insert one flat Box plus one Text per pad in
+# nested loops, and recomputed every coordinate again for the mirrored top
+# row.  Here one pad cell is built once, each pad group of a row becomes a
+# single CellInstArray in a row cell, and a mirrored row is just a second,
+# transformed instance of that same row cell.  Labels are generated in bulk
+# from a pin list (name, x, y), e.g. read from CSV.
+#
+# Usage:
+#   import pad_rows
+#   pad = pad_rows.pad_cell(ly, "PAD", l_pin, 290)
+#   row = ly.create_cell("ROW")
+#   pad_rows.place_row(row, pad, (-275, -4765), (2000, 0), 64)
+#   pad_rows.insert_labels(top, l_text, pad_rows.read_pins_csv("pins.csv"))
+
+import csv
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+
+def pad_cell(layout, name, layer, size):
+    """A cell holding one size x size pad box centred on the origin."""
+    cell = layout.create_cell(name)
+    half = size // 2
+    cell.shapes(layer).insert(pya.Box(-half, -half, half, half))
+    return cell
+
+
+def place_row(row, pad, start, pitch, n):
+    """Place n pads from start with the given pitch as one CellInstArray."""
+    row.insert(pya.CellInstArray(pad.cell_index(), pya.Trans(pya.Vector(*start)),
+                                 pya.Vector(*pitch), pya.Vector(0, 0), n, 1))
+
+
+def row_pins(names, start, pitch, n, first_index=0):
+    """Pin list [(name, x, y)] for a row placed with place_row()."""
+    return [(f"{names}[{first_index + k}]", start[0] + k * pitch[0], start[1] + k * pitch[1])
+            for k in range(n)]
+
+
+def mirrored_pins(pins, center, index_shift=0):
+    """Pins of a row turned by 180 degrees around center (as a Trans.R180 instance)."""
+    out = []
+    for name, x, y in pins:
+        if index_shift and name.endswith("]"):
+            base, idx = name[:-1].rsplit("[", 1)
+            name = f"{base}[{int(idx) + index_shift}]"
+        out.append((name, center[0] - x, center[1] - y))
+    return out
+
+
+def read_pins_csv(path):
+    """Read 'name,x,y' rows (a header line is skipped) into [(name, x, y)]."""
+    pins = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#"):
+                continue
+            try:
+                pins.append((row[0].strip(), int(row[1]), int(row[2])))
+            except ValueError:
+                continue  # header line
+    return pins
+
+
+def insert_labels(cell, layer, pins, halign=None, valign=None):
+    """Insert one centred Text per pin through a single Texts collection."""
+    halign = pya.Text.HAlignCenter if halign is None else halign
+    valign = pya.Text.VAlignCenter if valign is None else valign
+    texts = pya.Texts()
+    for name, x, y in pins:
+        t = pya.Text(name, x, y)
+        t.halign = halign
+        t.valign = valign
+        texts.insert(t)
+    cell.shapes(layer).insert(texts)
+    return len(pins)
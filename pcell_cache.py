@@ -0,0 +1,237 @@
+# pcell_cache.py
+# Persistent on-disk cache of produced PCell variants.
+#
+# Decorate a pya.PCellDeclarationHelper subclass with @cached_pcell and its
+# produce_impl() is only run on a cache miss.  The key is a stable hash of
+#   * every declared parameter value (layers as "L/D" strings),
+#   * the layout database unit,
+#   * the source code of the PCell class and of the sibling modules its
+#     module uses (contact_array & co.), so edits invalidate the cache.
+# The produced cell tree is stored as OASIS and copied back into the target
+# cell on a hit.  Child cells are matched by name: a shared sub-cell that
+# already exists in the target layout (contact_array's CO_<w>x<h>_<L>_<D>,
+# a device cell) is placed again, not copied a second time.  The cache
+# directory is kept below a size limit by evicting the least recently used
+# files.
+#
+# The cache is off unless enabled.  Environment:
+#   PCELL_CACHE=1            enable the cache
+#   PCELL_CACHE_DIR=...      cache directory (default ~/.cache/klayoutAPI/pcells)
+#   PCELL_CACHE_MAX_MB=512   size limit in MB
+#
+# Usage:
+#   from pcell_cache import cached_pcell
+#   @cached_pcell
+#   class MyPCell(pya.PCellDeclarationHelper): ...
+#   pcell_cache.stats  ->  {"hits": ..., "misses": ..., "stores": ..., "evictions": ...}
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+CACHE_DIR = os.environ.get("PCELL_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "klayoutAPI", "pcells"))
+MAX_BYTES = int(os.environ.get("PCELL_CACHE_MAX_MB", "512")) * 1024 * 1024
+ENABLED = os.environ.get("PCELL_CACHE", "0") not in ("", "0")
+
+stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+_versions = {}
+_total = None   # running estimate of the cache size in bytes
+
+
+def _sibling_modules(namespace, seen):
+    """Modules next to this file used by namespace (a module's globals), recursively."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    for value in list(namespace.values()):
+        path = getattr(value, "__file__", None) if inspect.ismodule(value) else None
+        if (not path or value.__name__ == __name__ or value in seen
+                or os.path.dirname(os.path.abspath(path)) != here):
+            continue
+        seen.append(value)
+        _sibling_modules(vars(value), seen)
+    return seen
+
+
+def source_version(cls):
+    """
+    Hash of the PCell class source and of the sibling modules its module
+    uses; changes whenever the PCell code or a helper it calls does.
+    """
+    v = _versions.get(cls)
+    if v is None:
+        try:
+            src = inspect.getsource(cls)
+        except (OSError, TypeError):
+            # e.g. code run through exec() by KLayout: hash the whole file if known
+            path = getattr(sys.modules.get(cls.__module__), "__file__", None)
+            try:
+                with open(path) as f:
+                    src = f.read()
+            except (OSError, TypeError):
+                src = cls.__module__ + "." + cls.__qualname__
+        h = hashlib.sha256(src.encode())
+        produce = getattr(cls.produce_impl, "__wrapped__", cls.produce_impl)
+        namespace = getattr(produce, "__globals__", {})   # also set for exec()'d code
+        for mod in sorted(_sibling_modules(namespace, []), key=lambda m: m.__name__):
+            with open(mod.__file__, "rb") as f:
+                h.update(mod.__name__.encode() + b"\0" + f.read())
+        v = _versions[cls] = h.hexdigest()[:16]
+    return v
+
+
+def _stable(value):
+    if isinstance(value, pya.LayerInfo):
+        return value.to_s()
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    return repr(value)
+
+
+def cache_key(decl, cls):
+    """Stable key of a PCell variant: parameters, dbu and source version."""
+    params = [(p.name, _stable(getattr(decl, p.name))) for p in decl.get_parameters()]
+    blob = json.dumps({"pcell": cls.__qualname__, "version": source_version(cls),
+                       "dbu": decl.layout.dbu, "params": params}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, key[:2], key + ".oas")
+
+
+def _load(path, cell, created):
+    """
+    Copy the stored tree into cell.  Child cells are looked up by name in
+    the target layout and only created (appended to created) if missing.
+    """
+    ly = pya.Layout()
+    ly.read(path)
+    src = ly.top_cell()
+    tly = cell.layout()
+    lmap = pya.LayerMapping()
+    lmap.create_full(tly, ly)
+    cmap = {}
+    props = {0: 0}
+
+    def copy(scell, tcell):
+        tcell.copy_shapes(scell, lmap)
+        for inst in scell.each_inst():
+            # a new array, not cell_inst.dup(): inserting a copy of an array
+            # of the scratch layout crashes KLayout inside produce_impl
+            sa = inst.cell_inst
+            t = sa.cplx_trans if sa.is_complex() else sa.trans
+            if sa.is_regular_array():
+                ca = pya.CellInstArray(cmap[inst.cell_index], t, sa.a, sa.b, sa.na, sa.nb)
+            else:
+                ca = pya.CellInstArray(cmap[inst.cell_index], t)
+            pid = inst.prop_id
+            if pid not in props:
+                props[pid] = tly.properties_id(ly.properties(pid))
+            tcell.insert(ca, props[pid])
+
+    below = set(src.called_cells())
+    for ci in ly.each_cell_bottom_up():   # children before their parents
+        if ci not in below:
+            continue
+        scell = ly.cell(ci)
+        tcell = tly.cell(scell.name)
+        if tcell is None:
+            tcell = tly.create_cell(scell.name)
+            created.append(tcell.cell_index())
+            copy(scell, tcell)
+        cmap[ci] = tcell.cell_index()
+    copy(src, cell)
+
+
+def _store(path, cell):
+    ly = pya.Layout()
+    ly.dbu = cell.layout().dbu
+    ly.create_cell("PCELL").copy_tree(cell)
+    opt = pya.SaveLayoutOptions()
+    opt.format = "OASIS"
+    opt.write_context_info = False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        ly.write(tmp, opt)
+        os.replace(tmp, path)   # atomic: concurrent readers never see half a file
+    except Exception:
+        try:
+            os.remove(tmp)   # no half-written leftovers in the cache directory
+        except OSError:
+            pass
+        raise
+
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the cache fits max_bytes."""
+    global _total
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if name.endswith(".oas"):
+                p = os.path.join(root, name)
+                st = os.stat(p)
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+    entries.sort()
+    for _, size, p in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(p)
+        except OSError:
+            continue
+        total -= size
+        stats["evictions"] += 1
+    _total = total
+    return total
+
+
+def cached_pcell(cls):
+    """Class decorator: serve produce_impl() from the on-disk cache."""
+    produce = cls.produce_impl
+
+    def produce_impl(self):
+        global _total
+        if not ENABLED:
+            return produce(self)
+        path = _path(cache_key(self, cls))
+        if os.path.exists(path):
+            created = []
+            try:
+                _load(path, self.cell, created)
+                os.utime(path)   # mark as recently used
+                stats["hits"] += 1
+                return
+            except Exception:
+                # unreadable entry: drop what was copied so far, produce it again
+                self.cell.clear()
+                if created:
+                    self.layout.delete_cells(created)
+        stats["misses"] += 1
+        produce(self)
+        try:
+            _store(path, self.cell)
+            stats["stores"] += 1
+            if _total is None:
+                evict()   # first store: measure (and trim) the directory once
+            else:
+                _total += os.path.getsize(path)
+                if _total > MAX_BYTES:
+                    evict()
+        except Exception:
+            pass   # read-only or full cache directory, writer error: just don't cache
+    produce_impl.__doc__ = produce.__doc__
+    produce_impl.__wrapped__ = produce
+    cls.produce_impl = produce_impl
+    return cls
@@ -0,0 +1,249 @@
+# pcell_drc.py
+# Rule checks of generated PCell geometry against the PCell's own rule values.
+#
+# PMOSSwitchArray carries its rules as parameters (cont_size_nm,
+# cont_pitch_nm, cont_enc_od_nm, cont_enc_m1_nm, po_space_nm, po_ovl_od_nm,
+# l_nm) and feol_contact as class constants (CONTACT_SIZE, ...).  Nothing
+# checked that the produced cells actually meet them.  Here each PCell name
+# maps to a function deriving width / space / enclosure / extension rules
+# from a parameter dict; the rules run on deep (hierarchical) Regions of
+# one multi-threaded DeepShapeStore, so arrays and shared subcells (CO
+# cells, device cells) are checked once and nothing is flattened.
+#
+# Violations go into a marker database (ReportDatabase, one category per
+# rule, viewable in KLayout's marker browser) and are counted per rule.
+# Metrics are projection metrics (Manhattan geometry; corner-to-corner
+# distances are not measured).
+#
+# Usage:
+#   import pcell_drc
+#   counts = pcell_drc.check_pcell("PMOSSwitchArrayLib", "PMOSSwitchArray", {"n": 16}, threads=8)
+#   counts = pcell_drc.check_layout(ly, threads=8, db=pcell_drc.new_rdb())   (every PCell variant in ly)
+#
+#   python pcell_drc.py PMOSSwitchArrayLib PMOSSwitchArray -p n=16 -p w_nm=500 --rdb sw16.lyrdb
+#   python pcell_drc.py --gds sweep.gds --json counts.json   (PCell variants from context info)
+# Exit code 0 if no rule is violated, 1 otherwise.
+
+import argparse
+import json
+import os
+import sys
+from collections import namedtuple
+try:
+    from klayout import db as pya
+    from klayout import rdb
+except Exception:
+    import pya  # if running inside KLayout's Python
+    rdb = pya
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+
+# check: "width", "space", "enclosing" (other encloses layer by value),
+# "endcap" (the same, on the vertical edges only), "extension" (layer
+# extends beyond other by value where they cross) or "inside" (layer lies
+# inside other; value unused); layer / other are (L, D), value is in nm.
+Rule = namedtuple("Rule", "name check layer other value")
+
+
+def _ld(info):
+    return info.layer, info.datatype
+
+
+def pmos_switch_array_rules(p):
+    """Rules of a PMOSSwitchArray from its parameters."""
+    od, po, co, m1 = _ld(p["ly_od"]), _ld(p["ly_po"]), _ld(p["ly_co"]), _ld(p["ly_m1"])
+    return [
+        Rule("CO.W", "width", co, None, p["cont_size_nm"]),
+        Rule("CO.S", "space", co, None, p["cont_pitch_nm"] - p["cont_size_nm"]),
+        Rule("OD.EN.CO", "enclosing", co, od, p["cont_enc_od_nm"]),
+        Rule("M1.EN.CO", "enclosing", co, m1, p["cont_enc_m1_nm"]),
+        Rule("PO.W", "width", po, None, p["l_nm"]),
+        Rule("PO.S", "space", po, None, p["po_space_nm"]),
+        Rule("PO.EX.OD", "extension", po, od, p["po_ovl_od_nm"]),
+    ]
+
+
+def feol_contact_rules(p):
+    """Rules of a feol_contact from its layers and the class constants."""
+    from BasicsLib import feol_contact
+    co, m1 = _ld(p["ly_co"]), _ld(p["ly_m1"])
+    return [
+        Rule("CO.W", "width", co, None, feol_contact.CONTACT_SIZE),
+        Rule("CO.S", "space", co, None, feol_contact.CONTACT_DISTANCE),
+        Rule("M1.CO", "inside", co, m1, 0),
+        # the cuts are fitted with the end cap along x, the extension along y
+        Rule("M1.EC.CO", "endcap", co, m1, feol_contact.METAL1_ENDCAP),
+        Rule("M1.EN.CO", "enclosing", co, m1, feol_contact.METAL1_EXTENSION),
+    ]
+
+
+# PCell name -> rule function
+RULE_SETS = {
+    "PMOSSwitchArray": pmos_switch_array_rules,
+    "FEOL contacts": feol_contact_rules,
+}
+
+
+def rules_for(pcell, params):
+    """Rules of PCell pcell with params {name: value} (all of them, defaults included)."""
+    if pcell not in RULE_SETS:
+        raise ValueError(f"no rules for PCell {pcell!r}")
+    return [r for r in RULE_SETS[pcell](params) if r.value > 0 or r.check == "inside"]
+
+
+class Checker:
+    """Deep Regions of the layers below one cell, sharing one DeepShapeStore."""
+
+    def __init__(self, cell, threads=None):
+        self.cell = cell
+        self.layout = cell.layout()
+        self.dss = pya.DeepShapeStore()
+        self.dss.threads = threads or os.cpu_count()
+        self._regions = {}
+
+    def region(self, ld):
+        reg = self._regions.get(ld)
+        if reg is None:
+            li = self.layout.find_layer(pya.LayerInfo(*ld))
+            if li is None or li < 0:
+                reg = pya.Region()
+            else:
+                reg = pya.Region(self.cell.begin_shapes_rec(li), self.dss)
+            self._regions[ld] = reg
+        return reg
+
+    def run(self, rule):
+        """EdgePairs (Region for "inside") marking the violations of rule."""
+        d = int(round(rule.value * 1e-3 / self.layout.dbu))
+        proj = pya.Metrics.Projection
+        a = self.region(rule.layer)
+        if rule.check == "width":
+            return a.width_check(d, False, proj)
+        if rule.check == "space":
+            return a.space_check(d, False, proj)
+        b = self.region(rule.other)
+        if rule.check == "inside":
+            return a.not_inside(b)
+        if rule.check == "enclosing":
+            return b.enclosing_check(a, d, False, proj)
+        if rule.check == "endcap":
+            return b.edges().with_angle(90, False).enclosing_check(
+                a.edges().with_angle(90, False), d, False, proj)
+        if rule.check == "extension":
+            # edges of the crossing (a & b) lying on b's outline must be
+            # enclosed by a's outline
+            ends = (a & b).edges() & b.edges()
+            return a.edges().enclosing_check(ends, d, False, proj)
+        raise ValueError(f"unknown check {rule.check!r}")
+
+
+def new_rdb(name="pcell_drc"):
+    db = rdb.ReportDatabase(name)
+    db.generator = "pcell_drc.py"
+    return db
+
+
+def check_cell(cell, rules, threads=None, db=None):
+    """
+    Run rules on the tree below cell.  Violations are added to the marker
+    database db (if given) under cell's name.  Returns {rule name: count}.
+    """
+    chk = Checker(cell, threads)
+    trans = pya.CplxTrans(cell.layout().dbu)
+    rcell = db.create_cell(cell.name) if db is not None else None
+    counts = {}
+    for rule in rules:
+        ep = chk.run(rule)
+        counts[rule.name] = ep.count()
+        if db is not None and counts[rule.name]:
+            cat = db.category_by_path(rule.name) or db.create_category(rule.name)
+            cat.description = rule.check if rule.check == "inside" else f"{rule.check} {rule.value} nm"
+            db.create_items(rcell.rdb_id(), cat.rdb_id(), trans, ep)
+    return counts
+
+
+def pcell_of(cell):
+    """(PCell name, {param: value}) of a PCell variant / library proxy, else None."""
+    if not cell.is_pcell_variant():
+        return None
+    decl = cell.pcell_declaration()
+    return (decl.name() if decl is not None else None), cell.pcell_parameters_by_name()
+
+
+def check_layout(layout, threads=None, db=None):
+    """
+    Check every PCell variant of layout that has a rule set.  Returns
+    {cell name: {rule name: count}}.
+    """
+    out = {}
+    for cell in layout.each_cell():
+        pc = pcell_of(cell)
+        if pc is None or pc[0] not in RULE_SETS:
+            continue
+        out[cell.name] = check_cell(cell, rules_for(*pc), threads, db)
+    return out
+
+
+def check_pcell(lib, pcell, params=None, threads=None, db=None):
+    """Produce PCell pcell of library lib with params and check it."""
+    ly = pya.Layout()
+    ly.dbu = 0.001
+    cell = ly.create_cell(pcell, lib, params or {})
+    if cell is None:
+        raise ValueError(f"no PCell {pcell!r} in library {lib!r}")
+    return check_cell(cell, rules_for(pcell, cell.pcell_parameters_by_name()), threads, db)
+
+
+def violations(counts):
+    """Total violation count of a check_cell() or check_layout() result."""
+    return sum(violations(v) if isinstance(v, dict) else v for v in counts.values())
+
+
+def _param(s):
+    k, v = s.split("=", 1)
+    try:
+        return k, json.loads(v)   # numbers, true/false
+    except ValueError:
+        return k, v
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Check generated PCells against their own rule values")
+    ap.add_argument("lib", nargs="?")
+    ap.add_argument("pcell", nargs="?")
+    ap.add_argument("-p", "--param", action="append", default=[], help="NAME=VALUE (repeatable)")
+    ap.add_argument("--gds", default=None, help="check the PCell variants of this layout instead")
+    ap.add_argument("--threads", type=int, default=os.cpu_count())
+    ap.add_argument("--rdb", default=None, help="write the markers to this .lyrdb file")
+    ap.add_argument("--json", default=None, help="write the counts as JSON")
+    args = ap.parse_args(argv)
+    if not args.gds and not (args.lib and args.pcell):
+        ap.error("give LIB PCELL or --gds")
+
+    import pcell_libraries
+    pcell_libraries.load_libraries()
+    db = new_rdb()
+    if args.gds:
+        ly = pya.Layout()
+        ly.read(args.gds)
+        db.top_cell_name = ly.top_cell().name
+        counts = check_layout(ly, args.threads, db)
+    else:
+        db.top_cell_name = args.pcell
+        counts = {args.pcell: check_pcell(args.lib, args.pcell, dict(map(_param, args.param)),
+                                          args.threads, db)}
+
+    for name, per_rule in counts.items():
+        print(f"{name}: " + ", ".join(f"{r}={n}" for r, n in per_rule.items()))
+    if args.rdb:
+        db.save(args.rdb)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(counts, f, indent=2)
+    total = violations(counts)
+    print(f"{total} violation(s) in {len(counts)} cell(s)")
+    return 1 if total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+# pcell_libraries.py
+# The PCell library modules of this directory, registered in one call.
+#
+# layout_daemon.py (pool workers), pcell_sweep.py (pool workers) and
+# pcell_drc.py all need BasicsLib / PMOSSourcesLib / PMOSSwitchArrayLib
+# registered before they can create PCell variants; each library module
+# registers itself on import.
+#
+# Usage:
+#   import pcell_libraries
+#   pcell_libraries.load_libraries()
+
+import importlib
+
+PCELL_LIBRARIES = ("BasicsLib", "switched_pmos_cascode", "pcell_pmos_switch_array")
+
+
+def load_libraries():
+    """Import (and so register) every module of PCELL_LIBRARIES; also a pool initializer."""
+    for name in PCELL_LIBRARIES:
+        importlib.import_module(name)
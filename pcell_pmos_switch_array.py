@@ -6,8 +6,22 @@
 # (no TypeDouble anywhere).
 # ----------------------------------------------------------------------
 
+import os, sys
 import pya
 
+try:
+    import contact_array
+except ImportError:  # loaded as a macro: the sibling modules are next to this file
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import contact_array
+
+try:
+    from pcell_cache import cached_pcell
+except ImportError:  # cache module not on the macro path: produce every time
+    def cached_pcell(cls):
+        return cls
+
+@cached_pcell
 class PMOSSwitchArray(pya.PCellDeclarationHelper):
     def __init__(self):
         super(PMOSSwitchArray, self).__init__()
@@ -40,6 +54,10 @@ class PMOSSwitchArray(pya.PCellDeclarationHelper):
         self.param("ly_lbl", self.TypeLayer, "Text Labels", default=pya.LayerInfo(63, 0))
         self.param("ly_pr", self.TypeLayer, "Placement boundary", default=pya.LayerInfo(63, 0))
 
+        # appended last: existing positional parameter lists keep their meaning
+        self.param("hier", self.TypeBoolean, "Hierarchical (device cell + array)", default=False)
+        self.param("co_array", self.TypeBoolean, "CO cuts as one cell array", default=False)
+
     def display_text_impl(self):
         return f"PMOSSwitchArray_n{self.n}_W{self.w_nm}nm_L{self.l_nm}nm"
 
@@ -60,6 +78,14 @@ class PMOSSwitchArray(pya.PCellDeclarationHelper):
         t = pya.Trans(self._to_dbu_nm(x_nm, dbu), self._to_dbu_nm(y_nm, dbu))
         shapes(layer).insert(pya.Text(txt, t))
 
+    def _dev_cell_name(self):
+        # every parameter the device sub-cell's geometry depends on, so equal
+        # names mean equal cells (shared between variants, never renamed $N)
+        lds = "_".join(f"{i.layer}.{i.datatype}" for i in (self.ly_po, self.ly_co, self.ly_m1))
+        return (f"PMOSSwitch_W{self.w_nm}_L{self.l_nm}_SD{self.sd_ext_nm}_PO{self.po_ovl_od_nm}"
+                f"_CO{self.cont_size_nm}p{self.cont_pitch_nm}e{self.cont_enc_od_nm}m{self.cont_enc_m1_nm}"
+                f"{'A' if self.co_array else 'F'}_{lds}")
+
     def produce_impl(self):
         dbu = self.layout.dbu
 
@@ -87,58 +113,69 @@ class PMOSSwitchArray(pya.PCellDeclarationHelper):
         gate_y0 = od_bottom + self.sd_ext_nm
         gate_y1 = gate_y0 + self.w_nm
 
-        # OD and PIMP regions with bottom notches between devices
-        od_reg = pya.Region(self._ibox_nm(0, od_bottom, array_width, od_top, dbu))
-        pim_reg = pya.Region(self._ibox_nm(0, od_bottom, array_width, od_top, dbu))
-
-        gate_boxes = []
-        x0 = 0
-        for i in range(self.n):
-            g_x0 = x0 + self.sd_ext_nm
-            g_x1 = g_x0 + self.l_nm
-            gate_boxes.append(self._ibox_nm(g_x0, gate_y0 - self.po_ovl_od_nm, g_x1, gate_y1 + self.po_ovl_od_nm, dbu))
-
-            if i < self.n - 1:
-                notch_x0 = x0 + gate_pitch - self.po_space_nm // 2
-                notch_x1 = notch_x0 + self.po_space_nm
-                notch_box = self._ibox_nm(notch_x0, od_bottom, notch_x1, od_bottom + self.bot_gap_nm, dbu)
-                od_reg -= pya.Region(notch_box)
-                pim_reg -= pya.Region(notch_box)
-
-            x0 += gate_pitch
+        # OD and PIMP region with bottom notches between devices: all notch
+        # boxes are collected first and subtracted in a single boolean
+        notches = pya.Region()
+        for i in range(self.n - 1):
+            notch_x0 = i * gate_pitch + gate_pitch - self.po_space_nm // 2
+            notch_x1 = notch_x0 + self.po_space_nm
+            notches.insert(self._ibox_nm(notch_x0, od_bottom, notch_x1, od_bottom + self.bot_gap_nm, dbu))
+        od_reg = pya.Region(self._ibox_nm(0, od_bottom, array_width, od_top, dbu)) - notches
 
         shapes(ly_od).insert(od_reg)
-        shapes(ly_pimp).insert(pim_reg)
-
-        for bx in gate_boxes:
-            shapes(ly_po).insert(bx)
-
-        # Bottom drain contacts + M1 bars + labels
-        x0 = 0
+        shapes(ly_pimp).insert(od_reg)
+
+        # One device at x0 = 0: gate, bottom drain contacts, M1 landing bar.
+        # All devices are the same device shifted by i * gate_pitch.
+        dev = {ly_po: [], ly_m1: []}
+
+        g_x0 = self.sd_ext_nm
+        g_x1 = g_x0 + self.l_nm
+        dev[ly_po].append(self._ibox_nm(g_x0, gate_y0 - self.po_ovl_od_nm, g_x1, gate_y1 + self.po_ovl_od_nm, dbu))
+
+        # Contacts: same fit/centring as before, now via contact_array
+        od_w = self.l_nm + 2*self.sd_ext_nm
+        cut_half = self.cont_size_nm // 2
+        n_cuts, cut_x0 = contact_array.fit_cuts(od_w, self.cont_size_nm, self.cont_pitch_nm - self.cont_size_nm,
+                                                margin=self.cont_enc_od_nm, min_cuts=1)
+        start_x = cut_x0 + cut_half
+        co = (self._to_dbu_nm(start_x - cut_half, dbu), self._to_dbu_nm(drain_co_y - cut_half, dbu),
+              self._to_dbu_nm(2 * cut_half, dbu), self._to_dbu_nm(self.cont_pitch_nm, dbu))
+
+        # M1 landing
+        m1_y0 = drain_co_y - (self.cont_size_nm // 2 + self.cont_enc_m1_nm)
+        m1_y1 = drain_co_y + (self.cont_size_nm // 2 + self.cont_enc_m1_nm)
+        m1_x0 = start_x - self.cont_size_nm // 2 - self.cont_enc_m1_nm
+        m1_x1 = start_x + (n_cuts - 1) * self.cont_pitch_nm + self.cont_size_nm // 2 + self.cont_enc_m1_nm
+        dev[ly_m1].append(self._ibox_nm(m1_x0, m1_y0, m1_x1, m1_y1, dbu))
+
+        pitch = self._to_dbu_nm(gate_pitch, dbu)
+        if self.hier:
+            # one device sub-cell placed as a 1 x n array (reused if already there)
+            name = self._dev_cell_name()
+            dev_cell = self.layout.cell(name)
+            if dev_cell is None:
+                dev_cell = self.layout.create_cell(name)
+                for li, boxes in dev.items():
+                    for bx in boxes:
+                        dev_cell.shapes(li).insert(bx)
+                contact_array.place_contacts(dev_cell, ly_co, co[0], co[1], n_cuts, 1, co[2], co[3],
+                                             array=self.co_array)
+            self.cell.insert(pya.CellInstArray(dev_cell.cell_index(), pya.Trans(),
+                                               pya.Vector(pitch, 0), pya.Vector(0, 0), self.n, 1))
+        else:
+            for li, boxes in dev.items():
+                for i in range(self.n):
+                    for bx in boxes:
+                        shapes(li).insert(bx.moved(i * pitch, 0))
+            # one CO array instance per device (or flat cuts, in bulk)
+            for i in range(self.n):
+                contact_array.place_contacts(self.cell, ly_co, co[0] + i * pitch, co[1], n_cuts, 1, co[2], co[3],
+                                             array=self.co_array)
+
+        # Labels
         for i in range(self.n):
-            od_left = x0
-            od_right = x0 + (self.l_nm + 2*self.sd_ext_nm)
-            usable_w = (od_right - od_left) - 2*self.cont_enc_od_nm
-            n_cuts = max(1, (usable_w + (self.cont_pitch_nm - self.cont_size_nm)) // self.cont_pitch_nm)
-            total_cuts_w = n_cuts * self.cont_pitch_nm - (self.cont_pitch_nm - self.cont_size_nm)
-            start_x = od_left + self.cont_enc_od_nm + ((usable_w - total_cuts_w) // 2) + self.cont_size_nm // 2
-
-            # Contacts
-            for k in range(n_cuts):
-                cx = start_x + k * self.cont_pitch_nm
-                shapes(ly_co).insert(self._ico_nm(cx, drain_co_y, self.cont_size_nm, dbu))
-
-            # M1 landing
-            m1_y0 = drain_co_y - (self.cont_size_nm // 2 + self.cont_enc_m1_nm)
-            m1_y1 = drain_co_y + (self.cont_size_nm // 2 + self.cont_enc_m1_nm)
-            m1_x0 = start_x - self.cont_size_nm // 2 - self.cont_enc_m1_nm
-            m1_x1 = start_x + (n_cuts - 1) * self.cont_pitch_nm + self.cont_size_nm // 2 + self.cont_enc_m1_nm
-            shapes(ly_m1).insert(self._ibox_nm(m1_x0, m1_y0, m1_x1, m1_y1, dbu))
-
-            # Label
-            self._text_nm(shapes, ly_lbl, f"{self.m1_lbl_prefix}{i}", (m1_x0 + m1_x1) // 2, m1_y1 + 50, dbu)
-
-            x0 += gate_pitch
+            self._text_nm(shapes, ly_lbl, f"{self.m1_lbl_prefix}{i}", i * gate_pitch + (m1_x0 + m1_x1) // 2, m1_y1 + 50, dbu)
 
         # Optional shared gate strap in M1 on the left (placeholder)
         if self.add_gate_strap:
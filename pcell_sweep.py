@@ -0,0 +1,264 @@
+# pcell_sweep.py
+# Parameter sweeps of a PCell on a process pool, stitched into one library.
+#
+# Characterizing SwitchedPMOSCascode or PMOSSwitchArray over w / l / n and
+# contact settings meant hand-written loops creating one variant after the
+# other in one process.  Here:
+#   * the grid (one list of values per parameter) is expanded to points,
+#   * each point goes through the PCell's coerce_parameters() and points
+#     that coerce to the same parameter set are produced only once,
+#   * the variants are produced in chunks on a process pool, each chunk
+#     written to a temporary OASIS file (no library proxies),
+#   * the chunks are merged into one layout with cell_dedup.merge_tree()
+#     (name-preserving), so subcells shared between variants (same-named CO
+#     cells, device cells) exist once, differently named cells stay apart,
+#     and written as the library with an index <out>.sweep.json of
+#     cell name -> parameters.
+# Every variant is a top cell of the library.  With check=True each variant
+# is also run through pcell_drc and its violation counts go into the index.
+#
+# Usage:
+#   import pcell_sweep
+#   pcell_sweep.sweep("PMOSSwitchArrayLib", "PMOSSwitchArray", {"n": [1, 2, 4], "w_nm": [300, 500]},
+#                     "sw_sweep.gds", workers=16)
+#
+#   python pcell_sweep.py PMOSSourcesLib SwitchedPMOSCascode casc.gds -g w=100:1000:50 -g l=100:600:50
+#   python pcell_sweep.py PMOSSwitchArrayLib PMOSSwitchArray sw.oas -g n=1,2,4,8 \
+#       -g cont_enc_od_nm=30,40 --grid more.json --check --workers 16
+# A value list is comma separated or start:stop:step (integers, stop included).
+
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import cell_dedup
+import layout_io
+import pcell_drc
+import pcell_libraries
+import run_report
+
+SUFFIX = ".sweep.json"
+
+
+def _value(s):
+    try:
+        return json.loads(s)   # numbers, true/false
+    except ValueError:
+        return s
+
+
+def parse_values(s):
+    """'1,2,4' -> [1, 2, 4]; '100:400:100' -> [100, 200, 300, 400]."""
+    if s.count(":") == 2 and "," not in s:
+        start, stop, step = (int(t) for t in s.split(":"))
+        return list(range(start, stop + (1 if step > 0 else -1), step))
+    return [_value(t.strip()) for t in s.split(",") if t.strip()]
+
+
+def parse_grid(items):
+    """['n=1,2,4', 'w_nm=300:900:100'] -> {'n': [1, 2, 4], 'w_nm': [300, ..., 900]}."""
+    grid = {}
+    for item in items:
+        k, v = item.split("=", 1)
+        grid[k.strip()] = parse_values(v)
+    return grid
+
+
+def expand(grid):
+    """All points {name: value} of the grid, in grid order."""
+    keys = list(grid)
+    return [dict(zip(keys, vals)) for vals in itertools.product(*(grid[k] for k in keys))]
+
+
+def _plain(v):
+    return v.to_s() if isinstance(v, pya.LayerInfo) else v
+
+
+def declaration(lib, pcell):
+    """The PCellDeclaration of pcell in the registered library lib."""
+    library = pya.Library.library_by_name(lib)
+    decl = library.layout().pcell_declaration(pcell) if library is not None else None
+    if decl is None:
+        raise ValueError(f"no PCell {pcell!r} in library {lib!r}")
+    return decl
+
+
+def coerce_points(decl, layout, points):
+    """
+    [(params, [points])]: the distinct coerced parameter sets of points, in
+    order, with the points that coerce to each.  params holds every
+    non-layer parameter of the declaration.
+    """
+    pdecls = decl.get_parameters()
+    out = {}
+    for point in points:
+        values = decl.coerce_parameters(layout, [point.get(pd.name, pd.default) for pd in pdecls])
+        params = {pd.name: v for pd, v in zip(pdecls, values) if not isinstance(v, pya.LayerInfo)}
+        key = tuple(_plain(v) for v in values)
+        out.setdefault(key, (params, []))[1].append(point)
+    return list(out.values())
+
+
+def variant_name(pcell, params, keys):
+    """Cell name of a variant from the swept parameters, e.g. PMOSSwitchArray_n4_w_nm300."""
+    name = pcell.replace(" ", "_") + "".join(f"_{k}{params[k]}" for k in keys)
+    return name.replace("/", "_").replace(" ", "_")
+
+
+def produce_chunk(lib, pcell, variants, tmp, dbu=0.001, check=False):
+    """
+    Worker: produce [(name, params), ...] and write them, as top cells
+    without library proxies, to tmp (OASIS).  Returns {name: rule counts}
+    if check, else {}.
+    """
+    ly = pya.Layout()
+    ly.dbu = dbu
+    out = pya.Layout()
+    out.dbu = dbu
+    counts = {}
+    for name, params in variants:
+        pc = ly.create_cell(pcell, lib, params)
+        if pc is None:
+            raise ValueError(f"no PCell {pcell!r} in library {lib!r}")
+        if check:
+            rules = pcell_drc.rules_for(pcell, pc.pcell_parameters_by_name())
+            counts[name] = pcell_drc.check_cell(pc, rules, threads=1)
+        out.create_cell(name).copy_tree(pc)
+    layout_io.write_layout(out, tmp, "OASIS", context_info=False)
+    return counts
+
+
+def sweep(lib, pcell, grid, out, workers=None, chunk=None, check=False, dbu=0.001, report=None):
+    """
+    Produce every distinct (coerced) point of grid {param: [values]} of
+    PCell pcell in library lib and write them as one library to out, with
+    the index next to it (out + SUFFIX).  Returns the index.
+    """
+    report = report or run_report.RunReport("pcell_sweep")
+    if check and pcell not in pcell_drc.RULE_SETS:
+        raise ValueError(f"no rules for PCell {pcell!r}")
+    workers = workers or os.cpu_count()
+    with report.phase("coerce"):
+        ly = pya.Layout()
+        ly.dbu = dbu
+        decl = declaration(lib, pcell)
+        unknown = set(grid) - {pd.name for pd in decl.get_parameters()}
+        if unknown:
+            raise ValueError(f"{pcell!r} has no parameter(s) {', '.join(sorted(unknown))}")
+        points = expand(grid)
+        distinct = coerce_points(decl, ly, points)
+        variants, taken = [], set()
+        for params, _ in distinct:
+            name = base = variant_name(pcell, params, grid)
+            k = 1
+            while name in taken:   # differ only outside the swept parameters
+                name = f"{base}_{k}"
+                k += 1
+            taken.add(name)
+            variants.append((name, params))
+
+    chunk = chunk or max(1, min(64, -(-len(variants) // (4 * workers))))
+    chunks = [variants[i:i + chunk] for i in range(0, len(variants), chunk)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmps = [os.path.join(tmpdir, f"chunk{i}.oas") for i in range(len(chunks))]
+        with report.phase("produce"):
+            args = ([lib] * len(chunks), [pcell] * len(chunks), chunks, tmps,
+                    [dbu] * len(chunks), [check] * len(chunks))
+            if workers == 1:   # in-process, e.g. inside klayout -b -r
+                results = list(map(produce_chunk, *args))
+            else:
+                # fork where available: the libraries registered here are inherited
+                ctx = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+                with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                         initializer=pcell_libraries.load_libraries) as pool:
+                    results = list(pool.map(produce_chunk, *args))
+
+        with report.phase("stitch", hot=True):
+            tly = pya.Layout()
+            tly.dbu = dbu
+            index = cell_dedup.FingerprintIndex(dbu, names=True)   # variants keep their names
+            roots, names = set(), {}
+            for tmp in tmps:
+                sly = pya.Layout()
+                sly.read(tmp)
+                for ci in list(sly.each_top_cell()):
+                    src_top = sly.cell(ci)
+                    # every variant keeps its own top cell; only subcells are shared
+                    root, _ = cell_dedup.merge_tree(tly, src_top, src_top.name, index, avoid=roots)
+                    roots.add(root.cell_index())
+                    names[src_top.name] = root.name
+
+    report.layout("out", tly)
+    with report.phase("write"):
+        written = layout_io.write_layout(tly, out, context_info=False)
+
+    counts = {}
+    for r in results:
+        counts.update(r)
+    doc = {"lib": lib, "pcell": pcell, "dbu": dbu, "grid": grid, "points": len(points),
+           "variants": len(variants), "collapsed": len(points) - len(variants),
+           "cells": {}}
+    for (name, params), (_, pts) in zip(variants, distinct):
+        entry = {"params": params}
+        if len(pts) > 1:
+            entry["points"] = pts   # grid points that coerce to these parameters
+        if check:
+            entry["violations"] = counts[name]
+        doc["cells"][names[name]] = entry
+    with open(out + SUFFIX, "w") as f:
+        json.dump(doc, f, indent=2, default=str)
+    doc["written"] = written
+    doc["phases"] = report.phases
+    return doc
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Parallel PCell parameter sweep into one library")
+    ap.add_argument("lib")
+    ap.add_argument("pcell")
+    ap.add_argument("out")
+    ap.add_argument("-g", "--param", action="append", default=[],
+                    help='NAME=V1,V2,... or NAME=START:STOP:STEP (repeatable)')
+    ap.add_argument("--grid", default=None, help='JSON file {"name": [values], ...}')
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--chunk", type=int, default=None, help="variants per worker task")
+    ap.add_argument("--check", action="store_true", help="run pcell_drc on every variant")
+    args = ap.parse_args(argv)
+
+    grid = {}
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+    grid.update(parse_grid(args.param))
+    if not grid:
+        ap.error("no parameters to sweep (-g or --grid)")
+
+    pcell_libraries.load_libraries()
+    report = run_report.RunReport("pcell_sweep")
+    doc = sweep(args.lib, args.pcell, grid, args.out, args.workers, args.chunk, args.check,
+                report=report)
+    print(f"{doc['points']} point(s), {doc['variants']} variant(s) "
+          f"({doc['collapsed']} collapsed by coerce_parameters)")
+    print("Wrote", layout_io.format_info(doc["written"]), "and", args.out + SUFFIX)
+    print(f"Phases: {report.summary()}")
+    if args.check:
+        bad = {n: e["violations"] for n, e in doc["cells"].items() if pcell_drc.violations(e["violations"])}
+        for name, per_rule in bad.items():
+            print(f"  {name}: " + ", ".join(f"{r}={n}" for r, n in per_rule.items() if n))
+        print(f"{len(bad)} variant(s) with violations")
+        return 1 if bad else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# run_report.py
+# Shared -rd argument parsing and phase-level instrumentation for the
+# -rd driven scripts.
+#
+#   rd("SRC", "in.gds")        value of -rd SRC=..., else $SRC, else default
+#   report = RunReport("ld1_to_ld2")
+#   with report.phase("read"):
+#       ly.read(SRC)
+#   report.layout("after_remap", ly)   per-layer shape, cell and instance counts
+#   report.write()             JSON to -rd REPORT=... / $REPORT (if given)
+#
+# Each phase records wall time, CPU time and the peak RSS of the process at
+# the end of the phase.  With PROFILE=1 the phases marked hot=True (the
+# shape loops) run under cProfile; the stats are dumped next to the report
+# as <name>.<phase>.prof (or <prof_base>.<phase>.prof, for jobs running side
+# by side) and the top entries are printed to stderr.
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def rd(k, d=None, argv=None):
+    """Value of -rd K=VALUE from argv, else environment variable K, else d."""
+    a = sys.argv if argv is None else argv
+    for i, x in enumerate(a[:-1]):
+        if x == "-rd" and a[i + 1].startswith(k + "="):
+            return a[i + 1].split("=", 1)[1]
+    return os.environ.get(k, d)
+
+
+def flag(k, d="0"):
+    """rd() as a boolean: anything but '' and '0' is true."""
+    return rd(k, d) not in ("", "0", None)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unknown)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def layout_counts(layout):
+    """Cell, instance and per-layer shape counts of a layout."""
+    per_layer = {}
+    insts = 0
+    layers = list(zip(layout.layer_indexes(), layout.layer_infos()))
+    for c in layout.each_cell():
+        insts += c.child_instances()
+        for li, info in layers:
+            n = c.shapes(li).size()
+            if n:
+                key = f"{info.layer}/{info.datatype}"
+                per_layer[key] = per_layer.get(key, 0) + n
+    return {"cells": layout.cells(), "instances": insts, "shapes": per_layer}
+
+
+class RunReport:
+    def __init__(self, name, path=None, profile=None, prof_base=None):
+        self.name = name
+        self.path = rd("REPORT") if path is None else path
+        self.profile = flag("PROFILE") if profile is None else profile
+        self.prof_base = prof_base
+        self.phases = []
+        self.layouts = {}
+        self.info = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name, hot=False):
+        """Time a phase; run it under cProfile if PROFILE=1 and hot."""
+        prof = cProfile.Profile() if (self.profile and hot) else None
+        w0, c0 = time.perf_counter(), time.process_time()
+        if prof:
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof:
+                prof.disable()
+            rec = {"phase": name,
+                   "wall_s": time.perf_counter() - w0,
+                   "cpu_s": time.process_time() - c0,
+                   "peak_rss_mb": peak_rss_mb()}
+            if prof:
+                rec["profile"] = self._dump_profile(prof, name)
+            self.phases.append(rec)
+
+    def _dump_profile(self, prof, phase):
+        base = self.prof_base or (os.path.splitext(self.path)[0] if self.path else self.name)
+        out = f"{base}.{phase}.prof"
+        prof.dump_stats(out)
+        print(f"--- cProfile {self.name}/{phase} (top 15 by cumulative time, full stats: {out})",
+              file=sys.stderr)
+        pstats.Stats(prof, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+        return out
+
+    def layout(self, label, layout):
+        """Record cell/instance/per-layer shape counts under label."""
+        self.layouts[label] = layout_counts(layout)
+
+    def as_dict(self):
+        return {"name": self.name, "argv": sys.argv,
+                "total_wall_s": time.perf_counter() - self._t0,
+                "peak_rss_mb": peak_rss_mb(),
+                "phases": self.phases, "layouts": self.layouts, "info": self.info}
+
+    def write(self, path=None):
+        """Write the JSON report to path / REPORT; returns the path or None."""
+        path = path or self.path
+        if not path:
+            return None
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2, default=str)
+        return path
+
+    def summary(self):
+        """One line: phase wall times."""
+        return ", ".join(f"{p['phase']} {p['wall_s']:.3f}s" for p in self.phases)
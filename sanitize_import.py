@@ -2,70 +2,73 @@
 # Usage (example):
 #   klayout -b -r sanitize_import.py \
 #     -rd SRC=swsources16.gds -rd TGT=target.gds -rd OUT=target_with_src.gds -rd TOPNAME=SW_SOURCES16
+#   add -rd COMPACT=1 to rebuild regular SREF runs in SRC as AREFs before merging
+#   add -rd DEDUP=1 to reuse target cells identical to SRC cells instead of copying
+#     them again (keeps OUT.fpindex.json so the next merge into OUT skips rehashing)
+#
+# Multi-source mode: SRCS is a comma-separated list of SRC or ROOT=SRC entries
+# (or a .txt file with one "SRC [ROOT]" per line).  The sources are read and
+# sanitized in WORKERS parallel processes, then merged into TGT, each under its
+# own root cell (ROOT, default the source's top cell name), with one write:
+#   python sanitize_import.py -rd SRCS=a.gds,B=b.gds,c.gds -rd TGT=t.gds -rd OUT=top.gds
+#   (run it with plain python for the worker pool; under klayout -b -r use WORKERS=1)
+#   add -rd REPORT=run.json for a JSON phase report, -rd PROFILE=1 for cProfile output
 
 import os, sys
-try:
-    from klayout import db as pya
-except Exception:
-    import pya  # if running inside KLayout’s Python
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import layout_io, layout_jobs
+from run_report import RunReport, flag, rd
 
-def parse_rd_args(argv):
-    out = {}
-    for i, a in enumerate(argv):
-        if a == "-rd" and i+1 < len(argv):
-            kv = argv[i+1]
-            if "=" in kv:
-                k, v = kv.split("=", 1)
-                out[k] = v
-    return out
-
-rd = parse_rd_args(sys.argv)
-SRC     = rd.get("SRC",     os.environ.get("SRC",     "swcascsrc_playground.gds"))
-TGT     = rd.get("TGT",     os.environ.get("TGT",     "target.gds"))
-OUT     = rd.get("OUT",     os.environ.get("OUT",     "target_merged.gds"))
-TOPNAME = rd.get("TOPNAME", os.environ.get("TOPNAME", "SWCASCSRC"))
-
-# --- load layouts ---
-sly = pya.Layout(); sly.read(SRC)
-tly = pya.Layout()
-if os.path.exists(TGT):
-    tly.read(TGT)
-else:
-    tly.dbu = sly.dbu
-ttop = tly.top_cell() or tly.create_cell("TOP")
+SRC     = rd("SRC",     "swcascsrc_playground.gds")
+TGT     = rd("TGT",     "target.gds")
+OUT     = rd("OUT",     "target_merged.gds")
+TOPNAME = rd("TOPNAME", "SWCASCSRC")
+COMPACT = flag("COMPACT")
+DEDUP   = flag("DEDUP")
+SRCS    = rd("SRCS", "")
+WORKERS = int(rd("WORKERS", "0")) or None
 
-# --- fix reserved context cell name if present ---
-for c in sly.each_cell():
-    if c.name == "$$$CONTEXT_INFO$$$":
-        c.name = "__CONTEXT_INFO__"
 
-# --- expand fragile 1-D AREFs (rows=1 xor cols=1) into SREFs ---
-def explode_1d_arefs(cell):
-    to_delete = []
-    for inst in cell.each_inst():
-        if inst.is_regular_array():
-            ca = inst
-            cols, rows = ca.na.x, ca.na.y
-            if (cols == 1) ^ (rows == 1):
-                for cx in range(cols):
-                    for ry in range(rows):
-                        t = pya.Trans(ca.trans) * pya.Trans(ca.a * cx + ca.b * ry)
-                        cell.insert(pya.CellInstArray(ca.cell_index(), t))
-                to_delete.append(ca)
-    for ca in to_delete:
-        cell.erase(ca)
-
-#for c in sly.each_cell():
-#    explode_1d_arefs(c)
+def parse_srcs(spec):
+    """[(src, root or None)] from 'a.gds,ROOT=b.gds' or a .txt list file."""
+    if spec.lower().endswith(".txt"):
+        with open(spec) as f:
+            rows = [l.split("#", 1)[0].split() for l in f]
+        return [(r[0], r[1] if len(r) > 1 else None) for r in rows if r]
+    out = []
+    for tok in filter(None, (t.strip() for t in spec.split(","))):
+        root, _, src = tok.rpartition("=")
+        out.append((src, root or None))
+    return out
 
-# --- create a destination cell and copy the full tree into it ---
-src_top = sly.top_cell()
-dst_root = tly.create_cell(TOPNAME or src_top.name)
-dst_root.copy_tree(src_top)  # <-- correct API: Cell.copy_tree(Cell) (cross-layout) :contentReference[oaicite:1]{index=1}
 
-# place one instance at origin (optional—comment out if you just want the copied cell)
-ttop.insert(pya.CellInstArray(dst_root.cell_index(), pya.Trans()))
+def main():
+    report = RunReport("sanitize_import")  # -rd REPORT=run.json, PROFILE=1 for cProfile
+    if SRCS:
+        # --- parallel read + sanitize per source, one merge, one write ---
+        srcs = parse_srcs(SRCS)
+        res = layout_jobs.sanitize_import_many([s for s, _ in srcs], OUT, tgt=TGT,
+                                               topnames=[r for _, r in srcs], compact=COMPACT,
+                                               dedup=DEDUP, workers=WORKERS, report=report)
+        for p in res["sources"]:
+            reuse = f" ({p['cells_added']} cells added, {p['cells_reused']} reused)" if DEDUP else ""
+            print(f"{p['src']} -> {p['root']}{reuse}")
+        print(f"Wrote {layout_io.format_info(res['written'])}")
+    else:
+        # --- load, rename reserved context cell, copy SRC tree under TOPNAME in TGT ---
+        # (1-D AREFs are left as they are; aref_compact.explode_arefs is available)
+        res = layout_jobs.sanitize_import(SRC, OUT, tgt=TGT, topname=TOPNAME, compact=COMPACT,
+                                          dedup=DEDUP, report=report)
+        if COMPACT:
+            print(f"Compacted {res['srefs_compacted']} SREFs into {res['arefs_created']} AREFs")
+        if DEDUP:
+            print(f"Reused {res['cells_reused']} existing cells, added {res['cells_added']}")
+        print(f"Wrote {layout_io.format_info(res['written'])}")
+    print(f"Phases: {report.summary()}")
+    if report.write():
+        print(f"Report: {report.path}")
 
-tly.write(OUT)
-print(f"Wrote {OUT}")
 
+# guarded: with a spawn start method the workers import this script again
+if __name__ == "__main__":
+    main()
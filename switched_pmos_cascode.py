@@ -1,8 +1,15 @@
 # -*- coding: utf-8 -*-
 import pya
 
+try:
+    from pcell_cache import cached_pcell
+except ImportError:  # cache module not on the macro path: produce every time
+    def cached_pcell(cls):
+        return cls
+
 # Switched PMOS cascode (minimal PCell example)
 
+@cached_pcell
 class SwitchedPMOSCascode(pya.PCellDeclarationHelper):
     def __init__(self):
         super().__init__()
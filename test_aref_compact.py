@@ -0,0 +1,37 @@
+# test_aref_compact.py
+# Run detection (_runs) and lattice covering of instance positions.
+#
+#   python -m pytest -q test_aref_compact.py
+
+import pytest
+
+pytest.importorskip("klayout.db")   # imported by aref_compact; the functions here are pure
+import aref_compact
+
+
+@pytest.mark.parametrize("values, min_count, runs, rest", [
+    ([], 2, [], []),
+    ([5], 2, [], [5]),
+    ([0, 10], 2, [(0, 10, 2)], []),
+    ([0, 10], 3, [], [0, 10]),
+    ([0, 10, 20, 30], 3, [(0, 10, 4)], []),
+    ([0, 10, 20, 25, 30], 3, [(0, 10, 3)], [25, 30]),
+    ([0, 10, 20, 25, 30], 2, [(0, 10, 3), (25, 5, 2)], []),
+    ([0, 1, 5, 9, 13], 3, [(1, 4, 4)], [0]),
+    ([-20, -10, 0, 7], 3, [(-20, 10, 3)], [7]),
+])
+def test_runs(values, min_count, runs, rest):
+    assert aref_compact._runs(values, min_count) == (runs, rest)
+
+
+def test_lattice_2d_with_leftovers():
+    grid = [(x, y) for x in (0, 10, 20) for y in (0, 50)]
+    arrays, singles = aref_compact.lattice_arrays(grid + [(100, 0), (7, 300)], min_count=3)
+    assert arrays == [(0, 0, (10, 0), (0, 50), 3, 2)]
+    assert sorted(singles) == [(7, 300), (100, 0)]
+
+
+def test_lattice_column():
+    arrays, singles = aref_compact.lattice_arrays([(0, 0), (0, 30), (0, 60), (5, 0)], min_count=3)
+    assert arrays == [(0, 0, (0, 30), (0, 0), 3, 1)]
+    assert singles == [(5, 0)]
@@ -0,0 +1,60 @@
+# test_batch_convert.py
+# run_batch() after worker crashes and hung jobs.
+#
+#   python -m pytest -q test_batch_convert.py
+
+import os
+import signal
+import time
+
+import pytest
+
+pytest.importorskip("klayout.db")
+import batch_convert
+import layout_jobs
+
+
+def _crash_on_bad(src, out):
+    time.sleep(0.2)   # keep the other jobs in flight when "bad" dies
+    if src == "bad":
+        os._exit(1)
+    return src
+
+
+def _hang_on_slow(src, out):
+    if src == "slow":
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)   # like a native call: no JobTimeout
+        time.sleep(60)
+    return src
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    # the pool forks after this, so the workers see the test jobs too
+    monkeypatch.setitem(layout_jobs.JOBS, "crash", _crash_on_bad)
+    monkeypatch.setitem(layout_jobs.JOBS, "hang", _hang_on_slow)
+
+
+def _items(*srcs):
+    return [(s, s + ".out", {}) for s in srcs]
+
+
+def test_only_the_crashing_job_is_charged(jobs):
+    recs = batch_convert.run_batch("crash", _items("a", "bad", "c", "d"), workers=4)
+    status = {r["src"]: (r["status"], r["attempts"]) for r in recs}
+    assert status == {"a": ("ok", 1), "bad": ("crashed", 1), "c": ("ok", 1), "d": ("ok", 1)}
+
+
+def test_crashing_job_is_retried_alone(jobs):
+    recs = batch_convert.run_batch("crash", _items("bad", "a"), workers=2, retries=1)
+    status = {r["src"]: (r["status"], r["attempts"]) for r in recs}
+    assert status == {"bad": ("crashed", 2), "a": ("ok", 1)}
+
+
+def test_hung_job_is_killed_at_the_deadline(jobs, monkeypatch):
+    monkeypatch.setattr(batch_convert, "GRACE_S", 0.5)
+    t0 = time.time()
+    recs = batch_convert.run_batch("hang", _items("slow", "a", "b"), workers=2, timeout=0.5)
+    assert time.time() - t0 < 20
+    status = {r["src"]: r["status"] for r in recs}
+    assert status == {"slow": "timeout", "a": "ok", "b": "ok"}
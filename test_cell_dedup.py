@@ -0,0 +1,81 @@
+# test_cell_dedup.py
+# merge_tree(): shared cells, black boxes, names, dbu and properties.
+#
+#   python -m pytest -q test_cell_dedup.py
+
+import pytest
+
+pya = pytest.importorskip("klayout.db")
+import cell_dedup
+
+
+def _source(dbu=0.001):
+    ly = pya.Layout()
+    ly.dbu = dbu
+    return ly, ly.create_cell("TOP")
+
+
+def _target(dbu=0.001):
+    tly = pya.Layout()
+    tly.dbu = dbu
+    return tly, cell_dedup.FingerprintIndex(dbu)
+
+
+def _place(parent, child, x=0):
+    parent.insert(pya.CellInstArray(child.cell_index(), pya.Trans(x, 0)))
+
+
+def test_identical_cells_are_shared():
+    sly, top = _source()
+    li = sly.layer(1, 0)
+    for name, x in (("A", 0), ("B", 1000)):
+        c = sly.create_cell(name)
+        c.shapes(li).insert(pya.Box(0, 0, 100, 100))
+        _place(top, c, x)
+    tly, index = _target()
+    root, stats = cell_dedup.merge_tree(tly, top, "ROOT", index)
+    assert stats == {"reused": 1, "added": 2}
+    names = sorted(c.name for c in tly.each_cell())
+    assert len(names) == 2 and names[-1] == "ROOT"   # one of A, B for both
+
+
+def test_names_mode_keeps_distinct_cells():
+    sly, top = _source()
+    li = sly.layer(1, 0)
+    for name, x in (("A", 0), ("B", 1000)):
+        c = sly.create_cell(name)
+        c.shapes(li).insert(pya.Box(0, 0, 100, 100))
+        _place(top, c, x)
+    tly = pya.Layout()
+    index = cell_dedup.FingerprintIndex(tly.dbu, names=True)
+    _, first = cell_dedup.merge_tree(tly, top, "ROOT", index)
+    _, again = cell_dedup.merge_tree(tly, top, "ROOT", index)   # same tree again: all shared
+    assert first == {"reused": 0, "added": 3} and again == {"reused": 3, "added": 0}
+    assert sorted(c.name for c in tly.each_cell()) == ["A", "B", "ROOT"]
+
+
+def test_black_boxes_are_never_merged():
+    sly, top = _source()
+    for name, x in (("BB1", 0), ("BB2", 5000)):
+        parent = sly.create_cell("P_" + name)
+        _place(parent, sly.create_cell(name))   # empty cell
+        _place(top, parent, x)
+    tly, index = _target()
+    cell_dedup.merge_tree(tly, top, "ROOT", index)
+    assert sorted(c.name for c in tly.each_cell()) == ["BB1", "BB2", "P_BB1", "P_BB2", "ROOT"]
+
+
+def test_dbu_scaling_and_instance_properties():
+    sly, top = _source(dbu=0.001)
+    child = sly.create_cell("C")
+    child.shapes(sly.layer(1, 0)).insert(pya.Box(0, 0, 100, 100))
+    pid = sly.properties_id([("net", "VDD")])
+    top.insert(pya.CellInstArray(child.cell_index(), pya.Trans(), pya.Vector(1000, 0), pya.Vector(0, 1000), 3, 2),
+               pid)
+    tly, index = _target(dbu=0.0005)
+    root, _ = cell_dedup.merge_tree(tly, top, "ROOT", index)
+    inst = next(root.each_inst())
+    ca = inst.cell_inst
+    assert (ca.a, ca.b, ca.na, ca.nb) == (pya.Vector(2000, 0), pya.Vector(0, 2000), 3, 2)
+    assert dict(tly.properties(inst.prop_id)) == {"net": "VDD"}
+    assert tly.cell("C").bbox() == pya.Box(0, 0, 200, 200)
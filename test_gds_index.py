@@ -0,0 +1,61 @@
+# test_gds_index.py
+# Structure index of a GDS file: closure, extract and the sidecar.
+# Needs no klayout: the extracted files are checked record by record.
+#
+#   python -m pytest -q test_gds_index.py
+
+import os
+import shutil
+
+import pytest
+
+import gds_index
+import gds_stream
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def src(tmp_path):
+    """A copy of pcsource66x2.gds (the sidecar is written next to it)."""
+    path = str(tmp_path / "pcsource66x2.gds")
+    shutil.copy(os.path.join(HERE, "pcsource66x2.gds"), path)
+    return path
+
+
+def test_closure(src):
+    idx = gds_index.CellIndex.build(src)
+    assert idx.top_cells() == ["PCSOURCE66x2"]
+    assert idx.closure("PCSOURCE2") == ["switched_pmos_cascode$1", "PCSOURCE2"]
+    assert idx.closure("PCSOURCE66x2") == ["switched_pmos_cascode$1", "switched_pmos_cascode",
+                                           "PCSOURCE2", "PCSOURCE1", "PCSOURCE66x2"]
+    with pytest.raises(KeyError):
+        idx.closure("NOPE")
+
+
+def test_extract_closure(src, tmp_path):
+    out = str(tmp_path / "pcsource2.gds")
+    res = gds_index.extract(src, "PCSOURCE2", out)
+    names = gds_stream.StructureNames.scan(out)
+    assert names.defined == ["switched_pmos_cascode$1", "PCSOURCE2"]
+    assert names.tops() == ["PCSOURCE2"]
+    assert res == {"cells": 2, "bytes": os.path.getsize(out)}
+    # header, the closure's byte spans and ENDLIB, copied unchanged
+    idx = gds_index.CellIndex.build(src)
+    data = open(src, "rb").read()
+    spans = [data[idx.header[0]:idx.header[0] + idx.header[1]]]
+    spans += [data[e["offset"]:e["offset"] + e["length"]]
+              for e in (idx.cells[n] for n in idx.closure("PCSOURCE2"))]
+    spans.append(data[idx.endlib:idx.endlib + 4])
+    assert open(out, "rb").read() == b"".join(spans)
+
+
+def test_sidecar(src):
+    idx = gds_index.CellIndex.for_file(src)
+    assert os.path.exists(src + gds_index.SUFFIX)
+    loaded = gds_index.CellIndex.load(src)
+    assert loaded.closure("PCSOURCE1") == idx.closure("PCSOURCE1")
+    assert loaded.cells["PCSOURCE1"]["bbox"] == list(idx.cells["PCSOURCE1"]["bbox"])
+    st = os.stat(src)
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert gds_index.CellIndex.load(src) is None   # stale
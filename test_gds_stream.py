@@ -0,0 +1,104 @@
+# test_gds_stream.py
+# Record-level rewrites: identity, round trips, filters and structure names.
+# Needs no klayout: the streams are built record by record here.
+#
+#   python -m pytest -q test_gds_stream.py
+
+import struct
+
+import gds_stream as gs
+
+
+def _rec(rtype, dtype, data=b""):
+    return struct.pack(">HBB", len(data) + 4, rtype, dtype) + data
+
+
+def _real8(x):
+    """GDSII 8-byte excess-64 real."""
+    e = 64
+    while x < 1 / 16:
+        x, e = x * 16, e - 1
+    while x >= 1:
+        x, e = x / 16, e + 1
+    return struct.pack(">Q", (e << 56) | int(round(x * 2 ** 56)))
+
+
+def _xy(*pts):
+    return _rec(gs.XY, 0x03, struct.pack(f">{2 * len(pts)}i", *(v for p in pts for v in p)))
+
+
+def _boundary(l, d, x=0):
+    return (_rec(gs.BOUNDARY, 0x00) + gs.i2_record(gs.LAYER, l) + gs.i2_record(gs.DATATYPE, d)
+            + _xy((x, 0), (x + 10, 0), (x + 10, 10), (x, 10), (x, 0)) + _rec(gs.ENDEL, 0x00))
+
+
+def _text(l, t, s):
+    return (_rec(gs.TEXT, 0x00) + gs.i2_record(gs.LAYER, l) + gs.i2_record(gs.TEXTTYPE, t)
+            + _xy((5, 5)) + gs.string_record(gs.STRING, s) + _rec(gs.ENDEL, 0x00))
+
+
+def _sref(name):
+    return _rec(gs.SREF, 0x00) + gs.string_record(gs.SNAME, name) + _xy((0, 0)) + _rec(gs.ENDEL, 0x00)
+
+
+def gds(structures):
+    """GDSII bytes of [(name, [element bytes, ...]), ...] in that order."""
+    out = [gs.i2_record(gs.HEADER, 600), _rec(gs.BGNLIB, 0x02, bytes(24)),
+           gs.string_record(gs.LIBNAME, "LIB"), _rec(gs.UNITS, 0x05, _real8(1e-3) + _real8(1e-9))]
+    for name, elements in structures:
+        out += [_rec(gs.BGNSTR, 0x02, bytes(24)), gs.string_record(gs.STRNAME, name)]
+        out += elements
+        out.append(_rec(gs.ENDSTR, 0x00))
+    out.append(_rec(gs.ENDLIB, 0x00))
+    return b"".join(out)
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+SAMPLE = [("LEAF", [_boundary(1, 0), _boundary(1, 1, 20), _text(8, 25, "VDD")]),
+          ("$$$CONTEXT_INFO$$$", [_boundary(63, 0)]),
+          ("TOP", [_sref("LEAF"), _boundary(1, 0, 40)])]
+
+
+def test_identity_is_byte_exact(tmp_path):
+    src = _write(tmp_path, "a.gds", gds(SAMPLE))
+    out = str(tmp_path / "b.gds")
+    res = gs.rewrite(src, out, [gs.Transform()])
+    assert res["changed"] == res["dropped"] == 0
+    assert open(out, "rb").read() == open(src, "rb").read()
+
+
+def test_round_trip(tmp_path):
+    src = _write(tmp_path, "a.gds", gds(SAMPLE))
+    mid, back = str(tmp_path / "b.gds"), str(tmp_path / "c.gds")
+    fwd = [gs.LayerMap({(1, 0): (2, 0)}), gs.TextLayerMap({(8, 25): (8, 2)}),
+           gs.CellRename({"LEAF": "CELL_A_LONGER_NAME"})]
+    res = gs.rewrite(src, mid, fwd)
+    assert fwd[0].moved == {(1, 0): 2} and fwd[1].moved == {(8, 25): 1}
+    assert res["changed"] == 5   # 2 boundaries, 1 text, STRNAME and SNAME
+    assert gs.StructureNames.scan(mid).defined == ["CELL_A_LONGER_NAME", "$$$CONTEXT_INFO$$$", "TOP"]
+    gs.rewrite(mid, back, [gs.LayerMap({(2, 0): (1, 0)}), gs.TextLayerMap({(8, 2): (8, 25)}),
+                           gs.CellRename({"CELL_A_LONGER_NAME": "LEAF"})])
+    assert open(back, "rb").read() == open(src, "rb").read()
+
+
+def test_filters(tmp_path):
+    src = _write(tmp_path, "a.gds", gds(SAMPLE))
+    out = str(tmp_path / "b.gds")
+    res = gs.rewrite(src, out, [gs.TextsOnly(), gs.DropStructures(["$$$CONTEXT_INFO$$$"])])
+    assert res["dropped"] == 4   # 3 boundaries and one structure
+    assert open(out, "rb").read() == gds([("LEAF", [_text(8, 25, "VDD")]), ("TOP", [_sref("LEAF")])])
+
+
+def test_structure_names_after_rename(tmp_path):
+    src = _write(tmp_path, "a.gds", gds(SAMPLE))
+    names = gs.StructureNames()
+    gs.rewrite(src, str(tmp_path / "b.gds"),
+               [gs.DropStructures(["$$$CONTEXT_INFO$$$"]), gs.CellRename({"TOP": "CHIP"}), names])
+    assert names.defined == ["LEAF", "CHIP"]
+    assert names.tops() == ["CHIP"]
+    assert gs.StructureNames.scan(src).tops() == ["$$$CONTEXT_INFO$$$", "TOP"]
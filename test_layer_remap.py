@@ -0,0 +1,60 @@
+# test_layer_remap.py
+# remap_layers(): many-to-many maps, chains, swaps and counts.
+#
+#   python -m pytest -q test_layer_remap.py
+
+import pytest
+
+pya = pytest.importorskip("klayout.db")
+import layer_remap
+
+
+def _layout(shapes):
+    """TOP with a CHILD; shapes is {(L, D): n} boxes in each of the two cells."""
+    ly = pya.Layout()
+    top, child = ly.create_cell("TOP"), ly.create_cell("CHILD")
+    top.insert(pya.CellInstArray(child.cell_index(), pya.Trans()))
+    for ld, n in shapes.items():
+        li = ly.layer(*ld)
+        for c in (top, child):
+            for i in range(n):
+                c.shapes(li).insert(pya.Box(i * 10, 0, i * 10 + 5, 5))
+    return ly
+
+
+def _counts(ly):
+    """{(L, D): shapes in all cells} of the non-empty layers."""
+    out = {}
+    for li, info in zip(ly.layer_indexes(), ly.layer_infos()):
+        n = sum(c.shapes(li).size() for c in ly.each_cell())
+        if n:
+            out[(info.layer, info.datatype)] = n
+    return out
+
+
+def test_move_and_fan_out():
+    ly = _layout({(5, 1): 2, (8, 1): 1, (9, 0): 1})
+    moved = layer_remap.remap_layers(ly, {(5, 1): (5, 2), (8, 1): [(8, 2), (8, 3)]})
+    assert moved == {(5, 1): 4, (8, 1): 2}
+    assert _counts(ly) == {(5, 2): 4, (8, 2): 2, (8, 3): 2, (9, 0): 2}
+
+
+def test_chain_and_swap():
+    ly = _layout({(1, 0): 1, (2, 0): 2, (3, 0): 3})
+    moved = layer_remap.remap_layers(ly, {(1, 0): (2, 0), (2, 0): (1, 0), (3, 0): (1, 0)})
+    assert moved == {(1, 0): 2, (2, 0): 4, (3, 0): 6}
+    assert _counts(ly) == {(1, 0): 10, (2, 0): 2}
+
+
+def test_source_kept_when_also_a_target():
+    ly = _layout({(5, 1): 1})
+    layer_remap.remap_layers(ly, {(5, 1): [(5, 1), (5, 2)]})
+    assert _counts(ly) == {(5, 1): 2, (5, 2): 2}
+
+
+def test_without_counts():
+    ly = _layout({(5, 1): 1})
+    moved = layer_remap.remap_layers(ly, {(5, 1): (5, 2), (7, 7): (7, 8)}, count=False)
+    assert moved == {(5, 1): None}
+    assert layer_remap.format_counts(moved) == "5/1"
+    assert _counts(ly) == {(5, 2): 2}
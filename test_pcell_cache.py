@@ -0,0 +1,65 @@
+# test_pcell_cache.py
+# Cache hits reuse shared sub-cells by name; the key follows helper modules.
+#
+#   python -m pytest -q test_pcell_cache.py
+
+import pytest
+
+pya = pytest.importorskip("klayout.db")
+import contact_array
+import pcell_cache
+
+
+@pcell_cache.cached_pcell
+class Cuts(pya.PCellDeclarationHelper):
+    def __init__(self):
+        super().__init__()
+        self.param("n", self.TypeInt, "Cuts", default=3)
+        self.param("ly_co", self.TypeLayer, "CO", default=pya.LayerInfo(6, 0))
+
+    def produce_impl(self):
+        co = self.layout.layer(self.ly_co)
+        contact_array.place_contacts(self.cell, co, 0, 0, self.n, 1, 160, 340)
+
+
+class CutsLib(pya.Library):
+    def __init__(self):
+        super().__init__()
+        self.layout().register_pcell("Cuts", Cuts())
+        self.register("PcellCacheTestLib")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(pcell_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pcell_cache, "ENABLED", True)
+    for k in pcell_cache.stats:
+        monkeypatch.setitem(pcell_cache.stats, k, 0)
+    return pcell_cache.stats
+
+
+def _produce(n):
+    """Produce variant n in a fresh library; returns the library layout."""
+    lib = CutsLib()
+    ly = pya.Layout()
+    ly.create_cell("Cuts", "PcellCacheTestLib", {"n": n})
+    return lib.layout()
+
+
+def test_hit_reuses_shared_child(cache):
+    _produce(3)
+    assert cache["misses"] == 1 and cache["stores"] == 1
+
+    lib = CutsLib()
+    ly = pya.Layout()
+    ly.create_cell("Cuts", "PcellCacheTestLib", {"n": 2})   # miss: creates CO_160x160_6_0
+    ly.create_cell("Cuts", "PcellCacheTestLib", {"n": 3})   # hit: places that CO cell again
+    assert cache["hits"] == 1
+    lly = lib.layout()
+    assert [c.name for c in lly.each_cell() if c.name.startswith("CO_")] == ["CO_160x160_6_0"]
+    assert lly.cell("CO_160x160_6_0").parent_cells() == 2
+
+
+def test_key_includes_sibling_modules():
+    mods = pcell_cache._sibling_modules(Cuts.produce_impl.__wrapped__.__globals__, [])
+    assert contact_array in mods
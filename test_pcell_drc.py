@@ -0,0 +1,50 @@
+# test_pcell_drc.py
+# feol_contact rules: the M1 end cap and CO inside M1 are checked.
+#
+#   python -m pytest -q test_pcell_drc.py
+
+import pytest
+
+pya = pytest.importorskip("klayout.db")
+import pcell_drc
+import pcell_libraries
+
+
+@pytest.fixture(scope="module")
+def contact():
+    """(layout, cell with a copy of a 900 x 160 nm feol_contact, its rules); cuts at x 200-360, 540-700."""
+    pcell_libraries.load_libraries()
+    ly = pya.Layout()
+    ly.dbu = 0.001
+    pc = ly.create_cell("FEOL contacts", "BasicsLib", {"l": 900})
+    rules = pcell_drc.rules_for("FEOL contacts", pc.pcell_parameters_by_name())
+    cell = ly.create_cell("T")
+    cell.copy_tree(pc)
+    return ly, cell, rules
+
+
+def _check(contact, m1_box):
+    _, cell, rules = contact
+    m1 = cell.shapes(cell.layout().layer(8, 0))
+    m1.clear()
+    m1.insert(pya.Box(*m1_box))
+    return pcell_drc.check_cell(cell, rules, threads=1)
+
+
+def test_rules_kept():
+    names = [r.name for r in pcell_drc.rules_for("FEOL contacts", {"ly_co": pya.LayerInfo(6, 0),
+                                                                   "ly_m1": pya.LayerInfo(8, 0)})]
+    assert "M1.CO" in names and "M1.EC.CO" in names
+
+
+def test_produced_contact_is_clean(contact):
+    assert pcell_drc.violations(_check(contact, (0, 0, 900, 160))) == 0
+
+
+def test_short_endcap(contact):
+    counts = _check(contact, (170, 0, 900, 160))
+    assert counts["M1.EC.CO"] == 1 and counts["M1.CO"] == 0
+
+
+def test_cut_outside_m1(contact):
+    assert _check(contact, (0, 0, 300, 160))["M1.CO"] == 2
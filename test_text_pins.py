@@ -0,0 +1,71 @@
+# test_text_pins.py
+# promote_texts() with chained and swapped layer maps; emit_pins().
+#
+#   python -m pytest -q test_text_pins.py
+
+import pytest
+
+pya = pytest.importorskip("klayout.db")
+import text_pins
+
+
+def _layout(labels):
+    """Layout with one cell holding one TEXT per (name, (L, D)) in labels."""
+    ly = pya.Layout()
+    top = ly.create_cell("TOP")
+    for i, (name, ld) in enumerate(labels):
+        top.shapes(ly.layer(*ld)).insert(pya.Text(name, i * 100, 0))
+    return ly, top
+
+
+def _texts(ly, cell):
+    """{(L, D): sorted text strings} of cell."""
+    out = {}
+    for li, info in zip(ly.layer_indexes(), ly.layer_infos()):
+        names = sorted(s.text.string for s in cell.shapes(li).each(pya.Shapes.STexts))
+        if names:
+            out[(info.layer, info.datatype)] = names
+    return out
+
+
+def test_chained_map():
+    ly, top = _layout([("a", (1, 0)), ("b", (2, 0))])
+    moved, present = text_pins.promote_texts(ly, {(1, 0): (2, 0), (2, 0): (3, 0)})
+    assert moved == 2
+    assert present == {(1, 0), (2, 0)}
+    assert _texts(ly, top) == {(2, 0): ["a"], (3, 0): ["b"]}
+
+
+def test_swap():
+    ly, top = _layout([("a", (1, 0)), ("b", (2, 0)), ("c", (2, 0))])
+    moved, _ = text_pins.promote_texts(ly, {(1, 0): (2, 0), (2, 0): (1, 0)})
+    assert moved == 3
+    assert _texts(ly, top) == {(1, 0): ["b", "c"], (2, 0): ["a"]}
+
+
+def test_plain_move_keeps_other_layers():
+    ly, top = _layout([("a", (1, 0)), ("z", (9, 0))])
+    moved, present = text_pins.promote_texts(ly, {(1, 0): (5, 0)})
+    assert moved == 1
+    assert present == {(1, 0), (9, 0)}
+    assert _texts(ly, top) == {(5, 0): ["a"], (9, 0): ["z"]}
+
+
+def test_present_only_on_request():
+    ly, top = _layout([("a", (1, 0)), ("z", (9, 0))])
+    moved, present = text_pins.promote_texts(ly, {(1, 0): (5, 0)}, present=False)
+    assert moved == 1
+    assert present == {(1, 0)}
+    assert text_pins.text_layers(ly) == {(5, 0), (9, 0)}
+
+
+def test_emit_pins_indexes_each_metal_once(monkeypatch):
+    ly, top = _layout([("a", (1, 0)), ("b", (2, 0))])
+    top.shapes(ly.layer(10, 0)).insert(pya.Box(-50, -50, 150, 50))
+    calls = []
+    index = text_pins.metal_index
+    monkeypatch.setattr(text_pins, "metal_index", lambda *a: calls.append(a[1]) or index(*a))
+    res = text_pins.emit_pins(ly, {(1, 0): ((10, 0), (11, 0)), (2, 0): ((10, 0), (11, 0))})
+    assert len(calls) == 1
+    assert (res["labels"], res["pins"], res["unresolved"]) == (2, 1, [])
+    assert top.shapes(ly.layer(11, 0)).size() == 1
@@ -0,0 +1,63 @@
+# test_tiled_ops.py
+# Seam-free tiled merges and geometry-preserving tiled remaps.
+#
+#   python -m pytest -q test_tiled_ops.py
+
+import pytest
+
+pya = pytest.importorskip("klayout.db")
+import tiled_ops
+
+
+def _layout():
+    ly = pya.Layout()
+    ly.dbu = 0.001
+    return ly, ly.create_cell("TOP")
+
+
+def test_merge_across_tile_edges_is_one_polygon():
+    ly, top = _layout()
+    li = ly.layer(1, 0)
+    # 25 um long bar, overlapping boxes, crossing several 10 um tile edges
+    top.shapes(li).insert(pya.Box(0, 0, 15000, 1000))
+    top.shapes(li).insert(pya.Box(12000, 0, 25000, 1000))
+    n = tiled_ops.tiled_merge(ly, top, (1, 0), tile_um=10, threads=2)
+    assert n == 1
+    polys = [s.polygon for s in top.shapes(li).each()]
+    assert len(polys) == 1
+    assert polys[0].bbox() == pya.Box(0, 0, 25000, 1000)
+    assert polys[0].area() == 25000 * 1000
+
+
+def test_boolean_keeps_inner_polygons_apart():
+    ly, top = _layout()
+    a, b = ly.layer(1, 0), ly.layer(2, 0)
+    top.shapes(a).insert(pya.Box(0, 0, 30000, 1000))
+    top.shapes(b).insert(pya.Box(1000, 0, 2000, 1000))   # inside one tile
+    top.shapes(b).insert(pya.Box(8000, 0, 22000, 1000))  # across two tile edges
+    n = tiled_ops.tiled_boolean(ly, top, (1, 0), (2, 0), "and", (3, 0), tile_um=10, threads=2)
+    assert n == 2
+    boxes = sorted(s.polygon.bbox().to_s() for s in top.shapes(ly.layer(3, 0)).each())
+    assert boxes == sorted([pya.Box(1000, 0, 2000, 1000).to_s(), pya.Box(8000, 0, 22000, 1000).to_s()])
+
+
+def test_remap_keeps_hierarchy_and_shapes():
+    ly, top = _layout()
+    child = ly.create_cell("CHILD")
+    src = ly.layer(5, 1)
+    child.shapes(src).insert(pya.Box(0, 0, 100, 100))
+    child.shapes(src).insert(pya.Path([pya.Point(0, 0), pya.Point(500, 0)], 20))
+    top.insert(pya.CellInstArray(child.cell_index(), pya.Trans()))
+    top.shapes(src).insert(pya.Box(0, 0, 20000, 100))
+    top.shapes(src).insert(pya.Box(15000, 0, 30000, 100))
+    moved = tiled_ops.tiled_remap(ly, top, {(5, 1): (5, 2)}, merge=True, tile_um=10, threads=2)
+    assert moved == {(5, 1): 4}
+    dst = ly.layer(5, 2)
+    assert child.shapes(src).is_empty() and top.shapes(src).is_empty()
+    # the child is untouched: same box and path, not merged into the top
+    kinds = sorted("box" if s.is_box() else "path" if s.is_path() else "other" for s in child.shapes(dst).each())
+    assert kinds == ["box", "path"]
+    assert top.child_instances() == 1
+    # the top's own shapes are merged into one, across the tile edges
+    own = list(top.shapes(dst).each())
+    assert len(own) == 1 and own[0].polygon.bbox() == pya.Box(0, 0, 30000, 100)
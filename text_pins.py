@@ -0,0 +1,218 @@
+# text_pins.py
+# Single-pass, text-only label -> pin layer promotion.
+#
+# The old promote_text_to_pin.py walked every shape of every cell twice
+# (once to collect the TEXT layers, once to move), filtered on is_text(),
+# looked up the target layer per text and re-created every pya.Text.
+# Here:
+#   * target layer indexes are resolved once, before any cell is visited;
+#   * shapes are only ever iterated with the STexts flag, so polygons, boxes
+#     and paths are never visited from Python;
+#   * per cell and source layer, all texts are moved in one batch with
+#     Shapes.insert(Shapes, STexts) and Shapes.clear(STexts), which keeps
+#     every text attribute (font, alignment, size) as it was;
+#   * the "text layers present" report is gathered in the same pass.
+#
+# Pin shapes: emit_pins() resolves each label to the metal shape under it
+# and puts a copy of that shape on the pin layer.  Per cell holding labels,
+# the metal of that cell and everything below it is merged and put into a
+# uniform grid (GridIndex), so each label is a constant-time bucket lookup
+# plus a few point-in-polygon tests instead of a scan over all metal shapes
+# (long rails are kept aside rather than entered in every bucket).
+#
+# Usage:
+#   import text_pins
+#   moved, present = text_pins.promote_texts(ly, mapping={(5, 0): (67, 44)})
+#   moved, present = text_pins.promote_texts(ly, all_to=(67, 44))
+#   res = text_pins.emit_pins(ly, text_pins.parse_pin_map("10/25:10/0:10/2"))
+
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+
+def text_layer_plan(layout, mapping=None, all_to=None):
+    """
+    Map source layer index -> destination layer index for every existing
+    layer whose TEXTs are to be moved.  Layers mapped onto themselves are
+    left out.
+    """
+    mapping = mapping or {}
+    wanted = []
+    for li, info in zip(layout.layer_indexes(), layout.layer_infos()):
+        pair = (info.layer, info.datatype)
+        dst = all_to if all_to else mapping.get(pair)
+        if dst is not None and tuple(dst) != pair:
+            wanted.append((li, dst))
+    # resolve (and create) targets after the scan, so new layers do not
+    # show up as sources
+    return {li: layout.layer(pya.LayerInfo(dst[0], dst[1])) for li, dst in wanted}
+
+
+def text_layers(layout, layer_indexes=None):
+    """
+    (L, D) pairs of the layers (default: all) holding TEXT in some cell.  A
+    layer is not looked at again once a TEXT was found on it.
+    """
+    infos = dict(zip(layout.layer_indexes(), layout.layer_infos()))
+    todo = set(infos if layer_indexes is None else layer_indexes)
+    texts = pya.Shapes.STexts
+    found = set()
+    for c in layout.each_cell():
+        if not todo:
+            break
+        for li in list(todo):
+            shs = c.shapes(li)
+            if not shs.is_empty() and next(iter(shs.each(texts)), None) is not None:
+                todo.discard(li)
+                found.add((infos[li].layer, infos[li].datatype))
+    return found
+
+
+def promote_texts(layout, mapping=None, all_to=None, present=True):
+    """
+    Move TEXT shapes according to mapping {(L,D): (L,D)} or, if all_to is
+    given, every TEXT to all_to.  Returns (moved count, set of (L,D) pairs
+    that carried TEXT before the move).  Only the source layers are visited
+    for the move; with present=False the other layers are not looked at at
+    all and the set only holds the sources TEXT was moved from.
+    """
+    plan = text_layer_plan(layout, mapping, all_to)
+    infos = dict(zip(layout.layer_indexes(), layout.layer_infos()))
+    found = text_layers(layout, [li for li in infos if li not in plan]) if present else set()
+    texts = pya.Shapes.STexts
+    # A source that is also a target (chains, swaps): stage the moved texts
+    # on scratch layers per cell, so nothing is moved twice
+    stage = {}
+    if set(plan.values()) & set(plan):
+        stage = {li: layout.insert_layer(pya.LayerInfo()) for li in plan}
+
+    moved = 0
+    if plan:
+        for c in layout.each_cell():
+            for li, dst_li in plan.items():
+                shs = c.shapes(li)
+                if shs.is_empty():
+                    continue
+                before = shs.size()
+                c.shapes(stage.get(li, dst_li)).insert(shs, texts)
+                shs.clear(texts)
+                n = before - shs.size()
+                if n:
+                    found.add((infos[li].layer, infos[li].datatype))
+                    moved += n
+            for li, tmp in stage.items():
+                staged = c.shapes(tmp)
+                if not staged.is_empty():
+                    c.shapes(plan[li]).insert(staged)
+                    staged.clear()
+    for tmp in stage.values():
+        layout.delete_layer(tmp)
+    return moved, found
+
+
+# ---- label -> metal shape -> pin shape ----
+def parse_pin_map(spec):
+    """'LBL:METAL:PIN,...' (each L/D) -> {label (L,D): (metal (L,D), pin (L,D))}."""
+    out = {}
+    for item in filter(None, (t.strip() for t in spec.split(","))):
+        lbl, metal, pin = (tuple(int(v) for v in p.split("/")) for p in item.split(":"))
+        out[lbl] = (metal, pin)
+    return out
+
+
+class GridIndex:
+    """
+    Uniform grid over polygons: each polygon is listed in every grid cell
+    its bounding box touches; at(point) tests only the polygons of the
+    point's grid cell.  Polygons touching more than max_span grid cells
+    (long rails, big planes) are kept in one list, tested by bbox first,
+    instead of being entered in all of them.
+    """
+    def __init__(self, pitch, max_span=64):
+        self.pitch = max(1, int(pitch))
+        self.max_span = max_span
+        self.buckets = {}
+        self.large = []
+        self.polygons = []
+
+    def insert(self, polygon):
+        idx = len(self.polygons)
+        self.polygons.append(polygon)
+        b, g = polygon.bbox(), self.pitch
+        xs = range(b.left // g, b.right // g + 1)
+        ys = range(b.bottom // g, b.top // g + 1)
+        if len(xs) * len(ys) > self.max_span:
+            self.large.append(idx)
+            return
+        for ix in xs:
+            for iy in ys:
+                self.buckets.setdefault((ix, iy), []).append(idx)
+
+    def at(self, point):
+        """Index of the first polygon containing point (edges included), or None."""
+        for idx in self.buckets.get((point.x // self.pitch, point.y // self.pitch), ()):
+            if self.polygons[idx].inside(point):
+                return idx
+        for idx in self.large:
+            poly = self.polygons[idx]
+            if poly.bbox().contains(point) and poly.inside(point):
+                return idx
+        return None
+
+
+def metal_index(cell, li, pitch=None):
+    """GridIndex of the merged shapes on li in cell and below (in cell coordinates)."""
+    region = pya.Region(cell.begin_shapes_rec(li))
+    region.merge()   # one pin per connected metal shape, not per drawn piece
+    if pitch is None:
+        # about one polygon per grid cell on average
+        b, n = region.bbox(), max(1, region.count())
+        pitch = max(b.width(), b.height(), 1) / max(1, int(n ** 0.5))
+    grid = GridIndex(pitch)
+    for poly in region.each():
+        grid.insert(poly)
+    return grid
+
+
+def emit_pins(layout, pin_map, pitch=None):
+    """
+    For every TEXT on a label layer of pin_map {label: (metal, pin)}, find
+    the metal shape under its origin and insert that shape on the pin layer
+    of the label's cell (once per shape).  Returns {"pins": n, "labels": n,
+    "unresolved": [(cell, text, x, y), ...]}.
+    """
+    plan = []
+    for lbl, (metal, pin) in pin_map.items():
+        l_li = layout.find_layer(pya.LayerInfo(*lbl))
+        m_li = layout.find_layer(pya.LayerInfo(*metal))
+        if l_li is None or l_li < 0:
+            continue
+        plan.append((l_li, m_li, layout.layer(pya.LayerInfo(*pin))))
+
+    res = {"pins": 0, "labels": 0, "unresolved": []}
+    texts = pya.Shapes.STexts
+    for c in layout.each_cell():
+        # label layers sharing a metal layer share its index: the metal is
+        # flattened and merged at most once per (cell, metal layer)
+        grids = {}
+        done = set()
+        for l_li, m_li, p_li in plan:
+            shs = c.shapes(l_li)
+            if shs.is_empty():
+                continue
+            for s in shs.each(texts):
+                t = s.text
+                res["labels"] += 1
+                grid = grids.get(m_li)
+                if grid is None:
+                    grid = grids[m_li] = metal_index(c, m_li, pitch) if m_li is not None and m_li >= 0 else GridIndex(1)
+                idx = grid.at(t.trans.disp.to_p())
+                if idx is None:
+                    res["unresolved"].append((c.name, t.string, t.trans.disp.x, t.trans.disp.y))
+                elif (m_li, p_li, idx) not in done:
+                    done.add((m_li, p_li, idx))
+                    c.shapes(p_li).insert(grid.polygons[idx])
+                    res["pins"] += 1
+    return res
@@ -0,0 +1,218 @@
+# tiled_ops.py
+# Multi-threaded tiled layer operations for flat-heavy layouts.
+#
+# Big flat top cells (after explode_arefs, or third-party IP) are processed
+# by one Python loop on one core.  Here the work is handed to KLayout's
+# TilingProcessor: the layout below a cell is cut into tiles of tile_um x
+# tile_um micrometers, the tiles run on `threads` threads, each one only
+# holding the shapes of its tile (plus border) in memory.  Each tile's
+# result is merged in the tile and clipped at its edges.  Polygons lying
+# inside their tile are final and written straight to the output; only
+# the pieces touching a tile edge are kept aside and merged in one last
+# stitch step, so no seams remain while memory stays bounded by the tile
+# plus the seam pieces.
+#
+# All results are flat, in the given cell, and merged (overlapping input
+# polygons become one).  TEXTs are not geometry: they are left in place by
+# the merges.
+#
+# tiled_remap() is a plain layer_remap.remap_layers() -- the remap keeps the
+# hierarchy and every shape as it is -- optionally followed by a tiled merge
+# of the flat-heavy cell's own shapes on the target layers (own=True: only
+# the shapes of that cell, nothing below it is flattened or touched).
+#
+# threads defaults to all cores; when several jobs run side by side (batch
+# runs, the daemon) use threads_per_job(workers) so they share them.
+#
+# For hierarchical data deep_merge() uses a deep (hierarchical) Region on a
+# multi-threaded DeepShapeStore instead, which keeps the cell structure.
+#
+# Usage:
+#   import tiled_ops
+#   tiled_ops.tiled_remap(ly, top, {(5, 1): (5, 2)}, merge=True, tile_um=200, threads=8)
+#   tiled_ops.tiled_boolean(ly, top, (8, 0), (6, 0), "and", (70, 0), threads=8)
+#   tiled_ops.tiled_merge(ly, top, (8, 0))
+#
+#   python tiled_ops.py in.gds out.gds --remap 5/1:5/2 --merge 8/0 --tile 200 --threads 8
+#   python tiled_ops.py in.gds out.gds --remap 5/1:5/2 --remap-merge    (merge the top's own targets)
+#   python tiled_ops.py in.gds out.gds --bool "8/0 and 6/0 -> 70/0"
+
+import argparse
+import os
+import sys
+try:
+    from klayout import db as pya
+except Exception:
+    import pya  # if running inside KLayout's Python
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # sibling modules
+import layer_remap
+import layout_io
+
+TILE_UM = 200.0
+OPS = {"and": "a & b", "or": "a + b", "not": "a - b", "xor": "a ^ b"}
+
+
+def _li(layout, pair):
+    return layout.layer(pya.LayerInfo(*pair))
+
+
+def threads_per_job(workers):
+    """Tiling threads for each of workers jobs running in parallel (at least 1)."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers or 1))
+
+
+def run_tiled(layout, cell, inputs, expr, out_li, tile_um=TILE_UM, threads=None, border_um=0.0,
+              own=False):
+    """
+    Evaluate the region expression expr (inputs {name: layer index} below
+    cell, e.g. "a & b"; with own=True only cell's own shapes) tile by tile
+    on threads threads and put the result, stitched and merged, into cell
+    on out_li (added to what is there).  border_um widens the input of each
+    tile (for operations looking beyond the tile edge).  Returns the number
+    of polygons written.
+    """
+    tmp = layout.insert_layer(pya.LayerInfo())
+    seam = layout.insert_layer(pya.LayerInfo())
+    tp = pya.TilingProcessor()
+    tp.dbu = layout.dbu
+    tp.tile_size(tile_um, tile_um)
+    if border_um:
+        tp.tile_border(border_um, border_um)
+    tp.threads = threads or os.cpu_count()
+    for name, li in inputs.items():
+        it = cell.begin_shapes_rec(li)
+        if own:
+            it.max_depth = 0
+        tp.input(name, it)
+    tp.output("o", layout, cell.cell_index(), tmp)
+    tp.output("s", layout, cell.cell_index(), seam)
+    # merged in the tile; pieces touching the tile edge (e) go to the seam layer
+    tp.queue(f"var r = (({expr}) & _tile).merged; var e = _tile - _tile.sized(-1); "
+             "_output(o, r.not_interacting(e)); _output(s, r.interacting(e))")
+    tp.execute("tiled_ops")
+
+    # stitch: only the seam pieces are joined across the tile edges
+    stitched = pya.Region(cell.shapes(seam))
+    stitched.merge()
+    layout.delete_layer(seam)
+    shs = cell.shapes(tmp)
+    shs.insert(stitched)
+    n = shs.size()
+    cell.shapes(out_li).insert(shs)
+    layout.delete_layer(tmp)
+    return n
+
+
+def _clear_geometry(layout, li, cells=None):
+    """Remove everything but TEXT from layer li in cells (default: every cell)."""
+    geometry = pya.Shapes.SAll ^ pya.Shapes.STexts
+    for c in (layout.each_cell() if cells is None else cells):
+        shs = c.shapes(li)
+        if not shs.is_empty():
+            shs.clear(geometry)
+
+
+def tiled_remap(layout, cell, mapping, merge=False, tile_um=TILE_UM, threads=None):
+    """
+    layer_remap.remap_layers() (hierarchy and shapes unchanged); with
+    merge=True the own shapes of the flat-heavy cell on each target layer
+    are then merged by the tiling processor.  Returns the remap_layers()
+    counts {(L,D): shapes moved}.
+    """
+    moved = layer_remap.remap_layers(layout, mapping)
+    if merge:
+        targets = set()
+        for src, dsts in mapping.items():
+            if moved.get(src):
+                targets.update([dsts] if isinstance(dsts, tuple) else dsts)
+        for dst in sorted(targets):
+            tiled_merge(layout, cell, dst, tile_um=tile_um, threads=threads, own=True)
+    return moved
+
+
+def tiled_boolean(layout, cell, a, b, op, out, tile_um=TILE_UM, threads=None):
+    """a op b (op: and, or, not, xor) of the layers (L, D) below cell into out in cell."""
+    la, lb = _li(layout, a), _li(layout, b)
+    return run_tiled(layout, cell, {"a": la, "b": lb}, OPS[op], _li(layout, out), tile_um, threads)
+
+
+def tiled_merge(layout, cell, layer, out=None, tile_um=TILE_UM, threads=None, own=False):
+    """
+    Merge layer (L, D) below cell, flat, into out in cell (default: in
+    place).  With own=True only cell's own shapes are merged; the cells
+    below it are not touched.
+    """
+    li = _li(layout, layer)
+    tmp = layout.insert_layer(pya.LayerInfo())
+    n = run_tiled(layout, cell, {"a": li}, "a", tmp, tile_um, threads, own=own)
+    if out is None or tuple(out) == tuple(layer):
+        _clear_geometry(layout, li, [cell] if own else None)
+        out_li = li
+    else:
+        out_li = _li(layout, out)
+    cell.shapes(out_li).insert(cell.shapes(tmp))
+    layout.delete_layer(tmp)
+    return n
+
+
+def deep_merge(layout, cell, layer, out=None, threads=None):
+    """
+    Hierarchical merge of layer (L, D) below cell with a deep Region on a
+    multi-threaded DeepShapeStore; the result keeps the cell structure.
+    """
+    li = _li(layout, layer)
+    dss = pya.DeepShapeStore()
+    dss.threads = threads or os.cpu_count()
+    reg = pya.Region(cell.begin_shapes_rec(li), dss)
+    reg.merge()
+    out_li = li if out is None else _li(layout, out)
+    if out_li == li:
+        _clear_geometry(layout, li)
+    reg.insert_into(layout, cell.cell_index(), out_li)
+    return reg.count()
+
+
+def _parse_bool(spec):
+    """'8/0 and 6/0 -> 70/0' -> ((8, 0), 'and', (6, 0), (70, 0))."""
+    lhs, out = spec.split("->")
+    a, op, b = lhs.split()
+    p = layer_remap.parse_layer_pair
+    return p(a), op.lower(), p(b), p(out.strip())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Tiled, multi-threaded layer operations")
+    ap.add_argument("src")
+    ap.add_argument("out")
+    ap.add_argument("--remap", default="", help='layer map, e.g. "5/1:5/2,8/1:8/2"')
+    ap.add_argument("--remap-merge", action="store_true",
+                    help="after --remap, merge the top cell's own shapes on the targets (tiled)")
+    ap.add_argument("--merge", action="append", default=[], help="merge this L/D in place")
+    ap.add_argument("--bool", action="append", default=[], help='e.g. "8/0 and 6/0 -> 70/0"')
+    ap.add_argument("--deep", action="store_true", help="--merge hierarchically (deep Region)")
+    ap.add_argument("--tile", type=float, default=TILE_UM, help="tile size in um")
+    ap.add_argument("--threads", type=int, default=os.cpu_count())
+    args = ap.parse_args(argv)
+
+    ly = pya.Layout()
+    ly.read(args.src)
+    top = ly.top_cell()
+    if args.remap:
+        res = tiled_remap(ly, top, layer_remap.parse_map(args.remap), args.remap_merge,
+                          args.tile, args.threads)
+        print("remap:", layer_remap.format_counts(res) or "nothing")
+    for spec in args.bool:
+        a, op, b, out = _parse_bool(spec)
+        print(f"{spec}: {tiled_boolean(ly, top, a, b, op, out, args.tile, args.threads)} polygons")
+    for item in args.merge:
+        pair = layer_remap.parse_layer_pair(item)
+        n = (deep_merge(ly, top, pair, threads=args.threads) if args.deep
+             else tiled_merge(ly, top, pair, tile_um=args.tile, threads=args.threads))
+        print(f"merge {item}: {n} polygons")
+    print("Wrote", layout_io.format_info(layout_io.write_layout(ly, args.out)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())